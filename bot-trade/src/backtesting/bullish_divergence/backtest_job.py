@@ -0,0 +1,133 @@
+import json
+import math
+from typing import Callable
+from src.backtesting.indicator_store import IndicatorStore, indicator_specs
+from src.backtesting.utils_backtesting import scale_candle_parameters
+from src.get_training_data.ohlcv_store import OHLCVStore
+from src.get_training_data.resampling import load_resampled
+from .bullish_backtest_functions import find_divergence_signals, precalculate_entry_filters
+from .simulation_engine import (
+    build_simulation_arrays, simulate_arrays, events_to_trades, equity_curve, ST_CAPITAL, EV_KIND, EV_BAR, EV_CAPITAL,
+    EVT_SIGNAL, CLOSING_KINDS,
+)
+from .simulation_report import event_message
+from .parameter_sweep import DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME
+from .performance_analytics import performance_metrics, bars_per_year, trades_frame
+
+# Backtest completo como una unica llamada con entrada y salida serializables (JSON): es lo que
+# ejecutan los procesos del servicio de backtests de cripto-back.
+
+DEFAULT_SETTINGS = {'initial_capital': 10000.0, 'fee_rate': 0.001, 'risk_per_trade_pct': 0.01}
+
+# Etapas que se notifican como progreso (on_event); la fraccion es la parte completada al empezar cada una.
+JOB_STAGES = ('carga', 'indicadores', 'seniales', 'filtros', 'simulacion', 'metricas')
+
+
+def resolve_parameters(parameters: dict | None) -> dict:
+    """Parametros de la estrategia completados con DEFAULT_PARAMETERS. Los nombres desconocidos son un error."""
+    parameters = parameters or {}
+    unknown = sorted(set(parameters) - set(DEFAULT_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Parametros desconocidos para la divergencia alcista: {', '.join(unknown)}.")
+    return {**DEFAULT_PARAMETERS, **parameters}
+
+
+def _json_number(value: float) -> float | None:
+    # JSON no admite NaN ni infinito (p. ej. Sharpe sin operaciones o profit factor sin perdidas).
+    if isinstance(value, int):
+        return value
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _json_metrics(metrics: dict) -> dict:
+    return {
+        name: ({reason: {key: _json_number(v) for key, v in stats.items()} for reason, stats in value.items()}
+               if isinstance(value, dict) else _json_number(value))
+        for name, value in metrics.items()
+    }
+
+
+def run_backtest_job(
+        symbol: str,
+        timeframe: str,
+        start=None,
+        end=None,
+        parameters: dict | None = None,
+        settings: dict | None = None,
+        store: OHLCVStore | None = None,
+        indicator_store: IndicatorStore | None = None,
+        include_equity: bool = False,
+        on_event: Callable[[dict], None] | None = None) -> dict:
+    """
+    Carga las velas de [start, end), ejecuta el pipeline (indicadores, seniales, filtros y simulacion) y devuelve
+    capital final, metricas de performance_analytics y la tabla de operaciones como lista de diccionarios.
+    Como en bullish_backtest, las velas se leen con load_resampled y los parametros en velas se dan en
+    PARAMETERS_TIMEFRAME y se traducen a timeframe; 'parameters' del resultado son los ya traducidos.
+    Con include_equity se anade la curva de capital por vela ('equity': arrays de timestamps en ms y capital),
+    que no es JSON: la usa el servicio de backtests para servirla reducida a los graficos.
+    on_event recibe mensajes JSON: progreso por etapa y, tras la simulacion, las entradas, TP1 y cierres de cada
+    operacion en orden, con el capital tras cada cierre.
+    """
+    params = scale_candle_parameters(resolve_parameters(parameters), PARAMETERS_TIMEFRAME, timeframe)
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    indicator_store = indicator_store or IndicatorStore()
+    emit = on_event or (lambda message: None)
+
+    def progress(stage: str) -> None:
+        emit({'type': 'progress', 'stage': stage, 'progress': JOB_STAGES.index(stage) / len(JOB_STAGES)})
+
+    progress('carga')
+    df = load_resampled(symbol, timeframe, start, end, store=store)
+    progress('indicadores')
+    df = indicator_store.with_indicators(
+        df, indicator_specs(params['rsi_period'], params['bb_period'], params['bb_std_dev'], params['atr_period']))
+    progress('seniales')
+    df = find_divergence_signals(df, params['pivot_lookback_window'], params['confirmation_wait_candles'],
+                                 params['min_distance_between_pivots'])
+    progress('filtros')
+    df = precalculate_entry_filters(df, params['volume_search_window'], settings['fee_rate'], params['volume_threshold_multiplier'])
+    df = df.dropna(subset=['RSI', 'BB_Mid', 'ATR'])
+
+    progress('simulacion')
+    arrays = build_simulation_arrays(df)
+    state, events = simulate_arrays(arrays, settings['initial_capital'], settings['fee_rate'],
+                                    settings['risk_per_trade_pct'], params['max_candles_open'])
+    timestamps = df.index.to_numpy(dtype='datetime64[ms]')
+    if on_event is not None:
+        bar_ms = timestamps.view('int64')
+        for event in events:
+            kind = int(event[EV_KIND])
+            if kind == EVT_SIGNAL:
+                continue
+            timestamp_ms = int(bar_ms[int(event[EV_BAR])])
+            emit(event_message(event, timestamp_ms))
+            if kind in CLOSING_KINDS:
+                emit({'type': 'equity', 'timestamp': timestamp_ms, 'equity': float(event[EV_CAPITAL])})
+
+    progress('metricas')
+    trades = events_to_trades(events, settings['fee_rate'], timestamps)
+    equity = equity_curve(events, arrays['close'], settings['initial_capital'])
+    metrics = performance_metrics(equity, trades, arrays['high'], arrays['low'], bars_per_year(timeframe),
+                                  settings['initial_capital'])
+
+    # to_json convierte fechas a ISO y NaN a null.
+    trades_records = json.loads(trades_frame(trades, arrays['high'], arrays['low']).to_json(orient='records', date_format='iso'))
+
+    final_capital = float(state[ST_CAPITAL])
+    result = {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'start': str(df.index[0]) if len(df) else None,
+        'end': str(df.index[-1]) if len(df) else None,
+        'parameters': params,
+        'settings': settings,
+        'final_capital': final_capital,
+        'pnl_pct': (final_capital - settings['initial_capital']) / settings['initial_capital'] * 100,
+        'metrics': _json_metrics(metrics),
+        'trades': trades_records,
+    }
+    if include_equity:
+        result['equity'] = {'timestamp': timestamps.view('int64'), 'equity': equity}
+    emit({'type': 'progress', 'stage': 'fin', 'progress': 1.0})
+    return result
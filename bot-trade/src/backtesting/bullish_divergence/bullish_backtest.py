@@ -1,85 +1,167 @@
+import argparse
 import logging
-import pandas as pd
-from .bullish_backtest_functions import calculate_indicators, find_divergence_signals, precalculate_entry_filters, run_simulation
+from .bullish_backtest_functions import find_divergence_signals, precalculate_entry_filters, run_simulation, apply_higher_timeframe_filter
+from .chunked_backtest import run_chunked_backtest
+from .parameter_sweep import DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME
+from src.backtesting.indicator_store import IndicatorStore, indicator_specs, DEFAULT_CACHE_DIR
+from src.backtesting.profiling import PipelineProfiler, PROFILERS
+from src.backtesting.utils_backtesting import CANDLE_COUNT_PARAMETERS, scale_candle_parameters
+from src.get_training_data.resampling import BASE_TIMEFRAME, load_resampled
 from src.utils import define_logging
 
 logger = logging.getLogger(__name__)
 
+CHUNKED_STAGE = "backtest_por_trozos"  # Unica etapa que mide el profiler en el backtest por trozos
 
-def run_backtesting() -> None:
+
+def log_results(initial_capital: float, final_capital: float, trades: list[dict]) -> None:
+    logger.info("-------------------------------------------")
+    logger.info("          RESULTADOS DEL BACKTEST          ")
+    logger.info("-------------------------------------------")
+    logger.info(f"Capital Inicial:    ${initial_capital:,.2f}")
+    logger.info(f"Capital Final:      ${final_capital:,.2f}")
+    pnl = final_capital - initial_capital
+    pnl_pct = (pnl / initial_capital) * 100
+    logger.info(f"Ganancia/Perdida:   ${pnl:,.2f} ({pnl_pct:.2f}%)")
+    logger.info(f"Total de operaciones cerradas: {len(trades)}")
+    logger.info("-------------------------------------------")
+
+
+def run_backtesting(
+        quiet: bool = False,
+        report_path: str | None = None,
+        profiler: PipelineProfiler | None = None,
+        higher_timeframe: str | None = None,
+        htf_rsi_max: float | None = None,
+        htf_bb_position_max: float | None = None,
+        chunk_rows: int | None = None,
+        trades_path: str | None = None,
+        equity_path: str | None = None,
+        timeframe: str = "1h") -> None:
     # --- Parámetros de la Estrategia ---
     initial_capital = 10000.0
     fee_rate = 0.001          # 0.1%
     risk_per_trade_pct = 0.01 # 1%
     rr_min_ratio = 1.5
-   
-    timeframe = "1h"
-    year = 2021
 
-    # default_timeframe = "1h"
-    # alpha = 1.0
-    # multiplier = 0
-    # try:
-    #     multiplier = calculate_multiplier(default_timeframe, timeframe, alpha)
-    # except ValueError as ve:
-    #     logger.error(f"Error de valor: {ve}")
-    #     sys.exit(1)
+    symbol = "BTC/USDT"
+    year = 2021
 
     # --- Parámetros de Indicadores, Señales y Filtros---
-    pivot_lookback_window = 15
-    confirmation_wait_candles = 3
-    min_distance_between_pivots = 30
-    volume_search_window = 100
-    max_candles_open = 48     # 48 velas de 1h = 2 días
-    volume_threshold_multiplier = 1.5
-
-    rsi_period = 14
-    bb_period = 20
-    bb_std_dev = 2
-    atr_period = 14
+    # Los parametros en velas estan calibrados en 1h (PARAMETERS_TIMEFRAME); en otro timeframe se traducen
+    # a la misma duracion (p. ej. max_candles_open = 48 velas de 1h = 2 dias = 12 velas de 4h).
+    params = scale_candle_parameters(DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME, timeframe)
+    if timeframe != PARAMETERS_TIMEFRAME:
+        logger.info(f"Parametros en velas traducidos de {PARAMETERS_TIMEFRAME} a {timeframe}: "
+                    f"{ {name: params[name] for name in CANDLE_COUNT_PARAMETERS} }")
     # --- Ejecución ---
+    # Sin profiler las etapas no se miden (PipelineProfiler desactivado).
+    profiler = profiler or PipelineProfiler(enabled=False)
+    output_filename = f"backtest_annotated_data_{year}.csv"
+
+    if chunk_rows:
+        # Por trozos: el rango no se carga entero en memoria y el CSV anotado se escribe por bloques.
+        # Solo devuelve el trade_log y no aplica el timeframe superior.
+        if higher_timeframe or trades_path or equity_path:
+            raise ValueError("El backtest por trozos no admite timeframe superior, tabla de operaciones ni curva de capital.")
+        settings = {'initial_capital': initial_capital, 'fee_rate': fee_rate, 'risk_per_trade_pct': risk_per_trade_pct}
+        logger.info(f"Backtest por trozos de {chunk_rows:,} velas. Datos anotados en '{output_filename}'...")
+        with profiler.stage(CHUNKED_STAGE):
+            final_capital, trades = run_chunked_backtest(symbol, timeframe, f"{year}-01-01", f"{year + 1}-01-01", params,
+                                                         settings, chunk_rows, output_filename, quiet, report_path,
+                                                         base_timeframe=BASE_TIMEFRAME)
+        log_results(initial_capital, final_capital, trades)
+        profiler.log_summary()
+        return
+
     logger.info("Leyendo el archivo de datos...")
-    df = pd.read_csv(f"binance_BTCUSDT_{timeframe}_{year}.csv", index_col='TimeStamp', parse_dates=True)
+    with profiler.stage("carga") as stage:
+        # Las velas del timeframe se derivan de las de 1m del almacen (resampling).
+        df = load_resampled(symbol, timeframe, f"{year}-01-01", f"{year + 1}-01-01")
+        stage['rows'] = len(df)
 
     logger.info("Calculando indicadores...")
-    calculate_indicators(df, rsi_period, bb_period, bb_std_dev, atr_period)
+    # Los indicadores se guardan en cache (memoria + disco): si los datos y los parametros no cambian, no se recalculan.
+    with profiler.stage("indicadores", len(df)):
+        indicator_store = IndicatorStore(cache_dir=DEFAULT_CACHE_DIR)
+        df = indicator_store.with_indicators(df, indicator_specs(params['rsi_period'], params['bb_period'], params['bb_std_dev'],
+                                                                 params['atr_period']))
 
     logger.info("Buscando pivotes y seniales de divergencia...")
-    df = find_divergence_signals(df, pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)
+    with profiler.stage("seniales", len(df)):
+        df = find_divergence_signals(df, params['pivot_lookback_window'], params['confirmation_wait_candles'],
+                                     params['min_distance_between_pivots'])
+
+    if higher_timeframe:
+        # Las velas del timeframe superior tambien se derivan de las de 1m, sin otra descarga.
+        logger.info(f"Confirmando seniales con {higher_timeframe}...")
+        with profiler.stage("timeframe_superior", len(df)):
+            higher_df = load_resampled(symbol, higher_timeframe, f"{year}-01-01", f"{year + 1}-01-01")
+            df = apply_higher_timeframe_filter(df, higher_df, timeframe, higher_timeframe, htf_rsi_max, htf_bb_position_max,
+                                               params['rsi_period'], params['bb_period'], params['bb_std_dev'])
     
     logger.info("Pre-calculando filtros de Volumen y R/R para cada señal...")
-    df = precalculate_entry_filters(df, volume_search_window, fee_rate, volume_threshold_multiplier)
+    with profiler.stage("filtros", len(df)):
+        df = precalculate_entry_filters(df, params['volume_search_window'], fee_rate, params['volume_threshold_multiplier'])
 
-    output_filename = "backtest_annotated_data_2021.csv"
     logger.info(f"Guardando datos anotados en '{output_filename}'...")
-    df.to_csv(output_filename)
+    with profiler.stage("csv_anotado", len(df)):
+        df.to_csv(output_filename)
     
     df.dropna(subset=['RSI', 'BB_Mid', 'ATR'], inplace=True)
 
     # df.dropna(inplace=True) # Limpiar NaNs después de todos los cálculos
 
     # Correr la simulación principal
-    final_capital, trades = run_simulation(
-        df, 
-        initial_capital, 
-        fee_rate, 
-        risk_per_trade_pct, 
-        rr_min_ratio, 
-        max_candles_open,
-        )
+    with profiler.stage("simulacion", len(df)):
+        final_capital, trades = run_simulation(
+            df, 
+            initial_capital, 
+            fee_rate, 
+            risk_per_trade_pct, 
+            rr_min_ratio, 
+            params['max_candles_open'],
+            quiet=quiet,
+            report_path=report_path,
+            timeframe=timeframe,
+            trades_path=trades_path,
+            equity_path=equity_path,
+            )
     
     # --- Reporte Final ---
-    logger.info("-------------------------------------------")
-    logger.info("          RESULTADOS DEL BACKTEST          ")
-    logger.info("-------------------------------------------")
-    logger.info(f"Capital Inicial:    ${initial_capital:,.2f}")
-    logger.info(f"Capital Final:      ${final_capital:,.2f}")
-    pnl = final_capital - initial_capital
-    pnl_pct = (pnl / initial_capital) * 100
-    logger.info(f"Ganancia/Perdida:   ${pnl:,.2f} ({pnl_pct:.2f}%)")
-    logger.info(f"Total de operaciones cerradas: {len(trades)}")
-    logger.info("-------------------------------------------")
+    log_results(initial_capital, final_capital, trades)
+    profiler.log_summary()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest de la estrategia de divergencia alcista.")
+    parser.add_argument("--timeframe", default="1h", help="Timeframe del backtest, derivado de las velas de 1m del almacen.")
+    parser.add_argument("--quiet", action="store_true", help="No escribe en el log el detalle de cada operacion.")
+    parser.add_argument("--report", default=None, help="Fichero de texto con el detalle de cada operacion, generado al terminar.")
+    parser.add_argument("--higher-timeframe", default=None, help="Timeframe superior de confirmacion (p. ej. 4h o 1d).")
+    parser.add_argument("--htf-rsi-max", type=float, default=None, help="RSI maximo del timeframe superior para aceptar una senial.")
+    parser.add_argument("--htf-bb-position-max", type=float, default=None,
+                        help="Posicion maxima del cierre superior dentro de sus Bandas de Bollinger (0 = inferior, 1 = superior).")
+    parser.add_argument("--trades", default=None, help="CSV con la tabla de operaciones (tiempos, tamanio, comisiones, P&L, R, MAE/MFE).")
+    parser.add_argument("--equity", default=None, help="CSV con la curva de capital por vela.")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="Ejecuta el backtest por bloques de este numero de velas (memoria acotada para rangos grandes).")
+    parser.add_argument("--profile", action="store_true", help="Mide tiempo, CPU, filas/s y pico de RSS de cada etapa.")
+    parser.add_argument("--profile-stage", default=None, help="Etapa de la que capturar un perfil detallado (p. ej. simulacion).")
+    parser.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+    parser.add_argument("--profile-output", default=None, help="Fichero para el perfil de --profile-stage (.prof o .html).")
+    parser.add_argument("--profile-json", default=None, help="Guarda las mediciones por etapa en este JSON.")
+    args = parser.parse_args()
+    if args.chunk_rows and (args.higher_timeframe or args.htf_rsi_max is not None or args.htf_bb_position_max is not None):
+        parser.error("--higher-timeframe, --htf-rsi-max y --htf-bb-position-max no son compatibles con --chunk-rows.")
+    if args.chunk_rows and (args.trades or args.equity):
+        parser.error("--trades y --equity no estan disponibles con --chunk-rows.")
+    if args.chunk_rows and args.profile_stage not in (None, CHUNKED_STAGE):
+        parser.error(f"Con --chunk-rows la unica etapa medida es '{CHUNKED_STAGE}'.")
+
     define_logging("bullish_backtest_log.txt")
-    run_backtesting()
\ No newline at end of file
+    profiler = PipelineProfiler(enabled=args.profile or bool(args.profile_stage or args.profile_json), profile_stage=args.profile_stage,
+                                profiler=args.profiler, profile_output=args.profile_output)
+    run_backtesting(args.quiet, args.report, profiler, args.higher_timeframe, args.htf_rsi_max, args.htf_bb_position_max, args.chunk_rows,
+                    args.trades, args.equity, args.timeframe)
+    if args.profile_json:
+        profiler.to_json(args.profile_json)
\ No newline at end of file
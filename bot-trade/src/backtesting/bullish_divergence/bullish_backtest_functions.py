@@ -2,7 +2,14 @@ import pandas as pd
 import logging
 from functools import reduce
 import numpy as np
+from src.backtesting.jit import njit
 from src.backtesting.utils_backtesting import calculate_rsi, calculate_bollinger_bands, calculate_atr
+from src.backtesting.multi_timeframe import align_to_base, higher_timeframe_indicators
+from .simulation_engine import (
+    build_simulation_arrays, simulate_arrays, events_to_trade_log, events_to_trades, equity_curve, ST_CAPITAL,
+)
+from .simulation_report import log_simulation_events, write_event_report
+from .performance_analytics import performance_metrics, bars_per_year, trades_frame, format_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -19,106 +26,180 @@ def calculate_indicators(df: pd.DataFrame, rsi_period=14, bb_period=20, bb_std_d
     # ATR
     calculate_atr(df, period=atr_period)
 
+@njit(cache=True)
+def _pair_divergence_pivots(pivot_positions, pivot_rsi, pivot_close, min_distance_between_pivots, confirmation_wait_candles, n_rows):
+    """
+    Recorre los pivotes una sola vez (por posicion entera) y devuelve las posiciones de las seniales
+    junto con la posicion del pivote que genero cada una. pivot_rsi y pivot_close son los valores en cada pivote.
+    Devuelve tambien el indice (en pivot_positions) del ultimo pivote de referencia, para poder continuar
+    el recorrido con los pivotes siguientes (backtest por trozos).
+    """
+    signal_positions = np.empty(pivot_positions.shape[0], dtype=np.int64)
+    generating_pivot_positions = np.empty(pivot_positions.shape[0], dtype=np.int64)
+    n_signals = 0
+
+    last = 0
+    for k in range(1, pivot_positions.shape[0]):
+        current_pivot_pos = pivot_positions[k]
+
+        if current_pivot_pos - pivot_positions[last] < min_distance_between_pivots:
+            if pivot_rsi[k] < pivot_rsi[last]:
+                last = k
+            continue
+
+        price_makes_lower_low = pivot_close[k] < pivot_close[last]
+        rsi_makes_higher_low = pivot_rsi[k] > pivot_rsi[last]
+
+        if price_makes_lower_low and rsi_makes_higher_low:
+            signal_pos = current_pivot_pos + confirmation_wait_candles
+            if signal_pos < n_rows:
+                # Solo marcamos la senial potencial; volumen y riesgo se evaluan despues.
+                signal_positions[n_signals] = signal_pos
+                generating_pivot_positions[n_signals] = current_pivot_pos
+                n_signals += 1
+
+        last = k
+
+    return signal_positions[:n_signals], generating_pivot_positions[:n_signals], last
+
+def rsi_pivot_lows(rsi: pd.Series, pivot_lookback_window, confirmation_wait_candles) -> pd.Series:
+    """Minimo del RSI en las ultimas pivot_lookback_window velas y menor que las confirmation_wait_candles siguientes."""
+    is_rsi_lookback_min = rsi == rsi.rolling(window=pivot_lookback_window).min()
+    conditions_list = [rsi < rsi.shift(-i) for i in range(1, confirmation_wait_candles + 1)]
+    is_rsi_forward_confirmed = reduce(lambda a, b: a & b, conditions_list)
+    return is_rsi_lookback_min & is_rsi_forward_confirmed
+
 def find_divergence_signals(df: pd.DataFrame, pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots):
     """
     Funcion optimizada para PRE-CALCULAR todas las potenciales seniales de divergencia.
     Ahora devuelve el DataFrame modificado.
+    Ademas de la senial escribe 'generating_pivot_pos': la posicion entera del pivote que la genero (-1 si no hay senial).
     """
-    is_rsi_lookback_min = df['RSI'] == df['RSI'].rolling(window=pivot_lookback_window).min()
-    conditions_list = [df['RSI'] < df['RSI'].shift(-i) for i in range(1, confirmation_wait_candles + 1)]
-    is_rsi_forward_confirmed = reduce(lambda a, b: a & b, conditions_list)
-    df['rsi_pivot_low'] = is_rsi_lookback_min & is_rsi_forward_confirmed
-    
-    df['bullish_divergence_signal'] = False
-    potential_pivot_indices = df.index[df['rsi_pivot_low']]
-
-    if len(potential_pivot_indices) < 2:
-        return df
-
-    last_pivot_idx = potential_pivot_indices[0]
-    for i in range(1, len(potential_pivot_indices)):
-        current_pivot_idx = potential_pivot_indices[i]
-        
-        distance = df.index.get_loc(current_pivot_idx) - df.index.get_loc(last_pivot_idx) # type: ignore
-        if distance < min_distance_between_pivots:
-            if df.loc[current_pivot_idx, 'RSI'] < df.loc[last_pivot_idx, 'RSI']: # type: ignore
-                last_pivot_idx = current_pivot_idx
-            continue
+    df['rsi_pivot_low'] = rsi_pivot_lows(df['RSI'], pivot_lookback_window, confirmation_wait_candles)
+
+    n_rows = len(df.index)
+    signal = np.zeros(n_rows, dtype=bool)
+    generating_pivot_pos = np.full(n_rows, -1, dtype=np.int64)
+
+    potential_pivot_positions = np.flatnonzero(df['rsi_pivot_low'].to_numpy(dtype=bool))
+    if len(potential_pivot_positions) >= 2:
+        signal_positions, pivot_positions, _ = _pair_divergence_pivots(
+            potential_pivot_positions,
+            df['RSI'].to_numpy(dtype=np.float64)[potential_pivot_positions],
+            df['Close'].to_numpy(dtype=np.float64)[potential_pivot_positions],
+            min_distance_between_pivots,
+            confirmation_wait_candles,
+            n_rows,
+        )
+        signal[signal_positions] = True
+        generating_pivot_pos[signal_positions] = pivot_positions
+
+    df['bullish_divergence_signal'] = signal
+    df['generating_pivot_pos'] = generating_pivot_pos
+    return df
 
-        price_makes_lower_low = df.loc[current_pivot_idx, 'Close'] < df.loc[last_pivot_idx, 'Close'] # type: ignore
-        rsi_makes_higher_low = df.loc[current_pivot_idx, 'RSI'] > df.loc[last_pivot_idx, 'RSI'] # type: ignore
-        
-        if price_makes_lower_low and rsi_makes_higher_low:
-            pivot_pos = df.index.get_loc(current_pivot_idx)
-            signal_pos = pivot_pos + confirmation_wait_candles
-            if signal_pos < len(df.index):
-                signal_idx = df.index[signal_pos]
-                # En lugar de comprobar el volumen aquí, solo marcamos la senial potencial.
-                # La gestion de riesgo se hará en el bucle de simulacion.
-                df.loc[signal_idx, 'bullish_divergence_signal'] = True
-                df.loc[signal_idx, 'generating_pivot_idx'] = current_pivot_idx
-        
-        last_pivot_idx = current_pivot_idx
-        
+def apply_higher_timeframe_filter(
+        df: pd.DataFrame,
+        higher_df: pd.DataFrame,
+        base_timeframe: str,
+        higher_timeframe: str,
+        rsi_max: float | None = None,
+        bb_position_max: float | None = None,
+        rsi_period: int = 14,
+        bb_period: int = 20,
+        bb_std_dev: float = 2) -> pd.DataFrame:
+    """
+    Confirmacion en un timeframe superior: los indicadores de higher_df se calculan una vez y se unen a las
+    velas base con la ultima vela superior ya cerrada (HTF_RSI, HTF_BB_Position). Se descartan las seniales
+    con HTF_RSI > rsi_max o HTF_BB_Position > bb_position_max, y las que aun no tienen vela superior.
+    Se aplica despues de find_divergence_signals y antes de precalculate_entry_filters.
+    """
+    indicators = higher_timeframe_indicators(higher_df, rsi_period, bb_period, bb_std_dev)
+    aligned = align_to_base(df.index, indicators, ['RSI', 'BB_Position'], base_timeframe, higher_timeframe) # type: ignore
+    df['HTF_RSI'] = aligned['HTF_RSI'].to_numpy()
+    df['HTF_BB_Position'] = aligned['HTF_BB_Position'].to_numpy()
+
+    confirmed = np.ones(len(df.index), dtype=bool)
+    # Las comparaciones con NaN dan False: sin vela superior cerrada no hay confirmacion.
+    if rsi_max is not None:
+        confirmed &= df['HTF_RSI'].to_numpy() <= rsi_max
+    if bb_position_max is not None:
+        confirmed &= df['HTF_BB_Position'].to_numpy() <= bb_position_max
+
+    signal = df['bullish_divergence_signal'].to_numpy(dtype=bool)
+    generating_pivot_pos = df['generating_pivot_pos'].to_numpy(dtype=np.int64).copy()
+    generating_pivot_pos[signal & ~confirmed] = -1
+    df['bullish_divergence_signal'] = signal & confirmed
+    df['generating_pivot_pos'] = generating_pivot_pos
     return df
 
+RED_CANDLES_FOR_VOLUME = 5  # Velas rojas previas al pivote que forman la media de volumen
+
 def precalculate_entry_filters(df: pd.DataFrame, volume_search_window: int, fee_rate: float, volume_threshold_multiplier: float = 1.5) -> pd.DataFrame:
     """
-    PRE-CALCULA los filtros de entrada (Volumen, R/R) para cada señal de divergencia.
+    PRE-CALCULA los filtros de entrada (Volumen, R/R) para todas las seniales de divergencia a la vez.
+    Volumen: alguna vela verde entre el pivote y la senial supera volume_threshold_multiplier veces
+    la media de las ultimas 5 velas rojas dentro de las volume_search_window velas previas al pivote.
     """
+    open_ = df['Open'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    volume = df['Volume'].to_numpy(dtype=np.float64)
+
+    signal_pos = np.flatnonzero(df['bullish_divergence_signal'].to_numpy(dtype=bool))
+    pivot_pos = df['generating_pivot_pos'].to_numpy(dtype=np.int64)[signal_pos]
+
     # --- Columna 3: volume_confirmation ---
-    df['volume_confirmation'] = pd.NA
-    
+    # Volumen maximo de las velas verdes de cada ventana de confirmacion (pivote, senial].
+    # Las velas que no son verdes cuentan como -inf para no superar nunca el umbral.
+    green_volume = np.where(close > open_, volume, -np.inf)
+    green_volume[np.isnan(green_volume)] = -np.inf
+    window_lengths = signal_pos - pivot_pos
+    max_window = int(window_lengths.max()) if len(signal_pos) else 0
+    offsets = np.arange(max_window)
+    in_window = offsets[None, :] < window_lengths[:, None]
+    window_positions = np.where(in_window, pivot_pos[:, None] + 1 + offsets[None, :], 0)
+    max_green_volume = np.where(in_window, green_volume[window_positions], -np.inf).max(axis=1, initial=-np.inf)
+
+    # Posiciones de las ultimas velas rojas antes de cada pivote a partir del indice de velas rojas.
+    red_positions = np.flatnonzero(close < open_)
+    reds_before_pivot = np.searchsorted(red_positions, pivot_pos, side='left')
+    search_start = np.maximum(0, pivot_pos - volume_search_window)
+    has_enough_reds = reds_before_pivot >= RED_CANDLES_FOR_VOLUME
+    first_red = np.where(has_enough_reds, reds_before_pivot - RED_CANDLES_FOR_VOLUME, 0)
+    has_enough_reds &= red_positions[first_red] >= search_start if len(red_positions) else False
+
+    # Media de las 5 velas rojas sumando en el mismo orden que pandas para obtener exactamente el mismo valor.
+    red_volume_sum = np.zeros(len(signal_pos), dtype=np.float64)
+    if len(red_positions):
+        for k in range(RED_CANDLES_FOR_VOLUME):
+            red_volume_sum = red_volume_sum + volume[red_positions[first_red + k]]
+    avg_red_volume = red_volume_sum / RED_CANDLES_FOR_VOLUME
+    volume_threshold = volume_threshold_multiplier * avg_red_volume
+    volume_confirmed = has_enough_reds & (max_green_volume > volume_threshold)
+
+    volume_confirmation = np.full(len(df.index), pd.NA, dtype=object)
+    volume_confirmation[signal_pos] = volume_confirmed.tolist()
+    df['volume_confirmation'] = volume_confirmation
+
     # --- Columna 4: risk_reward_ratio ---
-    df['risk_reward_ratio'] = np.nan
-
-    # Iteramos solo por las velas que tienen una señal de divergencia
-    signal_indices = df.index[df['bullish_divergence_signal']]
-    
-    for signal_idx in signal_indices:
-        signal_row = df.loc[signal_idx]
-        signal_pos = df.index.get_loc(signal_idx)
-        
-        # --- Lógica de Filtro de Volumen ---
-        pivot_idx = signal_row['generating_pivot_idx']
-        pivot_pos = df.index.get_loc(pivot_idx)
-        
-        confirmation_window = df.iloc[pivot_pos + 1 : signal_pos + 1] # type: ignore
-        green_candles = confirmation_window[confirmation_window['Close'] > confirmation_window['Open']]
-
-        volume_confirmed = False
-        if not green_candles.empty:
-            start_pos = max(0, pivot_pos - volume_search_window) # type: ignore
-            search_df = df.iloc[start_pos:pivot_pos]
-            red_candles = search_df[search_df['Close'] < search_df['Open']]
-            
-            if len(red_candles) >= 5:
-                avg_red_volume = red_candles.tail(5)['Volume'].mean()
-                volume_threshold = 1.5 * avg_red_volume
-                if any(green_candles['Volume'] > volume_threshold):
-                    volume_confirmed = True
-        
-        df.loc[signal_idx, 'volume_confirmation'] = volume_confirmed
-
-        # --- Lógica de Ratio Riesgo/Beneficio ---
-        precio_entrada = signal_row['Close']
-        precio_sl_teorico = signal_row['Low'] - signal_row['ATR']
-        precio_tp1_teorico = signal_row['BB_Mid']
-        
-        costo_total_entrada = precio_entrada * (1 + fee_rate)
-        ingreso_neto_sl = precio_sl_teorico * (1 - fee_rate)
-        riesgo_real_unitario = costo_total_entrada - ingreso_neto_sl
-        
-        if riesgo_real_unitario > 0:
-            ingreso_neto_tp1 = precio_tp1_teorico * (1 - fee_rate)
-            recompensa_real_unitaria = ingreso_neto_tp1 - costo_total_entrada
-            
-            if recompensa_real_unitaria > 0:
-                ratio_rr_real = recompensa_real_unitaria / riesgo_real_unitario
-                df.loc[signal_idx, 'risk_reward_ratio'] = ratio_rr_real
+    precio_entrada = close[signal_pos]
+    precio_sl_teorico = df['Low'].to_numpy(dtype=np.float64)[signal_pos] - df['ATR'].to_numpy(dtype=np.float64)[signal_pos]
+    precio_tp1_teorico = df['BB_Mid'].to_numpy(dtype=np.float64)[signal_pos]
+
+    costo_total_entrada = precio_entrada * (1 + fee_rate)
+    ingreso_neto_sl = precio_sl_teorico * (1 - fee_rate)
+    riesgo_real_unitario = costo_total_entrada - ingreso_neto_sl
+    ingreso_neto_tp1 = precio_tp1_teorico * (1 - fee_rate)
+    recompensa_real_unitaria = ingreso_neto_tp1 - costo_total_entrada
+
+    valid_rr = (riesgo_real_unitario > 0) & (recompensa_real_unitaria > 0)
+    risk_reward_ratio = np.full(len(df.index), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_reward_ratio[signal_pos[valid_rr]] = recompensa_real_unitaria[valid_rr] / riesgo_real_unitario[valid_rr]
+    df['risk_reward_ratio'] = risk_reward_ratio
 
     # Limpiamos columnas auxiliares
-    df.drop(columns=['generating_pivot_idx'], inplace=True, errors='ignore')
+    df.drop(columns=['generating_pivot_pos'], inplace=True, errors='ignore')
     return df
 
 # --- 2. BUCLE PRINCIPAL DE SIMULACIoN ---
@@ -129,173 +210,43 @@ def run_simulation(
         fee_rate,
         risk_per_trade_pct,
         rr_min_ratio,
-        max_candles_open,):
+        max_candles_open,
+        use_numba: bool | None = None,
+        quiet: bool = False,
+        report_path: str | None = None,
+        timeframe: str | None = None,
+        trades_path: str | None = None,
+        equity_path: str | None = None):
     """
-    Recorre el DataFrame vela a vela, gestionando operaciones y capital.
+    Recorre las velas con el motor de arrays (simulation_engine), gestionando operaciones y capital.
+    El motor se compila con numba si esta instalado; use_numba=False fuerza la version en Python puro.
+    Los logs de cada operacion se generan al final a partir de los eventos registrados;
+    con quiet=True no se formatea ningun texto por operacion. report_path escribe ese mismo detalle en un
+    fichero de texto aparte, tambien despues de la simulacion.
+    Con timeframe se registran tambien las metricas de rendimiento (performance_analytics); trades_path y
+    equity_path guardan en CSV la tabla de operaciones y la curva de capital por vela.
     """
-    capital = initial_capital
-    in_trade = False
-    active_trade = {}
-    trade_log = []
-
-    logger.info(f"Iniciando simulacion con Capital: ${capital:,.2f}")
-
-    # Iteramos por cada vela del DataFrame
-    for i in range(len(df)):
-        current_row = df.iloc[i]
-        current_price = current_row['Close']
-        current_date = df.index[i]
-
-        # --- A. GESTIoN DE LA OPERACIoN ACTIVA ---
-        if in_trade:
-            # Comprobar Stop Loss (antes de TP1)
-            if not active_trade.get('is_phase_2') and current_row['Low'] <= active_trade['sl_price']:
-                exit_price = active_trade['sl_price']
-                pnl = (active_trade['position_size'] * exit_price * (1 - fee_rate)) - active_trade['total_cost']
-                capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
-                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'SL'})
-                logger.warning(f"CIERRE por SL en {current_date}\n"
-                               f"    - SL: ${exit_price:,.2f}.\n"
-                               f"    - P&L: ${pnl:,.2f}.\n"
-                               f"    - Capital final: ${capital:,.2f}")
-                in_trade = False
-                active_trade = {}
-                continue
-
-            # Comprobar Stop Loss (después de TP1 - Breakeven)
-            if active_trade.get('is_phase_2') and current_row['Low'] <= active_trade['sl_price']:
-                exit_price = active_trade['sl_price']
-                # ### MODIFICADO ### Cálculo de P&L de la segunda mitad
-                cash_in_part2 = active_trade['position_size'] * exit_price * (1 - fee_rate)
-                pnl_part2 = cash_in_part2 - active_trade['cost_part2']
-                capital += cash_in_part2
-                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'SL@BE'})
-                logger.warning(f"CIERRE por SL en Breakeven en {current_date}\n"
-                               f"    - Breakeven SL: ${exit_price:,.2f}.\n"
-                               f"    - P&L Parte 2: ${pnl_part2:,.2f}.\n"
-                               f"    - Capital final: ${capital:,.2f}")
-                in_trade = False
-                active_trade = {}
-                continue
-
-            # Comprobar Fase 2: Take Profit 2
-            if active_trade.get('is_phase_2') and current_row['High'] >= active_trade['tp2_price']:
-                exit_price = active_trade['tp2_price']
-                # Cálculo de P&L de la segunda mitad
-                cash_in_part2 = active_trade['position_size'] * exit_price * (1 - fee_rate)
-                pnl_part2 = cash_in_part2 - active_trade['cost_part2']
-                capital += cash_in_part2
-                # Calcular P&L y ROI total
-                pnl_total = (active_trade['pnl_part1'] + pnl_part2) # Necesitamos guardar pnl_part1
-                costo_total = active_trade['total_cost']
-                roi_pct = (pnl_total / costo_total) * 100
-                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'TP2'})
-                # Logger
-                logger.info(f"ALCANZADO TP2 y CIERRE en {current_date} a ${exit_price:,.2f}.\n"
-                    f"    - P&L Parte 2: ${pnl_part2:,.2f}\n"
-                    f"    - P&L Total Op.: ${pnl_total:,.2f} ({roi_pct:.2f}% ROI)\n"
-                    f"    - Capital final: ${capital:,.2f}")
-                in_trade = False
-                active_trade = {}
-                continue # Importante para no seguir procesando en esta vela
-
-            # Comprobar Fase 1: Take Profit 1
-            if not active_trade.get('is_phase_2') and current_row['High'] >= active_trade['tp1_price']:
-                exit_price_tp1 = active_trade['tp1_price']
-                half_position = active_trade['position_size'] / 2
-                
-                # ### MODIFICADO ### Cálculo de P&L de la primera mitad
-                cash_in_part1 = half_position * exit_price_tp1 * (1 - fee_rate)
-                pnl_part1 = cash_in_part1 - active_trade['cost_part1']
-                capital += cash_in_part1
-                
-                # Actualizar la operacion a Fase 2
-                active_trade['position_size'] = half_position
-                active_trade['is_phase_2'] = True
-                active_trade['pnl_part1'] = pnl_part1
-                # Movemos SL a un breakeven real, considerando comisiones
-                sl_breakeven = active_trade['cost_part2'] / (half_position * (1 - fee_rate))
-                active_trade['sl_price'] = sl_breakeven
-                active_trade['tp2_price'] = current_row['BB_Upper']  # TP2 es la banda superior de Bollinger
-
-                # ### MODIFICADO ### Logger mejorado
-                logger.info(f"ALCANZADO TP1 en {current_date} a ${exit_price_tp1:,.2f}. \n"
-                            f"    - P&L Parte 1: ${pnl_part1:,.2f}.\n"
-                            f"    - SL movido a breakeven ${sl_breakeven:.2f}\n"
-                            f"    - tp2 fijado en ${active_trade['tp2_price']:.2f}.")
-
-                continue
-
-            # Comprobar Time Stop
-            if i - active_trade['entry_index'] >= max_candles_open:
-                exit_price = current_price
-                capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
-                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'Time Stop'})
-                logger.warning(f"CIERRE por Time Stop en {current_date}: Capital final ${capital:,.2f}")
-                in_trade = False
-                active_trade = {}
-                continue
-
-        # --- B. busqueda DE NUEVAS ENTRADAS ---
-        if not in_trade and current_row['bullish_divergence_signal'] and current_row['volume_confirmation'] == True:
-            
-            logger.info(f"Senial CONFIRMADA en {current_date}. Evaluando entrada...")
-
-            # Filtro R/R (si lo quieres activar)
-            # if pd.isna(current_row['risk_reward_ratio']) or current_row['risk_reward_ratio'] < rr_min_ratio:
-            #     logger.warning(f"Senial en {current_date} RECHAZADA: Ratio R/R no válido o insuficiente.")
-            #     continue
-            
-            # --- Lógica de cálculo de tamaño y entrada (casi igual a la anterior) ---
-            precio_entrada = current_price
-            precio_sl_teorico = current_row['Low'] - current_row['ATR']
-            precio_tp1_teorico = current_row['BB_Mid']
-
-            costo_total_entrada = precio_entrada * (1 + fee_rate)
-            ingreso_neto_sl = precio_sl_teorico * (1 - fee_rate)
-            riesgo_real_unitario = costo_total_entrada - ingreso_neto_sl
-
-            if riesgo_real_unitario <= 0: continue
-            
-            riesgo_en_usd = capital * risk_per_trade_pct
-            tamanio_posicion_btc = riesgo_en_usd / riesgo_real_unitario
-            costo_bruto_posicion = tamanio_posicion_btc * precio_entrada
-            costo_total_con_comision = costo_bruto_posicion * (1 + fee_rate)
-
-            if costo_total_con_comision > capital:
-                logger.warning(f"Senial en {current_date} ignorada: capital insuficiente.")
-                continue
-
-            # Ejecutar la operación
-            capital -= costo_total_con_comision
-            in_trade = True
-
-            active_trade = {
-                'entry_index': i,
-                'entry_price': precio_entrada,
-                'position_size': tamanio_posicion_btc, #btc
-                'sl_price': precio_sl_teorico,
-                'tp1_price': precio_tp1_teorico,
-                'is_phase_2': False,
-                'total_cost': costo_total_con_comision, #usdt
-                'cost_part1': costo_total_con_comision / 2,
-                'cost_part2': costo_total_con_comision / 2,
-            }
-
-            rr_from_df = current_row['risk_reward_ratio']
-
-            logger.info(f"NUEVA OPERACION en {current_date}\n"
-            f"    - Precio Entrada: ${precio_entrada:,.2f}\n"
-            f"    - Capital en Riesgo (1%): ${riesgo_en_usd:,.2f}\n"
-            f"    - Tamanio Posicion (Bruto): ${costo_bruto_posicion:,.2f}\n"
-            f"    - Costo Total (c/comision): ${costo_total_con_comision:,.2f}\n"
-            f"    - SL: ${precio_sl_teorico:,.2f} | TP1: ${precio_tp1_teorico:,.2f} | RR (TP1): {rr_from_df:.2f}")
-
-    # Si la simulacion termina con una operacion abierta, la cerramos al último precio
-    if in_trade:
-        exit_price = df.iloc[-1]['Close']
-        capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
-        logger.warning(f"CIERRE FORZADO al final del backtest. Capital final: ${capital:,.2f}")
-
-    return capital, trade_log
-    
\ No newline at end of file
+    logger.info(f"Iniciando simulacion con Capital: ${initial_capital:,.2f}")
+
+    arrays = build_simulation_arrays(df)
+    state, events = simulate_arrays(arrays, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, use_numba)
+    if not quiet:
+        log_simulation_events(df, events)
+    if report_path:
+        write_event_report(df, events, report_path)
+        logger.info(f"Detalle de operaciones en '{report_path}'.")
+
+    if timeframe or trades_path or equity_path:
+        trades = events_to_trades(events, fee_rate, df.index.to_numpy(dtype='datetime64[ms]'))
+        equity = equity_curve(events, arrays['close'], initial_capital)
+        if timeframe:
+            metrics = performance_metrics(equity, trades, arrays['high'], arrays['low'], bars_per_year(timeframe), initial_capital)
+            logger.info(f"Metricas del backtest:\n{format_metrics(metrics)}")
+        if trades_path:
+            trades_frame(trades, arrays['high'], arrays['low']).to_csv(trades_path, index=False)
+            logger.info(f"Tabla de operaciones en '{trades_path}'.")
+        if equity_path:
+            pd.Series(equity, index=df.index, name='equity').to_csv(equity_path)
+            logger.info(f"Curva de capital en '{equity_path}'.")
+
+    return float(state[ST_CAPITAL]), events_to_trade_log(events)
@@ -0,0 +1,315 @@
+import argparse
+import logging
+import tempfile
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from src.backtesting.indicator_store import IndicatorStore, indicator_specs
+from src.backtesting.utils_backtesting import bollinger_columns, scale_candle_parameters
+from src.get_training_data.ohlcv_store import (
+    OHLCVStore, TIMESTAMP_COLUMN, columns_to_dataframe, load_ohlcv, timeframe_to_ms, to_milliseconds,
+)
+from src.get_training_data.resampling import DAY_MS, candle_series
+from src.utils import define_logging
+from .bullish_backtest_functions import _pair_divergence_pivots, rsi_pivot_lows, precalculate_entry_filters
+from .simulation_engine import (
+    build_simulation_arrays, simulate_arrays, events_to_trade_log, close_open_trade_py, new_state,
+    ST_CAPITAL, ST_IN_TRADE, ST_ENTRY_INDEX, EV_BAR, EVENT_FIELDS,
+)
+from .simulation_report import log_simulation_events, write_event_report
+from .backtest_job import DEFAULT_SETTINGS, run_backtest_job
+from .parameter_sweep import DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME
+
+logger = logging.getLogger(__name__)
+
+# Backtest por trozos para series que no caben en memoria: las velas se leen del almacen en bloques de
+# tamanio fijo y solo se conserva entre bloques el contexto que necesitan los pivotes y los filtros, el
+# estado de los indicadores y el de la simulacion. El CSV anotado se escribe por bloques.
+# El resultado (capital, operaciones y CSV) es el del backtest en memoria salvo por redondeo en las Bandas de
+# Bollinger: rolling() de pandas acumula sus sumas desde el inicio de la serie y por bloques empiezan en otro
+# punto, asi que pueden diferir en los ultimos digitos (check_chunked_backtest lo compara con np.allclose).
+# Solo se devuelve el trade_log: sin tabla de operaciones, curva de capital ni filtro de timeframe superior
+# (bullish_backtest rechaza esas opciones junto con --chunk-rows).
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+INDICATOR_COLUMNS = ['RSI', 'BB_Mid', 'BB_Upper', 'BB_Lower', 'ATR']
+
+
+def annotated_date_format(timeframe: str) -> str:
+    # to_csv escribe solo la fecha si todas las velas del fichero son de medianoche; por bloques se fija por timeframe.
+    return "%Y-%m-%d" if timeframe_to_ms(timeframe) % DAY_MS == 0 else "%Y-%m-%d %H:%M:%S"
+
+
+def iter_ohlcv_blocks(store: OHLCVStore, symbol: str, timeframe: str, start=None, end=None,
+                      block_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Velas de [start, end) en bloques de block_rows filas (el ultimo puede ser menor), abriendo un mes cada vez."""
+    start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+    pending: list[dict[str, np.ndarray]] = []
+    n_pending = 0
+    for month in store.partitions(symbol, timeframe):
+        month_start = np.datetime64(month, "M")
+        month_start_ms = int(month_start.astype("datetime64[ms]").astype(np.int64))
+        month_end_ms = int((month_start + 1).astype("datetime64[ms]").astype(np.int64))
+        lo = month_start_ms if start_ms is None else max(month_start_ms, start_ms)
+        hi = month_end_ms if end_ms is None else min(month_end_ms, end_ms)
+        if hi <= lo:
+            continue
+        columns = store.read(symbol, timeframe, lo, hi)
+        n_month = len(columns[TIMESTAMP_COLUMN])
+        offset = 0
+        while offset < n_month:
+            take = min(block_rows - n_pending, n_month - offset)
+            pending.append({column: values[offset:offset + take] for column, values in columns.items()})
+            n_pending += take
+            offset += take
+            if n_pending == block_rows:
+                yield columns_to_dataframe({column: np.concatenate([piece[column] for piece in pending]) for column in columns})
+                pending, n_pending = [], 0
+    if n_pending:
+        yield columns_to_dataframe({column: np.concatenate([piece[column] for piece in pending]) for column in pending[0]})
+
+
+class ChunkedIndicators:
+    """
+    RSI, Bandas de Bollinger y ATR de bloques consecutivos, como rsi_columns, bollinger_columns y atr_columns
+    sobre la serie completa (las bandas, salvo redondeo). Entre bloques se guarda el ultimo cierre, las medias
+    exponenciales (que se usan como semilla del ewm del bloque siguiente) y los ultimos cierres de la ventana
+    de Bollinger.
+    """
+
+    def __init__(self, rsi_period: int = 14, bb_period: int = 20, bb_std_dev: float = 2, atr_period: int = 14):
+        self.rsi_period = rsi_period
+        self.bb_period = bb_period
+        self.bb_std_dev = bb_std_dev
+        self.atr_period = atr_period
+        self.n_rows = 0
+        self.prev_close = np.nan
+        self.avg_gain = np.nan
+        self.avg_loss = np.nan
+        self.atr = np.nan
+        self.close_tail = np.empty(0)
+
+    def _seeded_ewm(self, values: pd.Series, seed: float, **ewm_kwargs) -> pd.Series:
+        # Sin semilla (primer bloque) el NaN inicial se ignora igual que el primer diff()/shift() de la serie completa.
+        extended = pd.concat([pd.Series([seed]), values], ignore_index=True)
+        return extended.ewm(adjust=False, **ewm_kwargs).mean()
+
+    def compute(self, block: pd.DataFrame) -> dict[str, np.ndarray]:
+        high = block['High'].to_numpy(dtype=np.float64)
+        low = block['Low'].to_numpy(dtype=np.float64)
+        close = block['Close'].to_numpy(dtype=np.float64)
+        prev_close = pd.Series(np.r_[self.prev_close, close[:-1]])
+
+        # RSI (rsi_columns): sin min_periods en el ewm; las primeras rsi_period velas de la serie se anulan despues.
+        delta = pd.Series(close) - prev_close
+        gain = delta.clip(lower=0)
+        loss = -delta.clip(upper=0)
+        avg_gain = self._seeded_ewm(gain, self.avg_gain, com=self.rsi_period - 1)
+        avg_loss = self._seeded_ewm(loss, self.avg_loss, com=self.rsi_period - 1)
+        rs = avg_gain / avg_loss
+        rsi = (100 - (100 / (1 + rs))).to_numpy(copy=True)[1:]
+        rsi[:max(0, self.rsi_period - self.n_rows)] = np.nan
+
+        # Bandas de Bollinger (bollinger_columns) sobre los ultimos bb_period - 1 cierres del bloque anterior y el bloque.
+        extended_close = np.r_[self.close_tail, close]
+        bollinger = bollinger_columns(pd.DataFrame({'Close': extended_close}), self.bb_period, self.bb_std_dev)
+
+        # ATR (atr_columns)
+        high_low = pd.Series(high - low)
+        high_close = (pd.Series(high) - prev_close).abs()
+        low_close = (pd.Series(low) - prev_close).abs()
+        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+        atr = self._seeded_ewm(tr, self.atr, alpha=1 / self.atr_period)
+
+        if len(close):
+            self.n_rows += len(close)
+            self.prev_close = close[-1]
+            self.avg_gain = avg_gain.iloc[-1]
+            self.avg_loss = avg_loss.iloc[-1]
+            self.atr = atr.iloc[-1]
+            self.close_tail = extended_close[-(self.bb_period - 1):] if self.bb_period > 1 else np.empty(0)
+
+        columns = {'RSI': rsi}
+        columns.update({name: values.to_numpy()[len(extended_close) - len(close):] for name, values in bollinger.items()})
+        columns['ATR'] = atr.to_numpy()[1:]
+        return columns
+
+
+def run_chunked_backtest(
+        symbol: str,
+        timeframe: str,
+        start,
+        end,
+        params: dict,
+        settings: dict,
+        chunk_rows: int,
+        annotated_path: str | None = None,
+        quiet: bool = False,
+        report_path: str | None = None,
+        store: OHLCVStore | None = None,
+        use_numba: bool | None = None,
+        base_timeframe: str | None = None) -> tuple[float, list[dict]]:
+    """
+    Backtest de la divergencia alcista por bloques de chunk_rows velas. params son los de la estrategia
+    (formato de DEFAULT_PARAMETERS) y settings el capital inicial, la comision y el riesgo por operacion.
+    Con base_timeframe las velas se leen como en load_resampled: la serie guardada o la derivada de la base.
+    La memoria depende de chunk_rows y no de la longitud del rango. Devuelve (capital final, trade_log).
+    """
+    store = store or OHLCVStore()
+    series = timeframe if base_timeframe is None else candle_series(store, symbol, timeframe, base_timeframe)
+    wait = params['confirmation_wait_candles']
+    lookback = params['pivot_lookback_window']
+    # Velas ya cerradas que necesitan los pivotes pendientes: su ventana hacia atras y la busqueda de volumen.
+    context_rows = wait + max(lookback - 1, params['volume_search_window'])
+
+    date_format = annotated_date_format(timeframe)
+    indicators = ChunkedIndicators(params['rsi_period'], params['bb_period'], params['bb_std_dev'], params['atr_period'])
+    state = new_state(settings['initial_capital'])
+    logger.info(f"Iniciando simulacion por trozos de {chunk_rows:,} velas con Capital: ${settings['initial_capital']:,.2f}")
+    if report_path:
+        open(report_path, "w").close()
+
+    kept = None             # Velas de contexto (ya cerradas) y velas pendientes del bloque anterior
+    kept_start = 0          # Posicion en la serie completa de la primera vela de kept
+    n_final_kept = 0        # Velas de kept ya escritas y simuladas
+    last_pivot = None       # (posicion, RSI, cierre) del pivote de referencia para emparejar
+    n_simulated = 0         # Velas simuladas hasta ahora (posicion de la siguiente en la simulacion)
+    last_simulated = None   # Ultima vela simulada, para el cierre forzado final
+    all_events = []
+    header = True
+
+    blocks = iter_ohlcv_blocks(store, symbol, series, start, end, chunk_rows)
+    block = next(blocks, None)
+    if block is None:
+        raise FileNotFoundError(f"No hay velas de {symbol} {timeframe} en '{store.root}' para el rango [{start}, {end}).")
+    while block is not None:
+        next_block = next(blocks, None)
+        is_last = next_block is None
+
+        for column, values in indicators.compute(block).items():
+            block[column] = values
+        buffer = block if kept is None else pd.concat([kept, block])
+        final_from = n_final_kept
+        # Las ultimas wait velas aun pueden ser pivote cuando lleguen las siguientes: quedan pendientes.
+        final_to = len(buffer) if is_last else len(buffer) - wait
+
+        if final_to > final_from:
+            pivot_low = rsi_pivot_lows(buffer['RSI'], lookback, wait)
+            candidates = np.flatnonzero(pivot_low.to_numpy(dtype=bool)[max(0, final_from - wait):max(0, final_to - wait)])
+            candidates += max(0, final_from - wait)
+
+            positions = kept_start + candidates
+            pivot_rsi = buffer['RSI'].to_numpy(dtype=np.float64)[candidates]
+            pivot_close = buffer['Close'].to_numpy(dtype=np.float64)[candidates]
+            if last_pivot is not None:
+                positions = np.r_[last_pivot[0], positions]
+                pivot_rsi = np.r_[last_pivot[1], pivot_rsi]
+                pivot_close = np.r_[last_pivot[2], pivot_close]
+
+            signal = np.zeros(len(buffer), dtype=bool)
+            generating_pivot_pos = np.full(len(buffer), -1, dtype=np.int64)
+            if len(positions):
+                signal_positions, pivot_positions, last = _pair_divergence_pivots(
+                    positions, pivot_rsi, pivot_close, params['min_distance_between_pivots'], wait, kept_start + len(buffer))
+                signal[signal_positions - kept_start] = True
+                generating_pivot_pos[signal_positions - kept_start] = pivot_positions - kept_start
+                last_pivot = (positions[last], pivot_rsi[last], pivot_close[last])
+
+            buffer['rsi_pivot_low'] = pivot_low
+            buffer['bullish_divergence_signal'] = signal
+            buffer['generating_pivot_pos'] = generating_pivot_pos
+            buffer = precalculate_entry_filters(buffer, params['volume_search_window'], settings['fee_rate'],
+                                                params['volume_threshold_multiplier'])
+
+            final = buffer.iloc[final_from:final_to]
+            if annotated_path:
+                final.to_csv(annotated_path, mode="w" if header else "a", header=header, date_format=date_format)
+                header = False
+
+            simulated = final.dropna(subset=['RSI', 'BB_Mid', 'ATR'])
+            state, events = simulate_arrays(build_simulation_arrays(simulated), settings['initial_capital'], settings['fee_rate'],
+                                            settings['risk_per_trade_pct'], params['max_candles_open'], use_numba,
+                                            state=state, close_at_end=False)
+            if not quiet:
+                log_simulation_events(simulated, events)
+            if report_path:
+                write_event_report(simulated, events, report_path, mode="a")
+            # Las posiciones de la simulacion son locales al bloque: la entrada abierta queda en negativo
+            # respecto al bloque siguiente y los eventos se pasan a posiciones de la serie simulada completa.
+            state[ST_ENTRY_INDEX] -= len(simulated)
+            events[:, EV_BAR] += n_simulated
+            all_events.append(events)
+            n_simulated += len(simulated)
+            if len(simulated):
+                last_simulated = simulated.iloc[-1:]
+            n_final = final_to
+        else:
+            n_final = final_from
+
+        keep_from = max(0, n_final - context_rows)
+        kept = buffer.iloc[keep_from:][OHLCV_COLUMNS + INDICATOR_COLUMNS]
+        kept_start += keep_from
+        n_final_kept = n_final - keep_from
+        block = next_block
+
+    if state[ST_IN_TRADE] != 0.0 and last_simulated is not None:
+        events = np.empty((1, EVENT_FIELDS), dtype=np.float64)
+        n_events = close_open_trade_py(state, 0, float(last_simulated['Close'].iloc[0]), float(settings['fee_rate']), events, 0)
+        events = events[:n_events]
+        if not quiet:
+            log_simulation_events(last_simulated, events)
+        if report_path:
+            write_event_report(last_simulated, events, report_path, mode="a")
+        events[:, EV_BAR] = n_simulated - 1
+        all_events.append(events)
+
+    events = np.concatenate(all_events) if all_events else np.empty((0, EVENT_FIELDS))
+    if report_path:
+        logger.info(f"Detalle de operaciones en '{report_path}'.")
+    return float(state[ST_CAPITAL]), events_to_trade_log(events)
+
+
+def check_chunked_backtest(store: OHLCVStore, symbol: str, timeframe: str, params: dict, settings: dict,
+                           chunk_sizes: list[int]) -> None:
+    """
+    Compara el backtest por trozos con el de la serie completa (run_backtest_job) para cada tamanio de bloque:
+    indicadores con np.allclose, y capital final (np.isclose) y numero de operaciones.
+    params son los de PARAMETERS_TIMEFRAME, como en run_backtest_job.
+    """
+    in_memory = run_backtest_job(symbol, timeframe, None, None, params, settings, store)
+    params = scale_candle_parameters(params, PARAMETERS_TIMEFRAME, timeframe)
+    df = load_ohlcv(symbol, timeframe, store=store)
+    expected = IndicatorStore().with_indicators(
+        df, indicator_specs(params['rsi_period'], params['bb_period'], params['bb_std_dev'], params['atr_period']))
+    for chunk_rows in chunk_sizes:
+        indicators = ChunkedIndicators(params['rsi_period'], params['bb_period'], params['bb_std_dev'], params['atr_period'])
+        blocks = [indicators.compute(block) for block in iter_ohlcv_blocks(store, symbol, timeframe, block_rows=chunk_rows)]
+        for name in INDICATOR_COLUMNS:
+            assert np.allclose(np.concatenate([block[name] for block in blocks]), expected[name], equal_nan=True), \
+                f"{name} por trozos de {chunk_rows} no coincide con la serie completa"
+        final_capital, trades = run_chunked_backtest(symbol, timeframe, None, None, params, settings, chunk_rows,
+                                                     quiet=True, store=store)
+        assert np.isclose(final_capital, in_memory['final_capital']), f"Capital distinto por trozos de {chunk_rows}"
+        assert len(trades) == len(in_memory['trades']), f"Numero de operaciones distinto por trozos de {chunk_rows}"
+        logger.info(f"Trozos de {chunk_rows:,} velas: capital ${final_capital:,.2f}, {len(trades)} operaciones "
+                    f"(en memoria ${in_memory['final_capital']:,.2f}, {len(in_memory['trades'])}).")
+
+
+if __name__ == '__main__':
+    from src.benchmarks.synthetic_data import generate_ohlcv
+
+    parser = argparse.ArgumentParser(description="Compara el backtest por trozos con el de la serie completa sobre velas sinteticas.")
+    parser.add_argument("--bars", type=int, default=200_000)
+    parser.add_argument("--timeframe", default="15m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, nargs="+", default=[997, 10_000, 100_000])
+    args = parser.parse_args()
+
+    define_logging("chunked_backtest_log.txt")
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = OHLCVStore(work_dir)
+        df = generate_ohlcv(args.bars, args.seed, args.timeframe, start="2021-01-01")
+        timestamps = df.index.to_numpy(dtype="datetime64[ms]").view(np.int64).astype(np.float64)
+        store.write("BTC/USDT", args.timeframe, np.column_stack([timestamps] + [df[column] for column in OHLCV_COLUMNS]))
+        check_chunked_backtest(store, "BTC/USDT", args.timeframe, DEFAULT_PARAMETERS, DEFAULT_SETTINGS,
+                               args.chunk_rows)
@@ -0,0 +1,144 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from src.utils import define_logging
+
+logger = logging.getLogger(__name__)
+
+# Robustez de un backtest por Monte Carlo sobre su tabla de operaciones (events_to_trades o el CSV de --trades).
+# Las operaciones no se solapan y cada una arriesga risk_per_trade_pct del capital al entrar, asi que su
+# P&L es capital * risk_per_trade_pct * R: el capital tras k operaciones es el producto acumulado de
+# (1 + risk_per_trade_pct * R). Cada remuestreo es una fila de una matriz (remuestreos x operaciones) y la
+# curva, la maxima caida y el capital final se calculan con cumprod/maximum.accumulate por filas.
+
+RESAMPLING_METHODS = ('bootstrap', 'permutation')
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def trade_return_components(trades, fee_rate: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    R bruto de cada operacion (sin comisiones) y volumen negociado (entrada mas salidas), ambos en unidades
+    del riesgo al entrar. Con otra comision f y un deslizamiento s por lado, R = bruto - (f + s) * volumen.
+    """
+    size = np.asarray(trades['size'], dtype=np.float64)
+    entry_notional = size * np.asarray(trades['entry_price'], dtype=np.float64)
+    fees = np.asarray(trades['fees'], dtype=np.float64)
+    entry_fee = np.asarray(trades['cost'], dtype=np.float64) - entry_notional
+    if fee_rate > 0:
+        exit_notional = (fees - entry_fee) / fee_rate
+    else:
+        # Sin comisiones no se puede deducir el precio del TP1: se aproxima con el del cierre final.
+        exit_notional = size * np.asarray(trades['exit_price'], dtype=np.float64)
+    risk_usd = np.asarray(trades['risk_usd'], dtype=np.float64)
+    gross_r = (np.asarray(trades['pnl'], dtype=np.float64) + fees) / risk_usd
+    return gross_r, (entry_notional + exit_notional) / risk_usd
+
+
+def _resample_indices(rng: np.random.Generator, method: str, n_rows: int, n_trades: int) -> np.ndarray:
+    if method == 'bootstrap':
+        return rng.integers(0, n_trades, size=(n_rows, n_trades))
+    return rng.permuted(np.broadcast_to(np.arange(n_trades), (n_rows, n_trades)), axis=1)
+
+
+def monte_carlo(
+        trades,
+        initial_capital: float,
+        fee_rate: float,
+        risk_per_trade_pct: float,
+        n_resamples: int = 10000,
+        method: str = 'bootstrap',
+        fee_rate_spread: float = 0.0,
+        max_slippage: float = 0.0,
+        seed: int | None = None,
+        chunk_size: int = 2000) -> dict[str, np.ndarray]:
+    """
+    Remuestrea la secuencia de operaciones n_resamples veces: 'bootstrap' (con reemplazo) o 'permutation'
+    (mismo conjunto en otro orden: cambia la caida, no el capital final salvo por las perturbaciones).
+    Cada remuestreo usa una comision fee_rate * U(1 - fee_rate_spread, 1 + fee_rate_spread) y cada
+    operacion un deslizamiento U(0, max_slippage) por lado (fraccion del precio). Precios y tamanios son
+    los del backtest; si una perdida supera el capital, este queda en 0.
+    Devuelve por remuestreo el capital final, la maxima caida (%) sobre el capital tras cada cierre y la
+    comision usada. Se procesa por bloques de chunk_size filas para acotar la memoria.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"Metodo de remuestreo desconocido: {method}. Opciones: {', '.join(RESAMPLING_METHODS)}")
+    gross_r, turnover_r = trade_return_components(trades, fee_rate)
+    n_trades = len(gross_r)
+    rng = np.random.default_rng(seed)
+    fee_rates = fee_rate * rng.uniform(1 - fee_rate_spread, 1 + fee_rate_spread, size=n_resamples)
+    final_capital = np.full(n_resamples, float(initial_capital))
+    max_drawdown = np.zeros(n_resamples)
+    if n_trades == 0:
+        return {'final_capital': final_capital, 'max_drawdown_pct': max_drawdown, 'fee_rate': fee_rates}
+
+    for start in range(0, n_resamples, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_resamples))
+        n_rows = rows.stop - rows.start
+        indices = _resample_indices(rng, method, n_rows, n_trades)
+        costs = fee_rates[rows, None]
+        if max_slippage:
+            costs = costs + rng.uniform(0.0, max_slippage, size=(n_rows, n_trades))
+        # Factor de crecimiento del capital en cada operacion: 1 + riesgo * R.
+        growth = 1 + risk_per_trade_pct * (gross_r[indices] - costs * turnover_r[indices])
+        np.maximum(growth, 0.0, out=growth)
+        capital = np.cumprod(growth, axis=1, out=growth)
+        # Maxima caida sobre la curva relativa al capital inicial (el maximo previo empieza en 1).
+        peak = np.maximum.accumulate(capital, axis=1)
+        np.maximum(peak, 1.0, out=peak)
+        max_drawdown[rows] = ((peak - capital) / peak).max(axis=1) * 100
+        final_capital[rows] = initial_capital * capital[:, -1]
+    return {'final_capital': final_capital, 'max_drawdown_pct': max_drawdown, 'fee_rate': fee_rates}
+
+
+def monte_carlo_summary(result: dict[str, np.ndarray], initial_capital: float,
+                        percentiles: tuple = PERCENTILES) -> dict:
+    """Media y percentiles del capital final y de la maxima caida, y probabilidad de acabar en perdidas."""
+    final_capital = result['final_capital']
+    summary = {'resamples': len(final_capital),
+               'loss_probability_pct': float((final_capital < initial_capital).mean() * 100)}
+    for name in ('final_capital', 'max_drawdown_pct'):
+        values = result[name]
+        summary[name] = {'mean': float(values.mean()),
+                         **{f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}}
+    return summary
+
+
+def format_monte_carlo(summary: dict) -> str:
+    """Resumen legible de monte_carlo_summary para el log."""
+    def row(stats: dict, fmt: str) -> str:
+        return " | ".join(f"{name} {fmt.format(value)}" for name, value in stats.items())
+
+    return "\n".join([
+        f"Remuestreos:        {summary['resamples']}",
+        f"Capital final:      {row(summary['final_capital'], '${:,.2f}')}",
+        f"Maxima caida:       {row(summary['max_drawdown_pct'], '{:.2f}%')}",
+        f"Prob. de perdidas:  {summary['loss_probability_pct']:.2f}%",
+    ])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo de la tabla de operaciones de un backtest (CSV de --trades).")
+    parser.add_argument("trades", help="CSV con la tabla de operaciones (bullish_backtest --trades).")
+    parser.add_argument("--initial-capital", type=float, default=10000.0)
+    parser.add_argument("--fee-rate", type=float, default=0.001, help="Comision con la que se hizo el backtest.")
+    parser.add_argument("--risk-per-trade-pct", type=float, default=0.01)
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--method", choices=RESAMPLING_METHODS, default="bootstrap")
+    parser.add_argument("--fee-spread", type=float, default=0.0, help="Variacion relativa maxima de la comision (0.5 = +-50%%).")
+    parser.add_argument("--max-slippage", type=float, default=0.0, help="Deslizamiento maximo por lado (fraccion del precio).")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="CSV con el capital final, la maxima caida y la comision de cada remuestreo.")
+    args = parser.parse_args()
+
+    define_logging("monte_carlo_log.txt")
+    trades = pd.read_csv(args.trades)
+    start = time.perf_counter()
+    result = monte_carlo(trades, args.initial_capital, args.fee_rate, args.risk_per_trade_pct, args.resamples,
+                         args.method, args.fee_spread, args.max_slippage, args.seed)
+    logger.info(f"Monte Carlo de {len(trades)} operaciones en {time.perf_counter() - start:.2f}s:\n"
+                f"{format_monte_carlo(monte_carlo_summary(result, args.initial_capital))}")
+    if args.output:
+        pd.DataFrame(result).to_csv(args.output, index=False)
+        logger.info(f"Remuestreos en '{args.output}'.")
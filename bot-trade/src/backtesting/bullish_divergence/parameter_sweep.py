@@ -0,0 +1,271 @@
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from src.utils import define_logging
+from src.get_training_data.resampling import load_resampled
+from src.backtesting.utils_backtesting import scale_candle_parameters
+from src.backtesting.indicator_store import IndicatorStore, dataset_fingerprint, indicator_specs
+from .bullish_backtest_functions import find_divergence_signals, precalculate_entry_filters
+from .simulation_engine import (
+    build_simulation_arrays, simulate_arrays, events_to_trades, equity_curve,
+    ST_CAPITAL,
+)
+from .performance_analytics import performance_metrics, infer_bars_per_year
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Metricas de performance_metrics que se anaden a cada fila del barrido.
+SWEEP_METRICS = ('sharpe', 'sortino', 'profit_factor', 'exposure_pct', 'win_rate_pct', 'avg_r_multiple')
+
+# Parametros agrupados por la etapa del pipeline que los consume.
+# Las combinaciones que comparten los de una etapa reutilizan su resultado.
+INDICATOR_PARAMS = ('rsi_period', 'bb_period', 'bb_std_dev', 'atr_period')
+SIGNAL_PARAMS = ('pivot_lookback_window', 'confirmation_wait_candles', 'min_distance_between_pivots')
+FILTER_PARAMS = ('volume_search_window', 'volume_threshold_multiplier')
+SIMULATION_PARAMS = ('max_candles_open',)
+
+# Mismos valores que run_backtesting.
+DEFAULT_PARAMETERS = {
+    'rsi_period': 14,
+    'bb_period': 20,
+    'bb_std_dev': 2,
+    'atr_period': 14,
+    'pivot_lookback_window': 15,
+    'confirmation_wait_candles': 3,
+    'min_distance_between_pivots': 30,
+    'volume_search_window': 100,
+    'volume_threshold_multiplier': 1.5,
+    'max_candles_open': 48,
+}
+
+# Timeframe en el que estan calibrados los parametros en velas de DEFAULT_PARAMETERS y DEFAULT_GRID.
+PARAMETERS_TIMEFRAME = '1h'
+
+DEFAULT_GRID = {
+    'rsi_period': [10, 14, 21],
+    'pivot_lookback_window': [10, 15, 20],
+    'confirmation_wait_candles': [2, 3, 4],
+    'min_distance_between_pivots': [20, 30, 45],
+    'volume_search_window': [50, 100],
+    'max_candles_open': [24, 48, 96],
+}
+
+# OHLCV compartido por los procesos del pool (se adjunta una vez por proceso en el initializer).
+_shared_ohlcv: dict = {}
+# Cada proceso conserva sus indicadores entre tareas: las tareas de un mismo grupo no los recalculan.
+_worker_indicator_store = IndicatorStore()
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    """Producto cartesiano del grid. Los parametros que no aparecen toman su valor por defecto."""
+    names = list(grid)
+    return [{**DEFAULT_PARAMETERS, **dict(zip(names, values))} for values in itertools.product(*grid.values())]
+
+
+def sample_grid(grid: dict[str, list], n_samples: int, seed: int = 0) -> list[dict]:
+    """Busqueda aleatoria: n_samples combinaciones distintas tomadas del grid."""
+    rng = np.random.default_rng(seed)
+    total = int(np.prod([len(values) for values in grid.values()]))
+    n_samples = min(n_samples, total)
+    seen = set()
+    combinations = []
+    while len(combinations) < n_samples:
+        values = tuple(values[rng.integers(len(values))] for values in grid.values())
+        if values in seen:
+            continue
+        seen.add(values)
+        combinations.append({**DEFAULT_PARAMETERS, **dict(zip(grid, values))})
+    return combinations
+
+
+def scale_combinations(combinations: list[dict], timeframe: str) -> list[dict]:
+    """
+    Combinaciones traducidas de PARAMETERS_TIMEFRAME a timeframe (scale_candle_parameters: misma duracion en
+    velas del otro timeframe). Las que coinciden tras redondear se evaluan una sola vez.
+    """
+    scaled = {}
+    for params in combinations:
+        params = scale_candle_parameters(params, PARAMETERS_TIMEFRAME, timeframe)
+        scaled.setdefault(tuple(params.items()), params)
+    return list(scaled.values())
+
+
+def _key(params: dict, names: tuple) -> tuple:
+    return tuple(params[name] for name in names)
+
+
+def build_tasks(combinations: list[dict], n_workers: int) -> list[list[dict]]:
+    """
+    Agrupa las combinaciones por parametros de indicadores (y dentro, por parametros de seniales),
+    para que cada tarea calcule cada indicador y cada conjunto de seniales una sola vez.
+    Los grupos grandes se trocean para repartir la carga entre todos los procesos.
+    """
+    ordered = sorted(combinations, key=lambda p: (_key(p, INDICATOR_PARAMS), _key(p, SIGNAL_PARAMS), _key(p, FILTER_PARAMS)))
+    chunk_size = max(1, len(ordered) // (n_workers * 4))
+    tasks = []
+    for _, group in itertools.groupby(ordered, key=lambda p: _key(p, INDICATOR_PARAMS)):
+        group = list(group)
+        tasks.extend(group[i:i + chunk_size] for i in range(0, len(group), chunk_size))
+    return tasks
+
+
+def _share_ohlcv(df: pd.DataFrame) -> tuple[shared_memory.SharedMemory, dict]:
+    """Copia OHLCV e indice a memoria compartida (columnas contiguas) y devuelve su descripcion."""
+    n_rows = len(df.index)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, (len(OHLCV_COLUMNS) + 1) * n_rows * 8))
+    buffer = np.ndarray((len(OHLCV_COLUMNS) + 1, n_rows), dtype=np.float64, buffer=shm.buf)
+    buffer[:len(OHLCV_COLUMNS)] = df[OHLCV_COLUMNS].to_numpy(dtype=np.float64).T
+    buffer[len(OHLCV_COLUMNS)] = df.index.to_numpy(dtype='datetime64[ns]').view(np.int64).view(np.float64)
+    return shm, {'name': shm.name, 'n_rows': n_rows, 'dataset_key': dataset_fingerprint(df)}
+
+
+def _attach_shared_ohlcv(description: dict) -> None:
+    shm = shared_memory.SharedMemory(name=description['name'])
+    _shared_ohlcv['shm'] = shm
+    _shared_ohlcv['n_rows'] = description['n_rows']
+    _shared_ohlcv['dataset_key'] = description['dataset_key']
+
+
+def _shared_frame() -> pd.DataFrame:
+    """DataFrame sobre la memoria compartida sin copiar los datos OHLCV."""
+    n_rows = _shared_ohlcv['n_rows']
+    buffer = np.ndarray((len(OHLCV_COLUMNS) + 1, n_rows), dtype=np.float64, buffer=_shared_ohlcv['shm'].buf)
+    index = pd.DatetimeIndex(buffer[len(OHLCV_COLUMNS)].view('M8[ns]'), name='TimeStamp')
+    return pd.DataFrame({name: buffer[k] for k, name in enumerate(OHLCV_COLUMNS)}, index=index, copy=False)
+
+
+def evaluate_combinations(
+        df: pd.DataFrame,
+        combinations: list[dict],
+        settings: dict,
+        indicator_store: IndicatorStore | None = None,
+        dataset_key: str | None = None,
+        window: slice | None = None) -> list[dict]:
+    """
+    Ejecuta el pipeline completo para combinaciones que comparten parametros de indicadores,
+    reutilizando indicadores (via IndicatorStore), seniales y filtros entre ellas.
+    Con window (posiciones de vela) solo se simula ese tramo; los indicadores se calculan sobre toda la serie
+    y se recortan despues, asi el tramo empieza con los indicadores ya "calientes".
+    """
+    results = []
+    indicator_store = indicator_store or IndicatorStore()
+    first = combinations[0]
+    specs = indicator_specs(first['rsi_period'], first['bb_period'], first['bb_std_dev'], first['atr_period'])
+    indicators_df = indicator_store.with_indicators(df, specs, dataset_key)
+    if window is not None:
+        indicators_df = indicators_df.iloc[window]
+    periods_per_year = infer_bars_per_year(indicators_df.index) # type: ignore
+
+    signals_cache: dict[tuple, pd.DataFrame] = {}
+    filters_cache: dict[tuple, dict[str, np.ndarray]] = {}
+    for params in combinations:
+        signal_key = _key(params, SIGNAL_PARAMS)
+        if signal_key not in signals_cache:
+            signals_cache.clear()
+            filters_cache.clear()
+            signals_cache[signal_key] = find_divergence_signals(indicators_df.copy(deep=False), *signal_key)
+
+        filter_key = _key(params, FILTER_PARAMS)
+        if filter_key not in filters_cache:
+            filtered = precalculate_entry_filters(
+                signals_cache[signal_key].copy(deep=False),
+                params['volume_search_window'],
+                settings['fee_rate'],
+                params['volume_threshold_multiplier'],
+            )
+            filtered = filtered.dropna(subset=['RSI', 'BB_Mid', 'ATR'])
+            filters_cache[filter_key] = build_simulation_arrays(filtered)
+
+        state, events = simulate_arrays(
+            filters_cache[filter_key],
+            settings['initial_capital'],
+            settings['fee_rate'],
+            settings['risk_per_trade_pct'],
+            params['max_candles_open'],
+        )
+        final_capital = float(state[ST_CAPITAL])
+        arrays = filters_cache[filter_key]
+        metrics = performance_metrics(
+            equity_curve(events, arrays['close'], settings['initial_capital']),
+            events_to_trades(events, settings['fee_rate']),
+            arrays['high'], arrays['low'], periods_per_year, settings['initial_capital'],
+        )
+        results.append({
+            **params,
+            'final_capital': final_capital,
+            'pnl_pct': (final_capital - settings['initial_capital']) / settings['initial_capital'] * 100,
+            'trades': metrics['trades'],
+            'max_drawdown_pct': metrics['max_drawdown_pct'],
+            **{name: metrics[name] for name in SWEEP_METRICS},
+        })
+    return results
+
+
+def _evaluate_task(combinations: list[dict], settings: dict) -> list[dict]:
+    return evaluate_combinations(_shared_frame(), combinations, settings, _worker_indicator_store, _shared_ohlcv['dataset_key'])
+
+
+def run_parameter_sweep(
+        df: pd.DataFrame,
+        combinations: list[dict],
+        initial_capital: float,
+        fee_rate: float,
+        risk_per_trade_pct: float,
+        max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Evalua todas las combinaciones en un ProcessPoolExecutor. Los datos OHLCV se copian una sola vez
+    a memoria compartida y cada proceso trabaja sobre ellos sin volver a leer el CSV.
+    Devuelve una tabla con una fila por combinacion, ordenada por capital final.
+    """
+    settings = {'initial_capital': initial_capital, 'fee_rate': fee_rate, 'risk_per_trade_pct': risk_per_trade_pct}
+    max_workers = max_workers or os.cpu_count() or 1
+    tasks = build_tasks(combinations, max_workers)
+    logger.info(f"Barrido de {len(combinations)} combinaciones en {len(tasks)} tareas con {max_workers} procesos...")
+
+    shm, description = _share_ohlcv(df)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_shared_ohlcv, initargs=(description,)) as executor:
+            futures = [executor.submit(_evaluate_task, task, settings) for task in tasks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                results.extend(future.result())
+                logger.info(f"Tareas completadas: {done}/{len(tasks)} ({len(results)} combinaciones)")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if not results:
+        return pd.DataFrame(results)
+    return pd.DataFrame(results).sort_values('final_capital', ascending=False, ignore_index=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Barrido de parametros de la estrategia de divergencia alcista.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--year", type=int, default=2021)
+    parser.add_argument("--random", type=int, default=0, help="Numero de combinaciones aleatorias (0 = grid completo).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    define_logging("parameter_sweep_log.txt")
+    df = load_resampled(args.symbol, args.timeframe, f"{args.year}-01-01", f"{args.year + 1}-01-01")
+    combinations = sample_grid(DEFAULT_GRID, args.random, args.seed) if args.random else expand_grid(DEFAULT_GRID)
+    combinations = scale_combinations(combinations, args.timeframe)
+
+    start = time.perf_counter()
+    results = run_parameter_sweep(df, combinations, initial_capital=10000.0, fee_rate=0.001,
+                                  risk_per_trade_pct=0.01, max_workers=args.workers)
+    output_filename = f"parameter_sweep_{args.timeframe}_{args.year}.csv"
+    results.to_csv(output_filename, index=False)
+    logger.info(f"{len(results)} combinaciones en {time.perf_counter() - start:.1f}s. Resultados en '{output_filename}'.")
+    logger.info(f"Mejores combinaciones:\n{results.head(10).to_string()}")
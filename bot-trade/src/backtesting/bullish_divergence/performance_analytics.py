@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from src.get_training_data.ohlcv_store import timeframe_to_ms
+from .simulation_engine import TRADE_EXIT_NAMES
+
+# Metricas de rendimiento de un backtest a partir de la curva de capital por vela y de la tabla de
+# operaciones (equity_curve / events_to_trades). Todo son operaciones vectorizadas de NumPy sobre
+# arrays ya calculados, asi que se pueden evaluar en cada combinacion de un barrido de parametros.
+
+MS_PER_YEAR = 365 * 24 * 3600 * 1000
+
+
+def bars_per_year(timeframe: str) -> float:
+    return MS_PER_YEAR / timeframe_to_ms(timeframe)
+
+
+def infer_bars_per_year(index: pd.DatetimeIndex) -> float:
+    """Velas por anio segun la separacion mediana del indice (cuando no se conoce el timeframe)."""
+    if len(index) < 2:
+        return np.nan
+    spacing_ms = np.median(np.diff(index.to_numpy(dtype='datetime64[ms]').view(np.int64)))
+    return MS_PER_YEAR / spacing_ms if spacing_ms > 0 else np.nan
+
+
+def trade_excursions(trades: np.ndarray, high: np.ndarray, low: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    MAE y MFE de cada operacion en % del precio de entrada: minimo y maximo alcanzados entre la vela
+    siguiente a la entrada (se entra al cierre) y la vela de salida, ambas incluidas.
+    """
+    if len(trades) == 0:
+        return np.empty(0), np.empty(0)
+    # Las operaciones no se solapan: sus ventanas [entrada + 1, salida + 1) son crecientes y disjuntas.
+    bounds = np.column_stack((trades['entry_bar'] + 1, trades['exit_bar'] + 1)).ravel()
+    lowest = np.minimum.reduceat(np.append(low, np.inf), bounds)[::2]
+    highest = np.maximum.reduceat(np.append(high, -np.inf), bounds)[::2]
+    entry_price = trades['entry_price']
+    return (lowest - entry_price) / entry_price * 100, (highest - entry_price) / entry_price * 100
+
+
+def max_drawdown_pct(equity: np.ndarray) -> float:
+    """Maxima caida porcentual desde un maximo previo de la curva de capital."""
+    if len(equity) == 0:
+        return 0.0
+    running_max = np.maximum.accumulate(equity)
+    return float(((running_max - equity) / running_max).max() * 100)
+
+
+def performance_metrics(
+        equity: np.ndarray,
+        trades: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        periods_per_year: float,
+        initial_capital: float) -> dict:
+    """
+    Metricas del backtest en una sola pasada: rentabilidad, maxima caida, Sharpe y Sortino anualizados
+    (rendimientos por vela de la curva de capital), profit factor, exposicion, tasa de acierto global y
+    por motivo de salida, R medio y MAE/MFE medios. 'by_exit_reason' es el unico valor no escalar.
+    """
+    previous_equity = np.concatenate(([initial_capital], equity[:-1]))
+    returns = equity / previous_equity - 1
+    mean_return = returns.mean() if len(returns) else np.nan
+    std_return = returns.std(ddof=1) if len(returns) > 1 else np.nan
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2)) if len(returns) else np.nan
+    annualization = np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = mean_return / std_return * annualization if std_return > 0 else np.nan
+        sortino = mean_return / downside * annualization if downside > 0 else np.nan
+
+    pnl = trades['pnl']
+    wins = pnl > 0
+    gross_profit = pnl[wins].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else (np.inf if gross_profit > 0 else np.nan)
+    mae_pct, mfe_pct = trade_excursions(trades, high, low)
+    n_trades = len(trades)
+
+    # Agregados por motivo de salida con bincount sobre el codigo EVT_* de cada cierre.
+    kinds = trades['exit_kind'].astype(np.int64)
+    n_kinds = max(TRADE_EXIT_NAMES) + 1
+    count_by_kind = np.bincount(kinds, minlength=n_kinds)
+    wins_by_kind = np.bincount(kinds, weights=wins, minlength=n_kinds)
+    pnl_by_kind = np.bincount(kinds, weights=pnl, minlength=n_kinds)
+    r_by_kind = np.bincount(kinds, weights=trades['r_multiple'], minlength=n_kinds)
+    by_exit_reason = {
+        name: {
+            'trades': int(count_by_kind[kind]),
+            'win_rate_pct': float(wins_by_kind[kind] / count_by_kind[kind] * 100),
+            'pnl': float(pnl_by_kind[kind]),
+            'avg_r_multiple': float(r_by_kind[kind] / count_by_kind[kind]),
+        }
+        for kind, name in TRADE_EXIT_NAMES.items() if count_by_kind[kind]
+    }
+
+    final_equity = equity[-1] if len(equity) else initial_capital
+    return {
+        'total_return_pct': float((final_equity - initial_capital) / initial_capital * 100),
+        'max_drawdown_pct': max_drawdown_pct(np.concatenate(([initial_capital], equity))),
+        'sharpe': float(sharpe),
+        'sortino': float(sortino),
+        'profit_factor': float(profit_factor),
+        'exposure_pct': float(trades['bars_held'].sum() / len(equity) * 100) if len(equity) else 0.0,
+        'trades': n_trades,
+        'win_rate_pct': float(wins.mean() * 100) if n_trades else np.nan,
+        'avg_r_multiple': float(trades['r_multiple'].mean()) if n_trades else np.nan,
+        'total_fees': float(trades['fees'].sum()),
+        'avg_bars_held': float(trades['bars_held'].mean()) if n_trades else np.nan,
+        'avg_mae_pct': float(mae_pct.mean()) if n_trades else np.nan,
+        'avg_mfe_pct': float(mfe_pct.mean()) if n_trades else np.nan,
+        'by_exit_reason': by_exit_reason,
+    }
+
+
+def trades_frame(trades: np.ndarray, high: np.ndarray, low: np.ndarray) -> pd.DataFrame:
+    """Tabla de operaciones como DataFrame, con el nombre del motivo de salida y MAE/MFE."""
+    frame = pd.DataFrame(trades)
+    frame['exit_reason'] = [TRADE_EXIT_NAMES[int(kind)] for kind in trades['exit_kind']]
+    frame['mae_pct'], frame['mfe_pct'] = trade_excursions(trades, high, low)
+    return frame
+
+
+def format_metrics(metrics: dict) -> str:
+    """Resumen legible de performance_metrics para el log del backtest."""
+    lines = [
+        f"Rentabilidad:       {metrics['total_return_pct']:.2f}%",
+        f"Maxima caida:       {metrics['max_drawdown_pct']:.2f}%",
+        f"Sharpe / Sortino:   {metrics['sharpe']:.2f} / {metrics['sortino']:.2f}",
+        f"Profit factor:      {metrics['profit_factor']:.2f}",
+        f"Exposicion:         {metrics['exposure_pct']:.2f}% de las velas",
+        f"Operaciones:        {metrics['trades']} (aciertos {metrics['win_rate_pct']:.1f}%, R medio {metrics['avg_r_multiple']:.2f})",
+        f"Comisiones:         ${metrics['total_fees']:,.2f}",
+        f"MAE / MFE medios:   {metrics['avg_mae_pct']:.2f}% / {metrics['avg_mfe_pct']:.2f}%",
+    ]
+    for name, stats in metrics['by_exit_reason'].items():
+        lines.append(f"  {name:<13} {stats['trades']:>5} ops | aciertos {stats['win_rate_pct']:5.1f}% | "
+                     f"P&L ${stats['pnl']:,.2f} | R medio {stats['avg_r_multiple']:.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,80 @@
+import argparse
+import logging
+import time
+import pandas as pd
+from src.backtesting.indicator_store import IndicatorStore, indicator_specs, DEFAULT_CACHE_DIR
+from src.backtesting.portfolio_engine import build_portfolio_arrays, simulate_portfolio, portfolio_trade_log
+from src.backtesting.utils_backtesting import scale_candle_parameters
+from src.get_training_data.resampling import load_resampled
+from src.utils import define_logging
+from .bullish_backtest_functions import find_divergence_signals, precalculate_entry_filters
+from .parameter_sweep import DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME
+
+logger = logging.getLogger(__name__)
+
+
+def divergence_portfolio_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas del motor de cartera a partir del DataFrame anotado, con las mismas reglas que simulation_engine."""
+    return pd.DataFrame({
+        'high': df['High'],
+        'low': df['Low'],
+        'close': df['Close'],
+        'stop_price': df['Low'] - df['ATR'],   # SL teorico: minimo de la vela menos un ATR
+        'target_price': df['BB_Mid'],          # TP1: banda media de Bollinger
+        'final_target_price': df['BB_Upper'],  # TP2: banda superior de Bollinger
+        'entry_signal': df['bullish_divergence_signal'].to_numpy(dtype=bool)
+                        & df['volume_confirmation'].fillna(False).to_numpy(dtype=bool),
+    }, index=df.index)
+
+
+def prepare_symbol(df: pd.DataFrame, params: dict, fee_rate: float, indicator_store: IndicatorStore) -> pd.DataFrame:
+    """Indicadores, seniales y filtros de la estrategia para un simbolo."""
+    df = indicator_store.with_indicators(df, indicator_specs(params['rsi_period'], params['bb_period'],
+                                                             params['bb_std_dev'], params['atr_period']))
+    df = find_divergence_signals(df, params['pivot_lookback_window'], params['confirmation_wait_candles'],
+                                 params['min_distance_between_pivots'])
+    df = precalculate_entry_filters(df, params['volume_search_window'], fee_rate, params['volume_threshold_multiplier'])
+    return divergence_portfolio_frame(df.dropna(subset=['RSI', 'BB_Mid', 'ATR']))
+
+
+def run_portfolio_backtest(
+        frames: dict[str, pd.DataFrame],
+        initial_capital: float,
+        fee_rate: float,
+        risk_per_trade_pct: float,
+        max_open_positions: int,
+        params: dict | None = None,
+        indicator_store: IndicatorStore | None = None) -> tuple[float, list[dict], pd.Series]:
+    """
+    Backtest de la divergencia alcista sobre varios simbolos con un capital comun.
+    Devuelve (capital final, trade_log con simbolo, curva de capital).
+    """
+    params = {**DEFAULT_PARAMETERS, **(params or {})}
+    indicator_store = indicator_store or IndicatorStore()
+    prepared = {symbol: prepare_symbol(df, params, fee_rate, indicator_store) for symbol, df in frames.items()}
+    arrays = build_portfolio_arrays(prepared)
+    final_capital, events, equity = simulate_portfolio(arrays, initial_capital, fee_rate, risk_per_trade_pct,
+                                                       params['max_candles_open'], max_open_positions)
+    return final_capital, portfolio_trade_log(events, arrays['symbols']), pd.Series(equity, index=arrays['index'], name='equity')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest de cartera de la divergencia alcista.")
+    parser.add_argument("--symbols", nargs="+", default=["BTC/USDT", "ETH/USDT"])
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--year", type=int, default=2021)
+    parser.add_argument("--max-positions", type=int, default=10)
+    args = parser.parse_args()
+
+    define_logging("portfolio_backtest_log.txt")
+    initial_capital = 10000.0
+    frames = {symbol: load_resampled(symbol, args.timeframe, f"{args.year}-01-01", f"{args.year + 1}-01-01") for symbol in args.symbols}
+    start = time.perf_counter()
+    final_capital, trades, equity = run_portfolio_backtest(frames, initial_capital, fee_rate=0.001, risk_per_trade_pct=0.01,
+                                                           max_open_positions=args.max_positions,
+                                                           params=scale_candle_parameters(DEFAULT_PARAMETERS, PARAMETERS_TIMEFRAME, args.timeframe),
+                                                           indicator_store=IndicatorStore(cache_dir=DEFAULT_CACHE_DIR))
+    pnl = final_capital - initial_capital
+    logger.info(f"{len(frames)} simbolos en {time.perf_counter() - start:.1f}s")
+    logger.info(f"Capital Final: ${final_capital:,.2f} | Ganancia/Perdida: ${pnl:,.2f} ({pnl / initial_capital * 100:.2f}%)")
+    logger.info(f"Operaciones cerradas: {len(trades)} | Capital minimo: ${equity.min():,.2f}")
@@ -0,0 +1,198 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from src.utils import define_logging
+from src.backtesting.jit import NUMBA_AVAILABLE
+from src.benchmarks.synthetic_data import generate_ohlcv
+from .bullish_backtest_functions import calculate_indicators, find_divergence_signals, precalculate_entry_filters
+from .simulation_engine import (
+    build_simulation_arrays, simulate_arrays, events_to_trade_log, events_to_trades, equity_curve,
+    ST_CAPITAL, ST_IN_TRADE, ST_POSITION_SIZE, ST_ENTRY_INDEX, EV_KIND, EV_BAR, EVT_TP1, CLOSING_KINDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Velas en un anio para cada timeframe del benchmark.
+BARS_PER_YEAR = {
+    "1h": 365 * 24,
+    "5m": 365 * 24 * 12,
+    "1m": 365 * 24 * 60,
+}
+
+
+def run_simulation_rowwise(df: pd.DataFrame, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open):
+    """
+    Bucle original vela a vela (df.iloc + dict), sin los mensajes de log.
+    Se conserva solo como referencia de rendimiento y de resultados para el benchmark.
+    """
+    capital = initial_capital
+    in_trade = False
+    active_trade = {}
+    trade_log = []
+    for i in range(len(df)):
+        current_row = df.iloc[i]
+        current_price = current_row['Close']
+        if in_trade:
+            if not active_trade.get('is_phase_2') and current_row['Low'] <= active_trade['sl_price']:
+                exit_price = active_trade['sl_price']
+                capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
+                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'SL'})
+                in_trade = False
+                active_trade = {}
+                continue
+            if active_trade.get('is_phase_2') and current_row['Low'] <= active_trade['sl_price']:
+                exit_price = active_trade['sl_price']
+                capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
+                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'SL@BE'})
+                in_trade = False
+                active_trade = {}
+                continue
+            if active_trade.get('is_phase_2') and current_row['High'] >= active_trade['tp2_price']:
+                exit_price = active_trade['tp2_price']
+                capital += active_trade['position_size'] * exit_price * (1 - fee_rate)
+                trade_log.append({'entry': active_trade['entry_price'], 'exit': exit_price, 'reason': 'TP2'})
+                in_trade = False
+                active_trade = {}
+                continue
+            if not active_trade.get('is_phase_2') and current_row['High'] >= active_trade['tp1_price']:
+                half_position = active_trade['position_size'] / 2
+                capital += half_position * active_trade['tp1_price'] * (1 - fee_rate)
+                active_trade['position_size'] = half_position
+                active_trade['is_phase_2'] = True
+                active_trade['sl_price'] = active_trade['cost_part2'] / (half_position * (1 - fee_rate))
+                active_trade['tp2_price'] = current_row['BB_Upper']
+                continue
+            if i - active_trade['entry_index'] >= max_candles_open:
+                capital += active_trade['position_size'] * current_price * (1 - fee_rate)
+                trade_log.append({'entry': active_trade['entry_price'], 'exit': current_price, 'reason': 'Time Stop'})
+                in_trade = False
+                active_trade = {}
+                continue
+        if not in_trade and current_row['bullish_divergence_signal'] and current_row['volume_confirmation'] == True:
+            precio_sl_teorico = current_row['Low'] - current_row['ATR']
+            riesgo_real_unitario = current_price * (1 + fee_rate) - precio_sl_teorico * (1 - fee_rate)
+            if riesgo_real_unitario <= 0:
+                continue
+            tamanio_posicion_btc = capital * risk_per_trade_pct / riesgo_real_unitario
+            costo_total_con_comision = tamanio_posicion_btc * current_price * (1 + fee_rate)
+            if costo_total_con_comision > capital:
+                continue
+            capital -= costo_total_con_comision
+            in_trade = True
+            active_trade = {
+                'entry_index': i,
+                'entry_price': current_price,
+                'position_size': tamanio_posicion_btc,
+                'sl_price': precio_sl_teorico,
+                'tp1_price': current_row['BB_Mid'],
+                'is_phase_2': False,
+                'cost_part2': costo_total_con_comision / 2,
+            }
+    if in_trade:
+        capital += active_trade['position_size'] * df.iloc[-1]['Close'] * (1 - fee_rate)
+    return capital, trade_log
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _same_trades(a: np.ndarray, b: np.ndarray) -> bool:
+    # Campo a campo: las fechas sin timestamps son NaT, que no es igual a si mismo.
+    return len(a) == len(b) and all(np.array_equal(a[name], b[name], equal_nan=a.dtype[name].kind in 'fM')
+                                    for name in a.dtype.names)
+
+
+def check_trade_table(arrays: dict[str, np.ndarray], initial_capital, fee_rate, risk_per_trade_pct, max_candles_open) -> None:
+    """
+    Corta la simulacion justo despues de un TP1 con la operacion aun abierta y continua desde el estado, como
+    el backtest por trozos. La tabla de operaciones y la curva de capital de cada tramo deben coincidir con
+    las de la simulacion completa: sin la operacion abierta en el primero (close_at_end=False) ni la que
+    viene abierta en el segundo.
+    """
+    _, events = simulate_arrays(arrays, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open)
+    trades = events_to_trades(events, fee_rate)
+    equity = equity_curve(events, arrays['close'], initial_capital)
+    kinds = events[:, EV_KIND]
+    closing_bars = events[np.isin(kinds, CLOSING_KINDS), EV_BAR]
+    open_tp1 = [bar for bar in events[kinds == EVT_TP1, EV_BAR]
+                if closing_bars[np.searchsorted(closing_bars, bar)] > bar]
+    if not open_tp1:
+        return
+    cut = int(open_tp1[0]) + 1
+
+    head = {name: values[:cut] for name, values in arrays.items()}
+    tail = {name: values[cut:] for name, values in arrays.items()}
+    state, head_events = simulate_arrays(head, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, close_at_end=False)
+    assert state[ST_IN_TRADE] != 0.0, "La operacion del TP1 deberia seguir abierta al corte"
+    head_trades = events_to_trades(head_events, fee_rate)
+    assert _same_trades(head_trades, trades[trades['exit_bar'] < cut]), "Tabla de operaciones distinta con una operacion abierta al final"
+
+    cash, open_size = state[ST_CAPITAL], state[ST_POSITION_SIZE]
+    state[ST_ENTRY_INDEX] -= cut
+    _, tail_events = simulate_arrays(tail, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, state=state)
+    tail_trades = events_to_trades(tail_events, fee_rate)
+    expected = trades[trades['entry_bar'] >= cut].copy()
+    expected['entry_bar'] -= cut
+    expected['exit_bar'] -= cut
+    assert _same_trades(tail_trades, expected), "Tabla de operaciones distinta al continuar desde un estado con TP1"
+    assert np.array_equal(equity_curve(tail_events, tail['close'], cash, open_size), equity[cut:]), \
+        "Curva de capital distinta al continuar desde un estado con una operacion abierta"
+
+
+def run_benchmark(timeframes: list[str], legacy_max_bars: int) -> None:
+    initial_capital, fee_rate, risk_per_trade_pct, max_candles_open = 10000.0, 0.001, 0.01, 48
+
+    if NUMBA_AVAILABLE:
+        # Compilamos antes de medir para no contar el tiempo de JIT.
+        warmup = generate_ohlcv(500, timeframe="1h")
+        calculate_indicators(warmup)
+        warmup = precalculate_entry_filters(find_divergence_signals(warmup, 15, 3, 30), 100, fee_rate)
+        simulate_arrays(build_simulation_arrays(warmup), initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, use_numba=True)
+
+    rows = []
+    for timeframe in timeframes:
+        df = generate_ohlcv(BARS_PER_YEAR[timeframe], seed=42, timeframe=timeframe, start="2021-01-01")
+        calculate_indicators(df)
+        df = find_divergence_signals(df, 15, 3, 30)
+        df = precalculate_entry_filters(df, 100, fee_rate)
+        df.dropna(subset=['RSI', 'BB_Mid', 'ATR'], inplace=True)
+
+        arrays, t_arrays = _timed(build_simulation_arrays, df)
+        (state_py, events_py), t_python = _timed(simulate_arrays, arrays, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, use_numba=False)
+        t_numba = float("nan")
+        if NUMBA_AVAILABLE:
+            (state_jit, events_jit), t_numba = _timed(simulate_arrays, arrays, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open, use_numba=True)
+            assert state_jit[ST_CAPITAL] == state_py[ST_CAPITAL], "Numba y Python puro dan capitales distintos"
+
+        check_trade_table(arrays, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open)
+
+        t_legacy = float("nan")
+        if len(df) <= legacy_max_bars:
+            (legacy_capital, legacy_log), t_legacy = _timed(run_simulation_rowwise, df, initial_capital, fee_rate, risk_per_trade_pct, max_candles_open)
+            assert legacy_capital == state_py[ST_CAPITAL], "El motor de arrays no reproduce el capital del bucle original"
+            assert [(t['entry'], t['exit'], t['reason']) for t in legacy_log] == \
+                [(t['entry'], t['exit'], t['reason']) for t in events_to_trade_log(events_py)], "El trade log no coincide"
+
+        rows.append((timeframe, len(df), t_legacy, t_arrays + t_python, t_arrays + t_numba))
+
+    logger.info(f"{'TF':>4} {'velas':>9} {'iloc+dict':>11} {'python':>9} {'numba':>9} {'x python':>9} {'x numba':>9}")
+    for timeframe, n_bars, t_legacy, t_python, t_numba in rows:
+        logger.info(f"{timeframe:>4} {n_bars:>9,} {t_legacy:>10.3f}s {t_python:>8.3f}s {t_numba:>8.3f}s "
+                    f"{t_legacy / t_python:>8.1f}x {t_legacy / t_numba:>8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark del bucle de simulacion: iloc+dict vs motor de arrays.")
+    parser.add_argument("--timeframes", nargs="+", default=list(BARS_PER_YEAR), choices=list(BARS_PER_YEAR))
+    parser.add_argument("--legacy-max-bars", type=int, default=10**7,
+                        help="No ejecutar el bucle original por encima de este numero de velas (es muy lento).")
+    args = parser.parse_args()
+    define_logging("simulation_benchmark_log.txt")
+    # Silenciamos los logs por operacion para medir solo el bucle.
+    logging.getLogger("src.backtesting.bullish_divergence.bullish_backtest_functions").setLevel(logging.ERROR)
+    run_benchmark(args.timeframes, args.legacy_max_bars)
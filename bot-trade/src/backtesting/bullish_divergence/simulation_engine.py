@@ -0,0 +1,423 @@
+import types
+import numpy as np
+import pandas as pd
+from src.backtesting.jit import njit, NUMBA_AVAILABLE, resolve_use_numba
+
+# --- ESTADO DE LA OPERACION ---
+# El estado de la simulacion vive en un unico array float64 (un "registro" compacto) en lugar de un dict.
+# Asi el mismo paso por vela sirve para el bucle compilado y para cualquier consumidor vela a vela.
+ST_CAPITAL = 0
+ST_IN_TRADE = 1
+ST_IS_PHASE_2 = 2
+ST_ENTRY_INDEX = 3
+ST_ENTRY_PRICE = 4
+ST_POSITION_SIZE = 5
+ST_SL_PRICE = 6
+ST_TP1_PRICE = 7
+ST_TP2_PRICE = 8
+ST_TOTAL_COST = 9
+ST_COST_PART1 = 10
+ST_COST_PART2 = 11
+ST_PNL_PART1 = 12
+STATE_SIZE = 13
+
+# --- EVENTOS ---
+# Cada entrada/salida se escribe como una fila de una matriz float64 preasignada.
+# El formateo de texto (logs, reportes) se hace despues, fuera del bucle.
+EVT_SIGNAL = 0          # Senial confirmada evaluada
+EVT_ENTRY = 1
+EVT_REJECT_CAPITAL = 2  # Senial ignorada por capital insuficiente
+EVT_SL = 3
+EVT_SL_BE = 4
+EVT_TP1 = 5
+EVT_TP2 = 6
+EVT_TIME_STOP = 7
+EVT_FORCED_CLOSE = 8
+
+EV_KIND = 0
+EV_BAR = 1
+EV_ENTRY_PRICE = 2
+EV_EXIT_PRICE = 3
+EV_POSITION_SIZE = 4
+EV_COST = 5
+EV_PNL = 6
+EV_PNL_TOTAL = 7
+EV_CAPITAL = 8
+EV_SL_PRICE = 9
+EV_TP_PRICE = 10
+EV_RISK_USD = 11
+EVENT_FIELDS = 12
+
+# Motivos de cierre que van al trade_log, con el mismo texto que usaba el bucle original.
+EXIT_REASONS = {
+    EVT_SL: 'SL',
+    EVT_SL_BE: 'SL@BE',
+    EVT_TP2: 'TP2',
+    EVT_TIME_STOP: 'Time Stop',
+}
+
+
+def new_state(initial_capital: float) -> np.ndarray:
+    state = np.zeros(STATE_SIZE, dtype=np.float64)
+    state[ST_CAPITAL] = initial_capital
+    return state
+
+
+def event_capacity(n_signals: int) -> int:
+    """Cota superior de eventos: cada senial genera como mucho senial + entrada + TP1 + cierre."""
+    return 4 * n_signals + 2
+
+
+def _write_event(events, n_events, kind, bar, entry_price, exit_price, position_size,
+                 cost, pnl, pnl_total, capital, sl_price, tp_price, risk_usd):
+    events[n_events, EV_KIND] = kind
+    events[n_events, EV_BAR] = bar
+    events[n_events, EV_ENTRY_PRICE] = entry_price
+    events[n_events, EV_EXIT_PRICE] = exit_price
+    events[n_events, EV_POSITION_SIZE] = position_size
+    events[n_events, EV_COST] = cost
+    events[n_events, EV_PNL] = pnl
+    events[n_events, EV_PNL_TOTAL] = pnl_total
+    events[n_events, EV_CAPITAL] = capital
+    events[n_events, EV_SL_PRICE] = sl_price
+    events[n_events, EV_TP_PRICE] = tp_price
+    events[n_events, EV_RISK_USD] = risk_usd
+    return n_events + 1
+
+
+def _close_trade(state):
+    state[ST_IN_TRADE] = 0.0
+    state[ST_IS_PHASE_2] = 0.0
+
+
+def _step_bar(state, i, high, low, close, atr, bb_mid, bb_upper, entry_signal,
+              fee_rate, risk_per_trade_pct, max_candles_open, events, n_events):
+    """
+    Procesa una vela con las mismas reglas (y el mismo orden de operaciones en coma flotante)
+    que el bucle original de run_simulation. Devuelve el nuevo numero de eventos escritos.
+    """
+    nan = np.nan
+    # --- A. GESTIoN DE LA OPERACIoN ACTIVA ---
+    if state[ST_IN_TRADE] != 0.0:
+        is_phase_2 = state[ST_IS_PHASE_2] != 0.0
+        # Comprobar Stop Loss (antes de TP1)
+        if not is_phase_2 and low <= state[ST_SL_PRICE]:
+            exit_price = state[ST_SL_PRICE]
+            cash_in = state[ST_POSITION_SIZE] * exit_price * (1 - fee_rate)
+            pnl = cash_in - state[ST_TOTAL_COST]
+            state[ST_CAPITAL] += cash_in
+            n_events = _write_event(events, n_events, EVT_SL, i, state[ST_ENTRY_PRICE], exit_price,
+                                    state[ST_POSITION_SIZE], state[ST_TOTAL_COST], pnl, pnl,
+                                    state[ST_CAPITAL], exit_price, nan, nan)
+            _close_trade(state)
+            return n_events
+
+        # Comprobar Stop Loss (despues de TP1 - Breakeven)
+        if is_phase_2 and low <= state[ST_SL_PRICE]:
+            exit_price = state[ST_SL_PRICE]
+            cash_in_part2 = state[ST_POSITION_SIZE] * exit_price * (1 - fee_rate)
+            pnl_part2 = cash_in_part2 - state[ST_COST_PART2]
+            state[ST_CAPITAL] += cash_in_part2
+            n_events = _write_event(events, n_events, EVT_SL_BE, i, state[ST_ENTRY_PRICE], exit_price,
+                                    state[ST_POSITION_SIZE], state[ST_TOTAL_COST], pnl_part2,
+                                    state[ST_PNL_PART1] + pnl_part2, state[ST_CAPITAL], exit_price, nan, nan)
+            _close_trade(state)
+            return n_events
+
+        # Comprobar Fase 2: Take Profit 2
+        if is_phase_2 and high >= state[ST_TP2_PRICE]:
+            exit_price = state[ST_TP2_PRICE]
+            cash_in_part2 = state[ST_POSITION_SIZE] * exit_price * (1 - fee_rate)
+            pnl_part2 = cash_in_part2 - state[ST_COST_PART2]
+            state[ST_CAPITAL] += cash_in_part2
+            pnl_total = (state[ST_PNL_PART1] + pnl_part2)
+            n_events = _write_event(events, n_events, EVT_TP2, i, state[ST_ENTRY_PRICE], exit_price,
+                                    state[ST_POSITION_SIZE], state[ST_TOTAL_COST], pnl_part2, pnl_total,
+                                    state[ST_CAPITAL], nan, exit_price, nan)
+            _close_trade(state)
+            return n_events
+
+        # Comprobar Fase 1: Take Profit 1
+        if not is_phase_2 and high >= state[ST_TP1_PRICE]:
+            exit_price_tp1 = state[ST_TP1_PRICE]
+            half_position = state[ST_POSITION_SIZE] / 2
+            cash_in_part1 = half_position * exit_price_tp1 * (1 - fee_rate)
+            pnl_part1 = cash_in_part1 - state[ST_COST_PART1]
+            state[ST_CAPITAL] += cash_in_part1
+            # Actualizar la operacion a Fase 2
+            state[ST_POSITION_SIZE] = half_position
+            state[ST_IS_PHASE_2] = 1.0
+            state[ST_PNL_PART1] = pnl_part1
+            # Movemos SL a un breakeven real, considerando comisiones
+            state[ST_SL_PRICE] = state[ST_COST_PART2] / (half_position * (1 - fee_rate))
+            state[ST_TP2_PRICE] = bb_upper  # TP2 es la banda superior de Bollinger
+            return _write_event(events, n_events, EVT_TP1, i, state[ST_ENTRY_PRICE], exit_price_tp1,
+                                half_position, state[ST_TOTAL_COST], pnl_part1, pnl_part1,
+                                state[ST_CAPITAL], state[ST_SL_PRICE], state[ST_TP2_PRICE], nan)
+
+        # Comprobar Time Stop
+        if i - state[ST_ENTRY_INDEX] >= max_candles_open:
+            exit_price = close
+            state[ST_CAPITAL] += state[ST_POSITION_SIZE] * exit_price * (1 - fee_rate)
+            n_events = _write_event(events, n_events, EVT_TIME_STOP, i, state[ST_ENTRY_PRICE], exit_price,
+                                    state[ST_POSITION_SIZE], state[ST_TOTAL_COST], nan, nan,
+                                    state[ST_CAPITAL], nan, nan, nan)
+            _close_trade(state)
+            return n_events
+
+        return n_events
+
+    # --- B. BUSQUEDA DE NUEVAS ENTRADAS ---
+    if not entry_signal:
+        return n_events
+
+    capital = state[ST_CAPITAL]
+    n_events = _write_event(events, n_events, EVT_SIGNAL, i, close, nan, nan, nan, nan, nan,
+                            capital, nan, nan, nan)
+
+    precio_entrada = close
+    precio_sl_teorico = low - atr
+    precio_tp1_teorico = bb_mid
+
+    costo_total_entrada = precio_entrada * (1 + fee_rate)
+    ingreso_neto_sl = precio_sl_teorico * (1 - fee_rate)
+    riesgo_real_unitario = costo_total_entrada - ingreso_neto_sl
+
+    if riesgo_real_unitario <= 0:
+        return n_events
+
+    riesgo_en_usd = capital * risk_per_trade_pct
+    tamanio_posicion_btc = riesgo_en_usd / riesgo_real_unitario
+    costo_bruto_posicion = tamanio_posicion_btc * precio_entrada
+    costo_total_con_comision = costo_bruto_posicion * (1 + fee_rate)
+
+    if costo_total_con_comision > capital:
+        return _write_event(events, n_events, EVT_REJECT_CAPITAL, i, precio_entrada, nan,
+                            tamanio_posicion_btc, costo_total_con_comision, nan, nan,
+                            capital, precio_sl_teorico, precio_tp1_teorico, riesgo_en_usd)
+
+    # Ejecutar la operacion
+    state[ST_CAPITAL] = capital - costo_total_con_comision
+    state[ST_IN_TRADE] = 1.0
+    state[ST_IS_PHASE_2] = 0.0
+    state[ST_ENTRY_INDEX] = i
+    state[ST_ENTRY_PRICE] = precio_entrada
+    state[ST_POSITION_SIZE] = tamanio_posicion_btc
+    state[ST_SL_PRICE] = precio_sl_teorico
+    state[ST_TP1_PRICE] = precio_tp1_teorico
+    state[ST_TP2_PRICE] = nan
+    state[ST_TOTAL_COST] = costo_total_con_comision
+    state[ST_COST_PART1] = costo_total_con_comision / 2
+    state[ST_COST_PART2] = costo_total_con_comision / 2
+    state[ST_PNL_PART1] = 0.0
+    return _write_event(events, n_events, EVT_ENTRY, i, precio_entrada, nan,
+                        tamanio_posicion_btc, costo_total_con_comision, nan, nan,
+                        state[ST_CAPITAL], precio_sl_teorico, precio_tp1_teorico, riesgo_en_usd)
+
+
+def _close_open_trade(state, i, last_close, fee_rate, events, n_events):
+    """Si la simulacion termina con una operacion abierta, la cerramos al ultimo precio."""
+    if state[ST_IN_TRADE] == 0.0:
+        return n_events
+    state[ST_CAPITAL] += state[ST_POSITION_SIZE] * last_close * (1 - fee_rate)
+    n_events = _write_event(events, n_events, EVT_FORCED_CLOSE, i, state[ST_ENTRY_PRICE], last_close,
+                            state[ST_POSITION_SIZE], state[ST_TOTAL_COST], np.nan, np.nan,
+                            state[ST_CAPITAL], np.nan, np.nan, np.nan)
+    _close_trade(state)
+    return n_events
+
+
+def _simulation_loop(state, high, low, close, atr, bb_mid, bb_upper, entry_signal,
+                     fee_rate, risk_per_trade_pct, max_candles_open, events, close_at_end):
+    n_events = 0
+    n = close.shape[0]
+    for i in range(n):
+        n_events = _step_bar(state, i, high[i], low[i], close[i], atr[i], bb_mid[i], bb_upper[i],
+                             entry_signal[i], fee_rate, risk_per_trade_pct, max_candles_open,
+                             events, n_events)
+    if close_at_end and n > 0:
+        n_events = _close_open_trade(state, n - 1, close[n - 1], fee_rate, events, n_events)
+    return n_events
+
+
+# --- SELECCION DE IMPLEMENTACION ---
+# La version en Python puro usa copias de las funciones enlazadas a un espacio de nombres propio,
+# de modo que nunca llama a funciones compiladas. Con numba, los nombres del modulo se sustituyen por
+# sus versiones compiladas (cache=True evita recompilar en cada proceso, p. ej. en los barridos).
+def _as_python(func, namespace: dict):
+    return types.FunctionType(func.__code__, namespace, func.__name__, func.__defaults__)
+
+_python_namespace = dict(globals())
+for _func in (_write_event, _close_trade, _step_bar, _close_open_trade, _simulation_loop):
+    _python_namespace[_func.__name__] = _as_python(_func, _python_namespace)
+step_bar_py = _python_namespace['_step_bar']
+close_open_trade_py = _python_namespace['_close_open_trade']
+_simulation_loop_py = _python_namespace['_simulation_loop']
+
+if NUMBA_AVAILABLE:
+    _write_event = njit(cache=True)(_write_event)
+    _close_trade = njit(cache=True)(_close_trade)
+    _step_bar = njit(cache=True)(_step_bar)
+    _close_open_trade = njit(cache=True)(_close_open_trade)
+    _simulation_loop = njit(cache=True)(_simulation_loop)
+step_bar_jit = _step_bar
+_simulation_loop_jit = _simulation_loop
+
+
+def build_simulation_arrays(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Extrae del DataFrame anotado los arrays contiguos que necesita el motor."""
+    # Una vela es candidata a entrada si tiene senial de divergencia y confirmacion de volumen.
+    entry_signal = (df['bullish_divergence_signal'].to_numpy(dtype=bool)
+                    & df['volume_confirmation'].fillna(False).to_numpy(dtype=bool))
+    return {
+        'high': np.ascontiguousarray(df['High'].to_numpy(dtype=np.float64)),
+        'low': np.ascontiguousarray(df['Low'].to_numpy(dtype=np.float64)),
+        'close': np.ascontiguousarray(df['Close'].to_numpy(dtype=np.float64)),
+        'atr': np.ascontiguousarray(df['ATR'].to_numpy(dtype=np.float64)),
+        'bb_mid': np.ascontiguousarray(df['BB_Mid'].to_numpy(dtype=np.float64)),
+        'bb_upper': np.ascontiguousarray(df['BB_Upper'].to_numpy(dtype=np.float64)),
+        'entry_signal': np.ascontiguousarray(entry_signal),
+    }
+
+
+def simulate_arrays(
+                    arrays: dict[str, np.ndarray],
+                    initial_capital: float,
+                    fee_rate: float,
+                    risk_per_trade_pct: float,
+                    max_candles_open: int,
+                    use_numba: bool | None = None,
+                    state: np.ndarray | None = None,
+                    close_at_end: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Ejecuta la simulacion sobre arrays NumPy. Devuelve (estado final, eventos).
+    Si se pasa un estado previo, la simulacion continua desde el (capital y operacion abierta).
+    """
+    if state is None:
+        state = new_state(initial_capital)
+    n_signals = int(np.count_nonzero(arrays['entry_signal']))
+    events = np.empty((event_capacity(n_signals), EVENT_FIELDS), dtype=np.float64)
+    loop = _simulation_loop_jit if resolve_use_numba(use_numba) else _simulation_loop_py
+    n_events = loop(state, arrays['high'], arrays['low'], arrays['close'], arrays['atr'],
+                    arrays['bb_mid'], arrays['bb_upper'], arrays['entry_signal'],
+                    float(fee_rate), float(risk_per_trade_pct), int(max_candles_open),
+                    events, close_at_end)
+    return state, events[:n_events]
+
+
+# --- TABLA DE OPERACIONES Y CURVA DE CAPITAL ---
+# Se reconstruyen a partir de los eventos, con operaciones vectorizadas y fuera del bucle de simulacion.
+CLOSING_KINDS = (EVT_SL, EVT_SL_BE, EVT_TP2, EVT_TIME_STOP, EVT_FORCED_CLOSE)
+TRADE_EXIT_NAMES = {**EXIT_REASONS, EVT_FORCED_CLOSE: 'Forced Close'}
+
+TRADE_DTYPE = np.dtype([
+    ('entry_bar', np.int64),
+    ('exit_bar', np.int64),
+    ('entry_time', 'datetime64[ms]'),
+    ('exit_time', 'datetime64[ms]'),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),      # Precio del cierre final (la segunda mitad si hubo TP1)
+    ('size', np.float64),            # Tamanio inicial de la posicion
+    ('cost', np.float64),            # Coste total de entrada, comision incluida
+    ('fees', np.float64),            # Comisiones de entrada y de todas las salidas
+    ('pnl', np.float64),             # Variacion del capital entre antes de entrar y despues de salir
+    ('pnl_pct', np.float64),         # pnl sobre el coste de entrada
+    ('risk_usd', np.float64),
+    ('r_multiple', np.float64),      # pnl en unidades del riesgo asumido al entrar
+    ('tp1_hit', np.bool_),
+    ('exit_kind', np.int8),          # EVT_* del cierre (nombres en TRADE_EXIT_NAMES)
+    ('bars_held', np.int64),
+])
+
+
+def events_to_trades(events: np.ndarray, fee_rate: float, timestamps: np.ndarray | None = None) -> np.ndarray:
+    """
+    Tabla tipada (TRADE_DTYPE) con una fila por operacion cerrada. timestamps son las fechas de las velas
+    simuladas (datetime64); sin ellas entry_time y exit_time quedan en NaT.
+    Solo entran las operaciones con entrada y cierre en estos eventos: una operacion abierta al final
+    (close_at_end=False) o que venia abierta de un estado previo (state=) no tiene fila.
+    """
+    kinds = events[:, EV_KIND]
+    all_entry_rows = np.flatnonzero(kinds == EVT_ENTRY)
+    all_exit_rows = np.flatnonzero(np.isin(kinds, CLOSING_KINDS))
+    # Las operaciones no se solapan: la entrada de cada cierre es la ultima anterior a el. Un cierre sin
+    # entrada previa es de una operacion abierta antes de estos eventos.
+    exit_entry = np.searchsorted(all_entry_rows, all_exit_rows) - 1
+    exit_rows = all_exit_rows[exit_entry >= 0]
+    entry_rows = all_entry_rows[exit_entry[exit_entry >= 0]]
+    trades = np.zeros(len(exit_rows), dtype=TRADE_DTYPE)
+    if len(exit_rows) == 0:
+        return trades
+
+    trades['entry_bar'] = events[entry_rows, EV_BAR]
+    trades['exit_bar'] = events[exit_rows, EV_BAR]
+    if timestamps is not None:
+        trades['entry_time'] = timestamps[trades['entry_bar']]
+        trades['exit_time'] = timestamps[trades['exit_bar']]
+    else:
+        trades['entry_time'] = np.datetime64('NaT')
+        trades['exit_time'] = np.datetime64('NaT')
+    trades['entry_price'] = events[entry_rows, EV_ENTRY_PRICE]
+    trades['exit_price'] = events[exit_rows, EV_EXIT_PRICE]
+    trades['size'] = events[entry_rows, EV_POSITION_SIZE]
+    trades['cost'] = events[entry_rows, EV_COST]
+    trades['risk_usd'] = events[entry_rows, EV_RISK_USD]
+    trades['exit_kind'] = kinds[exit_rows]
+    trades['bars_held'] = trades['exit_bar'] - trades['entry_bar']
+
+    # TP1 parcial: la mitad de la posicion sale a su precio y el resto en el cierre final.
+    # Cada TP1 es de la operacion del primer cierre posterior, si esa operacion entro antes del TP1; los
+    # TP1 de una operacion que sigue abierta o que entro antes de estos eventos se descartan.
+    tp1_rows = np.flatnonzero(kinds == EVT_TP1)
+    tp1_trade = np.searchsorted(exit_rows, tp1_rows)
+    has_trade = tp1_trade < len(exit_rows)
+    has_trade[has_trade] = entry_rows[tp1_trade[has_trade]] < tp1_rows[has_trade]
+    tp1_rows, tp1_trade = tp1_rows[has_trade], tp1_trade[has_trade]
+    tp1_value = np.zeros(len(exit_rows))
+    tp1_value[tp1_trade] = events[tp1_rows, EV_POSITION_SIZE] * events[tp1_rows, EV_EXIT_PRICE]
+    trades['tp1_hit'][tp1_trade] = True
+    remaining_size = np.where(trades['tp1_hit'], trades['size'] / 2, trades['size'])
+    entry_fee = trades['cost'] - trades['size'] * trades['entry_price']
+    trades['fees'] = entry_fee + (tp1_value + remaining_size * trades['exit_price']) * fee_rate
+
+    # La senial evaluada se registra justo antes de la entrada con el capital previo; si no estuviera, el
+    # capital previo es el de tras la entrada mas su coste.
+    signal_rows = np.maximum(entry_rows - 1, 0)
+    has_signal = (entry_rows > 0) & (kinds[signal_rows] == EVT_SIGNAL)
+    capital_before = np.where(has_signal, events[signal_rows, EV_CAPITAL],
+                              events[entry_rows, EV_CAPITAL] + events[entry_rows, EV_COST])
+    trades['pnl'] = events[exit_rows, EV_CAPITAL] - capital_before
+    trades['pnl_pct'] = trades['pnl'] / trades['cost'] * 100
+    trades['r_multiple'] = trades['pnl'] / trades['risk_usd']
+    return trades
+
+
+def equity_curve(events: np.ndarray, close: np.ndarray, initial_capital: float, open_size: float = 0.0) -> np.ndarray:
+    """
+    Capital al cierre de cada vela simulada: efectivo mas la posicion abierta valorada al cierre
+    (como la curva de portfolio_engine). Tras un cierre forzado la ultima vela es el capital final.
+    initial_capital es el efectivo antes de la primera vela y open_size la posicion que ya estaba abierta:
+    al continuar desde un estado previo (state=), su ST_CAPITAL y su ST_POSITION_SIZE si ST_IN_TRADE.
+    """
+    if len(events) == 0:
+        return initial_capital + open_size * close
+    bars = events[:, EV_BAR].astype(np.int64)
+    kinds = events[:, EV_KIND]
+    event_size = np.where((kinds == EVT_ENTRY) | (kinds == EVT_TP1), events[:, EV_POSITION_SIZE], 0.0)
+    # Ultimo evento de cada vela (o anterior): los eventos ya estan ordenados por vela.
+    last_event = np.searchsorted(bars, np.arange(len(close)), side='right') - 1
+    has_event = last_event >= 0
+    safe_event = np.where(has_event, last_event, 0)
+    cash = np.where(has_event, events[safe_event, EV_CAPITAL], initial_capital)
+    size = np.where(has_event, event_size[safe_event], open_size)
+    return cash + size * close
+
+
+def events_to_trade_log(events: np.ndarray) -> list[dict]:
+    """Convierte los eventos de cierre al formato historico del trade_log: entry/exit/reason."""
+    trade_log = []
+    for kind, entry_price, exit_price in events[:, [EV_KIND, EV_ENTRY_PRICE, EV_EXIT_PRICE]]:
+        reason = EXIT_REASONS.get(int(kind))
+        if reason is not None:
+            trade_log.append({'entry': float(entry_price), 'exit': float(exit_price), 'reason': reason})
+    return trade_log
@@ -0,0 +1,126 @@
+import logging
+import numpy as np
+import pandas as pd
+from .simulation_engine import (
+    EV_KIND, EV_BAR, EV_ENTRY_PRICE, EV_EXIT_PRICE, EV_POSITION_SIZE, EV_COST, EV_PNL, EV_PNL_TOTAL,
+    EV_CAPITAL, EV_SL_PRICE, EV_TP_PRICE, EV_RISK_USD,
+    EVT_SIGNAL, EVT_ENTRY, EVT_REJECT_CAPITAL, EVT_SL, EVT_SL_BE, EVT_TP1, EVT_TP2, EVT_TIME_STOP, EVT_FORCED_CLOSE,
+)
+
+logger = logging.getLogger(__name__)
+
+# El motor de simulacion solo escribe eventos en una matriz preasignada. El texto legible
+# (logs y reportes) se genera aqui, despues de la simulacion y fuera del bucle.
+
+EVENT_NAMES = {
+    EVT_SIGNAL: 'signal',
+    EVT_ENTRY: 'entry',
+    EVT_REJECT_CAPITAL: 'reject_capital',
+    EVT_SL: 'sl',
+    EVT_SL_BE: 'sl_breakeven',
+    EVT_TP1: 'tp1',
+    EVT_TP2: 'tp2',
+    EVT_TIME_STOP: 'time_stop',
+    EVT_FORCED_CLOSE: 'forced_close',
+}
+EVENT_COLUMNS = {
+    EV_ENTRY_PRICE: 'entry_price',
+    EV_EXIT_PRICE: 'exit_price',
+    EV_POSITION_SIZE: 'position_size',
+    EV_COST: 'cost',
+    EV_PNL: 'pnl',
+    EV_PNL_TOTAL: 'pnl_total',
+    EV_CAPITAL: 'capital',
+    EV_SL_PRICE: 'sl_price',
+    EV_TP_PRICE: 'tp_price',
+    EV_RISK_USD: 'risk_usd',
+}
+
+
+def events_to_frame(events: np.ndarray, index: pd.Index) -> pd.DataFrame:
+    """Registro estructurado de eventos: una fila por evento con su fecha, tipo y columnas numericas."""
+    bars = events[:, EV_BAR].astype(np.int64)
+    frame = pd.DataFrame({name: events[:, column] for column, name in EVENT_COLUMNS.items()}, index=index[bars])
+    frame.insert(0, 'event', [EVENT_NAMES[int(kind)] for kind in events[:, EV_KIND]])
+    frame.insert(1, 'bar', bars)
+    return frame
+
+
+def event_message(event: np.ndarray, timestamp_ms: int) -> dict:
+    """
+    Evento como mensaje JSON (stream de eventos de cripto-back): tipo 'trade', nombre del evento, fecha en ms
+    y columnas numericas. Los valores no finitos van como None.
+    """
+    message = {'type': 'trade', 'event': EVENT_NAMES[int(event[EV_KIND])], 'timestamp': int(timestamp_ms)}
+    for column, name in EVENT_COLUMNS.items():
+        value = float(event[column])
+        message[name] = value if np.isfinite(value) else None
+    return message
+
+
+def format_event(event: np.ndarray, current_date, rr_value: float) -> tuple[int, str] | None:
+    """Nivel de log y mensaje de un evento, con el mismo texto que usaba el bucle vela a vela."""
+    kind = int(event[EV_KIND])
+    capital = event[EV_CAPITAL]
+    if kind == EVT_SIGNAL:
+        return logging.INFO, f"Senial CONFIRMADA en {current_date}. Evaluando entrada..."
+    elif kind == EVT_REJECT_CAPITAL:
+        return logging.WARNING, f"Senial en {current_date} ignorada: capital insuficiente."
+    elif kind == EVT_ENTRY:
+        return logging.INFO, (f"NUEVA OPERACION en {current_date}\n"
+                              f"    - Precio Entrada: ${event[EV_ENTRY_PRICE]:,.2f}\n"
+                              f"    - Capital en Riesgo (1%): ${event[EV_RISK_USD]:,.2f}\n"
+                              f"    - Tamanio Posicion (Bruto): ${event[EV_POSITION_SIZE] * event[EV_ENTRY_PRICE]:,.2f}\n"
+                              f"    - Costo Total (c/comision): ${event[EV_COST]:,.2f}\n"
+                              f"    - SL: ${event[EV_SL_PRICE]:,.2f} | TP1: ${event[EV_TP_PRICE]:,.2f} | RR (TP1): {rr_value:.2f}")
+    elif kind == EVT_SL:
+        return logging.WARNING, (f"CIERRE por SL en {current_date}\n"
+                                 f"    - SL: ${event[EV_EXIT_PRICE]:,.2f}.\n"
+                                 f"    - P&L: ${event[EV_PNL]:,.2f}.\n"
+                                 f"    - Capital final: ${capital:,.2f}")
+    elif kind == EVT_SL_BE:
+        return logging.WARNING, (f"CIERRE por SL en Breakeven en {current_date}\n"
+                                 f"    - Breakeven SL: ${event[EV_EXIT_PRICE]:,.2f}.\n"
+                                 f"    - P&L Parte 2: ${event[EV_PNL]:,.2f}.\n"
+                                 f"    - Capital final: ${capital:,.2f}")
+    elif kind == EVT_TP2:
+        roi_pct = (event[EV_PNL_TOTAL] / event[EV_COST]) * 100
+        return logging.INFO, (f"ALCANZADO TP2 y CIERRE en {current_date} a ${event[EV_EXIT_PRICE]:,.2f}.\n"
+                              f"    - P&L Parte 2: ${event[EV_PNL]:,.2f}\n"
+                              f"    - P&L Total Op.: ${event[EV_PNL_TOTAL]:,.2f} ({roi_pct:.2f}% ROI)\n"
+                              f"    - Capital final: ${capital:,.2f}")
+    elif kind == EVT_TP1:
+        return logging.INFO, (f"ALCANZADO TP1 en {current_date} a ${event[EV_EXIT_PRICE]:,.2f}. \n"
+                              f"    - P&L Parte 1: ${event[EV_PNL]:,.2f}.\n"
+                              f"    - SL movido a breakeven ${event[EV_SL_PRICE]:.2f}\n"
+                              f"    - tp2 fijado en ${event[EV_TP_PRICE]:.2f}.")
+    elif kind == EVT_TIME_STOP:
+        return logging.WARNING, f"CIERRE por Time Stop en {current_date}: Capital final ${capital:,.2f}"
+    elif kind == EVT_FORCED_CLOSE:
+        return logging.WARNING, f"CIERRE FORZADO al final del backtest. Capital final: ${capital:,.2f}"
+
+    return None
+
+
+def log_simulation_events(df: pd.DataFrame, events: np.ndarray) -> None:
+    """Emite los mensajes de log de cada evento a partir de la matriz de eventos."""
+    rr_values = df['risk_reward_ratio'].to_numpy(dtype=np.float64)
+    for event in events:
+        bar = int(event[EV_BAR])
+        formatted = format_event(event, df.index[bar], rr_values[bar])
+        if formatted is not None:
+            logger.log(*formatted)
+
+
+def write_event_report(df: pd.DataFrame, events: np.ndarray, path: str, mode: str = "w") -> None:
+    """
+    Escribe el detalle de cada evento en un fichero de texto, sin pasar por el sistema de logging.
+    mode="a" anade los eventos al final del fichero (backtest por trozos).
+    """
+    rr_values = df['risk_reward_ratio'].to_numpy(dtype=np.float64)
+    with open(path, mode) as report_file:
+        for event in events:
+            bar = int(event[EV_BAR])
+            formatted = format_event(event, df.index[bar], rr_values[bar])
+            if formatted is not None:
+                report_file.write(f"{df.index[bar]} - {logging.getLevelName(formatted[0])} - {formatted[1]}\n")
@@ -0,0 +1,164 @@
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.get_training_data.resampling import load_resampled
+from src.utils import define_logging
+from . import parameter_sweep
+from .parameter_sweep import (
+    DEFAULT_GRID, INDICATOR_PARAMS, evaluate_combinations, expand_grid, sample_grid, scale_combinations,
+    _share_ohlcv, _attach_shared_ohlcv, _shared_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+# Walk-forward: se optimiza en una ventana de entrenamiento y se evalua la mejor combinacion
+# en la ventana siguiente (fuera de muestra). Las ventanas avanzan test_months cada vez.
+
+
+def make_folds(index: pd.DatetimeIndex, train_months: int, test_months: int) -> list[dict]:
+    """
+    Ventanas consecutivas [train_start, train_end) + [train_end, test_end) alineadas a inicio de mes.
+    Cada fold trae las fechas y los tramos en posiciones de vela (slices) sobre index.
+    Solo se generan folds cuya ventana de test cabe entera en los datos.
+    """
+    folds = []
+    if len(index) == 0:
+        return folds
+    train_start = index[0].normalize().replace(day=1)
+    if train_start < index[0]:
+        train_start += pd.DateOffset(months=1)
+    while True:
+        train_end = train_start + pd.DateOffset(months=train_months)
+        test_end = train_end + pd.DateOffset(months=test_months)
+        if test_end > index[-1] + (index[-1] - index[-2] if len(index) > 1 else pd.Timedelta(0)):
+            break
+        positions = index.searchsorted([train_start, train_end, test_end], side='left')
+        folds.append({
+            'fold': len(folds),
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_start': train_end,
+            'test_end': test_end,
+            'train': slice(int(positions[0]), int(positions[1])),
+            'test': slice(int(positions[1]), int(positions[2])),
+        })
+        train_start += pd.DateOffset(months=test_months)
+    return folds
+
+
+def _indicator_groups(combinations: list[dict]) -> list[list[dict]]:
+    """Combinaciones agrupadas por parametros de indicadores (lo que espera evaluate_combinations)."""
+    key = lambda params: tuple(params[name] for name in INDICATOR_PARAMS)
+    return [list(group) for _, group in itertools.groupby(sorted(combinations, key=key), key=key)]
+
+
+def run_fold(
+        df: pd.DataFrame,
+        fold: dict,
+        combinations: list[dict],
+        settings: dict,
+        objective: str = 'pnl_pct',
+        indicator_store=None,
+        dataset_key: str | None = None) -> dict:
+    """Optimiza en el tramo de entrenamiento del fold y evalua la mejor combinacion en el de test."""
+    train_results = []
+    for group in _indicator_groups(combinations):
+        train_results.extend(evaluate_combinations(df, group, settings, indicator_store, dataset_key, fold['train']))
+    best = max(train_results, key=lambda result: result[objective])
+    best_params = {name: best[name] for name in combinations[0]}
+    test_result = evaluate_combinations(df, [best_params], settings, indicator_store, dataset_key, fold['test'])[0]
+    return {
+        'fold': fold['fold'],
+        'train_start': fold['train_start'],
+        'train_end': fold['train_end'],
+        'test_start': fold['test_start'],
+        'test_end': fold['test_end'],
+        **best_params,
+        'train_pnl_pct': best['pnl_pct'],
+        'train_trades': best['trades'],
+        'test_pnl_pct': test_result['pnl_pct'],
+        'test_trades': test_result['trades'],
+        'test_max_drawdown_pct': test_result['max_drawdown_pct'],
+    }
+
+
+def _run_fold_task(fold: dict, combinations: list[dict], settings: dict, objective: str) -> dict:
+    # Los indicadores de toda la serie se calculan una vez por proceso y se reutilizan en todos sus folds.
+    return run_fold(_shared_frame(), fold, combinations, settings, objective,
+                    parameter_sweep._worker_indicator_store, parameter_sweep._shared_ohlcv['dataset_key'])
+
+
+def run_walk_forward(
+        df: pd.DataFrame,
+        combinations: list[dict],
+        train_months: int,
+        test_months: int,
+        initial_capital: float,
+        fee_rate: float,
+        risk_per_trade_pct: float,
+        objective: str = 'pnl_pct',
+        max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Ejecuta todos los folds en un ProcessPoolExecutor sobre el OHLCV en memoria compartida.
+    Devuelve una fila por fold con la mejor combinacion de entrenamiento y su resultado fuera de muestra.
+    """
+    settings = {'initial_capital': initial_capital, 'fee_rate': fee_rate, 'risk_per_trade_pct': risk_per_trade_pct}
+    folds = make_folds(df.index, train_months, test_months) # type: ignore
+    if not folds:
+        raise ValueError(f"No caben folds de {train_months}+{test_months} meses entre {df.index[0]} y {df.index[-1]}.")
+    max_workers = min(max_workers or os.cpu_count() or 1, len(folds))
+    logger.info(f"Walk-forward de {len(folds)} folds ({train_months}m train / {test_months}m test), "
+                f"{len(combinations)} combinaciones por fold, {max_workers} procesos...")
+
+    shm, description = _share_ohlcv(df)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_shared_ohlcv, initargs=(description,)) as executor:
+            futures = [executor.submit(_run_fold_task, fold, combinations, settings, objective) for fold in folds]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                logger.info(f"Fold {result['fold']} ({result['test_start']:%Y-%m} a {result['test_end']:%Y-%m}): "
+                            f"train {result['train_pnl_pct']:.2f}% | test {result['test_pnl_pct']:.2f}%")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return pd.DataFrame(results).sort_values('fold', ignore_index=True)
+
+
+def out_of_sample_return_pct(results: pd.DataFrame) -> float:
+    """Rentabilidad compuesta encadenando los tramos de test (cada uno empieza con el capital inicial)."""
+    return float((np.prod(1 + results['test_pnl_pct'].to_numpy() / 100) - 1) * 100)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Walk-forward de la estrategia de divergencia alcista.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--start-year", type=int, default=2020)
+    parser.add_argument("--end-year", type=int, default=2023)
+    parser.add_argument("--train-months", type=int, default=12)
+    parser.add_argument("--test-months", type=int, default=3)
+    parser.add_argument("--random", type=int, default=0, help="Combinaciones aleatorias por fold (0 = grid completo).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    define_logging("walk_forward_log.txt")
+    df = load_resampled(args.symbol, args.timeframe, f"{args.start_year}-01-01", f"{args.end_year + 1}-01-01")
+    combinations = sample_grid(DEFAULT_GRID, args.random, args.seed) if args.random else expand_grid(DEFAULT_GRID)
+    combinations = scale_combinations(combinations, args.timeframe)
+
+    start = time.perf_counter()
+    results = run_walk_forward(df, combinations, args.train_months, args.test_months, initial_capital=10000.0,
+                               fee_rate=0.001, risk_per_trade_pct=0.01, max_workers=args.workers)
+    output_filename = f"walk_forward_{args.timeframe}_{args.start_year}_{args.end_year}.csv"
+    results.to_csv(output_filename, index=False)
+    logger.info(f"{len(results)} folds en {time.perf_counter() - start:.1f}s. Resultados en '{output_filename}'.")
+    logger.info(f"Rentabilidad fuera de muestra (compuesta): {out_of_sample_return_pct(results):.2f}%")
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from src.backtesting.utils_backtesting import rsi_columns, bollinger_columns, atr_columns
+
+logger = logging.getLogger(__name__)
+
+# Indicadores disponibles: nombre -> funcion pura que devuelve {columna: serie}.
+INDICATORS = {
+    'rsi': rsi_columns,
+    'bollinger': bollinger_columns,
+    'atr': atr_columns,
+}
+
+# Version del calculo de cada indicador. Forma parte del nombre en la cache en disco: al cambiar
+# como se calcula un indicador se sube su version y las entradas antiguas dejan de usarse.
+INDICATOR_VERSIONS = {
+    'rsi': 1,
+    'bollinger': 3,  # rolling() de pandas (la version 2 sumaba cada ventana por separado)
+    'atr': 1,
+}
+
+DEFAULT_CACHE_DIR = ".indicator_cache"
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Huella del dataset: hash del indice y de las columnas OHLCV."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(df.index.to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+    for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def indicator_specs(rsi_period=14, bb_period=20, bb_std_dev=2, atr_period=14) -> dict[str, dict]:
+    """Indicadores que usa la estrategia de divergencia alcista, en el formato de IndicatorStore.with_indicators."""
+    return {
+        'rsi': {'period': rsi_period},
+        'bollinger': {'period': bb_period, 'std_dev': bb_std_dev},
+        'atr': {'period': atr_period},
+    }
+
+
+class IndicatorStore:
+    """
+    Calcula cada (indicador, parametros, huella del dataset) una sola vez y lo sirve desde memoria
+    o desde una cache en disco (.npy), ambas con expulsion LRU.
+    Los arrays devueltos son de solo lectura: nunca se modifica el DataFrame de entrada.
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_memory_entries: int = 64, max_disk_bytes: int = 2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[tuple, dict[str, np.ndarray]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, df: pd.DataFrame, name: str, dataset_key: str | None = None, **params) -> dict[str, np.ndarray]:
+        """Devuelve {columna: array de solo lectura} para el indicador pedido."""
+        if name not in INDICATORS:
+            raise ValueError(f"Indicador desconocido: {name}")
+        dataset_key = dataset_key or dataset_fingerprint(df)
+        key = (dataset_key, name, tuple(sorted(params.items())))
+
+        columns = self._memory.get(key)
+        if columns is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return columns
+
+        columns = self._load_from_disk(key)
+        if columns is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            columns = {}
+            for column, values in INDICATORS[name](df, **params).items():
+                array = values.to_numpy(dtype=np.float64, copy=True)
+                array.flags.writeable = False
+                columns[column] = array
+            self._save_to_disk(key, columns)
+
+        self._memory[key] = columns
+        if len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+        return columns
+
+    def with_indicators(self, df: pd.DataFrame, specs: dict[str, dict], dataset_key: str | None = None) -> pd.DataFrame:
+        """
+        Devuelve un DataFrame nuevo con las columnas de df mas los indicadores pedidos.
+        df no se modifica, asi que varias estrategias pueden partir del mismo DataFrame.
+        """
+        dataset_key = dataset_key or dataset_fingerprint(df)
+        new_columns = {}
+        for name, params in specs.items():
+            new_columns.update(self.get(df, name, dataset_key, **params))
+        result = df.copy(deep=False)
+        for column, values in new_columns.items():
+            result[column] = pd.Series(values, index=df.index, copy=False)
+        return result
+
+    # --- Cache en disco ---
+
+    def _entry_paths(self, key: tuple) -> tuple[str, str]:
+        dataset_key, name, params = key
+        # Sin puntos en el nombre: el prefijo de cada fichero llega hasta el primer '.'.
+        params_str = "_".join(f"{param}-{value}".replace(".", "p") for param, value in params)
+        return os.path.join(self.cache_dir, dataset_key), f"{name}_v{INDICATOR_VERSIONS[name]}_{params_str}" # type: ignore
+
+    def _load_from_disk(self, key: tuple) -> dict[str, np.ndarray] | None:
+        if self.cache_dir is None:
+            return None
+        directory, prefix = self._entry_paths(key)
+        index_path = os.path.join(directory, f"{prefix}.columns")
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path) as index_file:
+                column_names = index_file.read().split()
+            columns = {}
+            for column in column_names:
+                path = os.path.join(directory, f"{prefix}.{column}.npy")
+                columns[column] = np.load(path, mmap_mode='r')
+                os.utime(path)  # Marca de uso para la expulsion LRU
+            os.utime(index_path)
+            return columns
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache ilegible ({prefix}), se recalcula: {e}")
+            return None
+
+    def _save_to_disk(self, key: tuple, columns: dict[str, np.ndarray]) -> None:
+        if self.cache_dir is None:
+            return
+        directory, prefix = self._entry_paths(key)
+        os.makedirs(directory, exist_ok=True)
+        for column, values in columns.items():
+            path = os.path.join(directory, f"{prefix}.{column}.npy")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as tmp_file:
+                np.save(tmp_file, values)
+            os.replace(tmp_path, path)
+        # El indice de columnas se escribe al final: una entrada sin indice se considera incompleta.
+        index_path = os.path.join(directory, f"{prefix}.columns")
+        with open(f"{index_path}.tmp", "w") as index_file:
+            index_file.write("\n".join(columns))
+        os.replace(f"{index_path}.tmp", index_path)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Borra las entradas usadas hace mas tiempo hasta quedar por debajo de max_disk_bytes."""
+        entries = {}
+        for root, _, files in os.walk(self.cache_dir): # type: ignore
+            for file_name in files:
+                prefix = file_name.split(".", 1)[0]
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                size, last_used, paths = entries.get((root, prefix), (0, 0.0, []))
+                entries[(root, prefix)] = (size + stat.st_size, max(last_used, stat.st_mtime), paths + [path])
+
+        total = sum(size for size, _, _ in entries.values())
+        for size, _, paths in sorted(entries.values(), key=lambda entry: entry[1]):
+            if total <= self.max_disk_bytes:
+                break
+            for path in paths:
+                os.remove(path)
+            total -= size
@@ -0,0 +1,32 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit as _numba_njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    _numba_njit = None
+    NUMBA_AVAILABLE = False
+
+
+def njit(*args, **kwargs):
+    """
+    Compila la funcion con numba.njit si numba esta instalado.
+    Sin numba devuelve la funcion Python tal cual, de modo que el codigo funciona igual (pero mas lento).
+    """
+    if NUMBA_AVAILABLE:
+        return _numba_njit(*args, **kwargs) # type: ignore
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
+
+
+def resolve_use_numba(use_numba: bool | None) -> bool:
+    """None = usar numba si esta disponible. True sin numba instalado cae a Python con un aviso."""
+    if use_numba is None:
+        return NUMBA_AVAILABLE
+    if use_numba and not NUMBA_AVAILABLE:
+        logger.warning("Numba no esta instalado. Se usara la implementacion en Python puro.")
+        return False
+    return use_numba
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from src.backtesting.utils_backtesting import rsi_columns, bollinger_columns
+from src.get_training_data.ohlcv_store import timeframe_to_ms
+
+# Union de indicadores de un timeframe superior sobre las velas base sin mirar al futuro:
+# cada vela base solo ve la ultima vela superior que ya estaba cerrada cuando cerro la vela base.
+
+
+def _index_ms(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.to_numpy(dtype="datetime64[ms]").view(np.int64)
+
+
+def closed_bar_positions(base_index: pd.DatetimeIndex, higher_index: pd.DatetimeIndex,
+                         base_timeframe: str, higher_timeframe: str) -> np.ndarray:
+    """
+    Para cada vela base, posicion entera (en higher_index) de la ultima vela superior cerrada al cierre de la
+    vela base, o -1 si aun no hay ninguna. Los indices son tiempos de apertura, como en el almacen.
+    """
+    base_close = _index_ms(base_index) + timeframe_to_ms(base_timeframe)
+    higher_close = _index_ms(higher_index) + timeframe_to_ms(higher_timeframe)
+    return np.searchsorted(higher_close, base_close, side="right") - 1
+
+
+def align_to_base(base_index: pd.DatetimeIndex, higher_df: pd.DataFrame, columns: list[str],
+                  base_timeframe: str, higher_timeframe: str, prefix: str = "HTF_") -> pd.DataFrame:
+    """Columnas de higher_df alineadas a base_index (as-of sobre velas cerradas). NaN antes de la primera."""
+    positions = closed_bar_positions(base_index, higher_df.index, base_timeframe, higher_timeframe) # type: ignore
+    has_bar = positions >= 0
+    safe_positions = np.where(has_bar, positions, 0)
+    aligned = {}
+    for column in columns:
+        values = higher_df[column].to_numpy(dtype=np.float64)
+        aligned[f"{prefix}{column}"] = np.where(has_bar, values[safe_positions], np.nan) if len(values) else np.full(len(base_index), np.nan)
+    return pd.DataFrame(aligned, index=base_index)
+
+
+def higher_timeframe_indicators(higher_df: pd.DataFrame, rsi_period: int = 14, bb_period: int = 20, bb_std_dev: float = 2) -> pd.DataFrame:
+    """RSI, Bandas de Bollinger y posicion del cierre dentro de las bandas (0 = banda inferior, 1 = superior)."""
+    indicators = pd.DataFrame(index=higher_df.index)
+    for columns in (rsi_columns(higher_df, rsi_period), bollinger_columns(higher_df, bb_period, bb_std_dev)):
+        for name, values in columns.items():
+            indicators[name] = values
+    band_width = indicators['BB_Upper'] - indicators['BB_Lower']
+    indicators['BB_Position'] = (higher_df['Close'] - indicators['BB_Lower']) / band_width.where(band_width > 0)
+    return indicators
@@ -0,0 +1,343 @@
+import types
+import numpy as np
+import pandas as pd
+from src.backtesting.jit import njit, NUMBA_AVAILABLE, resolve_use_numba
+from src.backtesting.bullish_divergence.simulation_engine import (
+    EVT_SIGNAL, EVT_ENTRY, EVT_REJECT_CAPITAL, EVT_SL, EVT_SL_BE, EVT_TP1, EVT_TP2, EVT_TIME_STOP, EVT_FORCED_CLOSE,
+    EV_KIND, EV_BAR, EV_ENTRY_PRICE, EV_EXIT_PRICE, EV_POSITION_SIZE, EV_COST, EV_PNL, EV_PNL_TOTAL, EV_CAPITAL,
+    EV_SL_PRICE, EV_TP_PRICE, EV_RISK_USD, EVENT_FIELDS, EXIT_REASONS,
+)
+
+# Motor de cartera: varias posiciones abiertas a la vez, en uno o varios simbolos, con un unico capital.
+# Las reglas de cada posicion son las de simulation_engine (SL, TP1 a mitad + SL a breakeven, TP2, Time Stop);
+# la diferencia es que los precios de SL/TP1/TP2 llegan ya calculados por la estrategia.
+
+# --- POSICIONES (struct-of-arrays) ---
+# Matriz float64 (campo, hueco) preasignada: cada fila es un campo y cada columna un hueco de posicion.
+P_SYMBOL = 0
+P_ENTRY_INDEX = 1
+P_ENTRY_PRICE = 2
+P_POSITION_SIZE = 3
+P_SL_PRICE = 4
+P_TP1_PRICE = 5
+P_TP2_PRICE = 6
+P_TOTAL_COST = 7
+P_COST_PART1 = 8
+P_COST_PART2 = 9
+P_PNL_PART1 = 10
+P_IS_PHASE_2 = 11
+POSITION_FIELDS = 12
+
+# Los eventos son los de simulation_engine mas la columna del simbolo.
+EVT_REJECT_POSITIONS = 9  # Senial ignorada porque no quedan huecos de posicion libres
+EV_SYMBOL = EVENT_FIELDS
+PORTFOLIO_EVENT_FIELDS = EVENT_FIELDS + 1
+
+# Columnas (por simbolo) que necesita el motor. stop/target/final_target son los precios teoricos de SL, TP1 y TP2
+# en cada vela: los de SL y TP1 se fijan en la vela de entrada y el de TP2 en la vela en la que se alcanza TP1.
+PORTFOLIO_INPUTS = ('high', 'low', 'close', 'stop_price', 'target_price', 'final_target_price', 'entry_signal')
+
+
+def portfolio_event_capacity(n_signals: int, max_open_positions: int) -> int:
+    """Cota superior de eventos: senial + entrada + TP1 + cierre por senial, mas un cierre forzado por hueco."""
+    return 4 * n_signals + max_open_positions
+
+
+def _write_portfolio_event(events, n_events, kind, bar, symbol, entry_price, exit_price, position_size,
+                           cost, pnl, pnl_total, capital, sl_price, tp_price, risk_usd):
+    events[n_events, EV_KIND] = kind
+    events[n_events, EV_BAR] = bar
+    events[n_events, EV_ENTRY_PRICE] = entry_price
+    events[n_events, EV_EXIT_PRICE] = exit_price
+    events[n_events, EV_POSITION_SIZE] = position_size
+    events[n_events, EV_COST] = cost
+    events[n_events, EV_PNL] = pnl
+    events[n_events, EV_PNL_TOTAL] = pnl_total
+    events[n_events, EV_CAPITAL] = capital
+    events[n_events, EV_SL_PRICE] = sl_price
+    events[n_events, EV_TP_PRICE] = tp_price
+    events[n_events, EV_RISK_USD] = risk_usd
+    events[n_events, EV_SYMBOL] = symbol
+    return n_events + 1
+
+
+def _manage_position(positions, p, account, i, high, low, close, final_target,
+                     fee_rate, max_candles_open, events, n_events):
+    """
+    Aplica a la posicion del hueco p las reglas de salida de _step_bar, en el mismo orden.
+    Devuelve (numero de eventos, 1 si la posicion se ha cerrado del todo).
+    """
+    nan = np.nan
+    symbol = positions[P_SYMBOL, p]
+    is_phase_2 = positions[P_IS_PHASE_2, p] != 0.0
+    # Stop Loss (antes de TP1)
+    if not is_phase_2 and low <= positions[P_SL_PRICE, p]:
+        exit_price = positions[P_SL_PRICE, p]
+        cash_in = positions[P_POSITION_SIZE, p] * exit_price * (1 - fee_rate)
+        pnl = cash_in - positions[P_TOTAL_COST, p]
+        account[0] += cash_in
+        n_events = _write_portfolio_event(events, n_events, EVT_SL, i, symbol, positions[P_ENTRY_PRICE, p], exit_price,
+                                          positions[P_POSITION_SIZE, p], positions[P_TOTAL_COST, p], pnl, pnl,
+                                          account[0], exit_price, nan, nan)
+        return n_events, 1
+
+    # Stop Loss (despues de TP1 - Breakeven)
+    if is_phase_2 and low <= positions[P_SL_PRICE, p]:
+        exit_price = positions[P_SL_PRICE, p]
+        cash_in_part2 = positions[P_POSITION_SIZE, p] * exit_price * (1 - fee_rate)
+        pnl_part2 = cash_in_part2 - positions[P_COST_PART2, p]
+        account[0] += cash_in_part2
+        n_events = _write_portfolio_event(events, n_events, EVT_SL_BE, i, symbol, positions[P_ENTRY_PRICE, p], exit_price,
+                                          positions[P_POSITION_SIZE, p], positions[P_TOTAL_COST, p], pnl_part2,
+                                          positions[P_PNL_PART1, p] + pnl_part2, account[0], exit_price, nan, nan)
+        return n_events, 1
+
+    # Fase 2: Take Profit 2
+    if is_phase_2 and high >= positions[P_TP2_PRICE, p]:
+        exit_price = positions[P_TP2_PRICE, p]
+        cash_in_part2 = positions[P_POSITION_SIZE, p] * exit_price * (1 - fee_rate)
+        pnl_part2 = cash_in_part2 - positions[P_COST_PART2, p]
+        account[0] += cash_in_part2
+        pnl_total = (positions[P_PNL_PART1, p] + pnl_part2)
+        n_events = _write_portfolio_event(events, n_events, EVT_TP2, i, symbol, positions[P_ENTRY_PRICE, p], exit_price,
+                                          positions[P_POSITION_SIZE, p], positions[P_TOTAL_COST, p], pnl_part2, pnl_total,
+                                          account[0], nan, exit_price, nan)
+        return n_events, 1
+
+    # Fase 1: Take Profit 1 (se vende la mitad y el SL pasa a breakeven)
+    if not is_phase_2 and high >= positions[P_TP1_PRICE, p]:
+        exit_price_tp1 = positions[P_TP1_PRICE, p]
+        half_position = positions[P_POSITION_SIZE, p] / 2
+        cash_in_part1 = half_position * exit_price_tp1 * (1 - fee_rate)
+        pnl_part1 = cash_in_part1 - positions[P_COST_PART1, p]
+        account[0] += cash_in_part1
+        positions[P_POSITION_SIZE, p] = half_position
+        positions[P_IS_PHASE_2, p] = 1.0
+        positions[P_PNL_PART1, p] = pnl_part1
+        positions[P_SL_PRICE, p] = positions[P_COST_PART2, p] / (half_position * (1 - fee_rate))
+        positions[P_TP2_PRICE, p] = final_target
+        n_events = _write_portfolio_event(events, n_events, EVT_TP1, i, symbol, positions[P_ENTRY_PRICE, p], exit_price_tp1,
+                                          half_position, positions[P_TOTAL_COST, p], pnl_part1, pnl_part1,
+                                          account[0], positions[P_SL_PRICE, p], positions[P_TP2_PRICE, p], nan)
+        return n_events, 0
+
+    # Time Stop
+    if i - positions[P_ENTRY_INDEX, p] >= max_candles_open:
+        exit_price = close
+        account[0] += positions[P_POSITION_SIZE, p] * exit_price * (1 - fee_rate)
+        n_events = _write_portfolio_event(events, n_events, EVT_TIME_STOP, i, symbol, positions[P_ENTRY_PRICE, p], exit_price,
+                                          positions[P_POSITION_SIZE, p], positions[P_TOTAL_COST, p], nan, nan,
+                                          account[0], nan, nan, nan)
+        return n_events, 1
+
+    return n_events, 0
+
+
+def _portfolio_loop(account, high, low, close, stop_price, target_price, final_target_price,
+                    signal_ptr, signal_symbols, fee_rate, risk_per_trade_pct, max_candles_open,
+                    max_positions_per_symbol, positions, events, equity, close_at_end):
+    """
+    Bucle temporal unico para todos los simbolos. En cada vela solo se visitan las posiciones abiertas
+    y las seniales de esa vela (signal_ptr/signal_symbols en formato CSR), nunca todos los simbolos.
+    """
+    nan = np.nan
+    n_bars, n_symbols = close.shape
+    max_open_positions = positions.shape[1]
+    open_slots = np.empty(max_open_positions, dtype=np.int64)   # Huecos ocupados, en orden de apertura
+    free_slots = np.empty(max_open_positions, dtype=np.int64)   # Pila de huecos libres
+    closed_slots = np.empty(max_open_positions, dtype=np.int64)
+    for k in range(max_open_positions):
+        free_slots[k] = max_open_positions - 1 - k
+    n_open = 0
+    n_free = max_open_positions
+    open_count = np.zeros(n_symbols, dtype=np.int64)
+    mark_price = np.full(n_symbols, nan)
+    n_events = 0
+
+    for i in range(n_bars):
+        # --- A. GESTION DE LAS POSICIONES ABIERTAS ---
+        n_closed = 0
+        kept = 0
+        for k in range(n_open):
+            p = open_slots[k]
+            s = int(positions[P_SYMBOL, p])
+            closed = 0
+            if close[i, s] == close[i, s]:  # Sin vela para el simbolo (NaN): la posicion sigue igual
+                n_events, closed = _manage_position(positions, p, account, i, high[i, s], low[i, s], close[i, s],
+                                                    final_target_price[i, s], fee_rate, max_candles_open, events, n_events)
+            if closed:
+                closed_slots[n_closed] = p
+                n_closed += 1
+                free_slots[n_free] = p
+                n_free += 1
+            else:
+                open_slots[kept] = p
+                kept += 1
+        n_open = kept
+
+        # --- B. NUEVAS ENTRADAS ---
+        for j in range(signal_ptr[i], signal_ptr[i + 1]):
+            s = signal_symbols[j]
+            # Como en el motor de un solo simbolo, una posicion cerrada en esta vela no deja entrar hasta la siguiente.
+            if open_count[s] >= max_positions_per_symbol:
+                continue
+            capital = account[0]
+            n_events = _write_portfolio_event(events, n_events, EVT_SIGNAL, i, s, close[i, s], nan, nan, nan, nan, nan,
+                                              capital, nan, nan, nan)
+            precio_entrada = close[i, s]
+            precio_sl_teorico = stop_price[i, s]
+            precio_tp1_teorico = target_price[i, s]
+
+            costo_total_entrada = precio_entrada * (1 + fee_rate)
+            ingreso_neto_sl = precio_sl_teorico * (1 - fee_rate)
+            riesgo_real_unitario = costo_total_entrada - ingreso_neto_sl
+            if riesgo_real_unitario <= 0:
+                continue
+
+            riesgo_en_usd = capital * risk_per_trade_pct
+            tamanio_posicion = riesgo_en_usd / riesgo_real_unitario
+            costo_bruto_posicion = tamanio_posicion * precio_entrada
+            costo_total_con_comision = costo_bruto_posicion * (1 + fee_rate)
+
+            if costo_total_con_comision > capital:
+                n_events = _write_portfolio_event(events, n_events, EVT_REJECT_CAPITAL, i, s, precio_entrada, nan,
+                                                  tamanio_posicion, costo_total_con_comision, nan, nan,
+                                                  capital, precio_sl_teorico, precio_tp1_teorico, riesgo_en_usd)
+                continue
+            if n_free == 0:
+                n_events = _write_portfolio_event(events, n_events, EVT_REJECT_POSITIONS, i, s, precio_entrada, nan,
+                                                  tamanio_posicion, costo_total_con_comision, nan, nan,
+                                                  capital, precio_sl_teorico, precio_tp1_teorico, riesgo_en_usd)
+                continue
+
+            n_free -= 1
+            p = free_slots[n_free]
+            open_slots[n_open] = p
+            n_open += 1
+            open_count[s] += 1
+            account[0] = capital - costo_total_con_comision
+            positions[P_SYMBOL, p] = s
+            positions[P_ENTRY_INDEX, p] = i
+            positions[P_ENTRY_PRICE, p] = precio_entrada
+            positions[P_POSITION_SIZE, p] = tamanio_posicion
+            positions[P_SL_PRICE, p] = precio_sl_teorico
+            positions[P_TP1_PRICE, p] = precio_tp1_teorico
+            positions[P_TP2_PRICE, p] = nan
+            positions[P_TOTAL_COST, p] = costo_total_con_comision
+            positions[P_COST_PART1, p] = costo_total_con_comision / 2
+            positions[P_COST_PART2, p] = costo_total_con_comision / 2
+            positions[P_PNL_PART1, p] = 0.0
+            positions[P_IS_PHASE_2, p] = 0.0
+            n_events = _write_portfolio_event(events, n_events, EVT_ENTRY, i, s, precio_entrada, nan,
+                                              tamanio_posicion, costo_total_con_comision, nan, nan,
+                                              account[0], precio_sl_teorico, precio_tp1_teorico, riesgo_en_usd)
+
+        for k in range(n_closed):
+            open_count[int(positions[P_SYMBOL, closed_slots[k]])] -= 1
+
+        # --- C. CURVA DE CAPITAL (valor de mercado de las posiciones al ultimo cierre conocido) ---
+        equity_value = account[0]
+        for k in range(n_open):
+            p = open_slots[k]
+            s = int(positions[P_SYMBOL, p])
+            if close[i, s] == close[i, s]:
+                mark_price[s] = close[i, s]
+            price = mark_price[s] if mark_price[s] == mark_price[s] else positions[P_ENTRY_PRICE, p]
+            equity_value += positions[P_POSITION_SIZE, p] * price
+        equity[i] = equity_value
+
+    # --- D. CIERRE FORZADO DE LO QUE QUEDE ABIERTO ---
+    if close_at_end and n_bars > 0:
+        for k in range(n_open):
+            p = open_slots[k]
+            s = int(positions[P_SYMBOL, p])
+            last_close = mark_price[s] if mark_price[s] == mark_price[s] else positions[P_ENTRY_PRICE, p]
+            account[0] += positions[P_POSITION_SIZE, p] * last_close * (1 - fee_rate)
+            n_events = _write_portfolio_event(events, n_events, EVT_FORCED_CLOSE, n_bars - 1, s, positions[P_ENTRY_PRICE, p],
+                                              last_close, positions[P_POSITION_SIZE, p], positions[P_TOTAL_COST, p],
+                                              nan, nan, account[0], nan, nan, nan)
+            open_count[s] -= 1
+        n_open = 0
+        equity[n_bars - 1] = account[0]
+    return n_events
+
+
+# --- SELECCION DE IMPLEMENTACION (mismo esquema que simulation_engine) ---
+def _as_python(func, namespace: dict):
+    return types.FunctionType(func.__code__, namespace, func.__name__, func.__defaults__)
+
+_python_namespace = dict(globals())
+for _func in (_write_portfolio_event, _manage_position, _portfolio_loop):
+    _python_namespace[_func.__name__] = _as_python(_func, _python_namespace)
+_portfolio_loop_py = _python_namespace['_portfolio_loop']
+
+if NUMBA_AVAILABLE:
+    _write_portfolio_event = njit(cache=True)(_write_portfolio_event)
+    _manage_position = njit(cache=True)(_manage_position)
+    _portfolio_loop = njit(cache=True)(_portfolio_loop)
+_portfolio_loop_jit = _portfolio_loop
+
+
+def build_portfolio_arrays(frames: dict[str, pd.DataFrame]) -> dict:
+    """
+    Alinea los DataFrames de cada simbolo (columnas PORTFOLIO_INPUTS) sobre la union de sus indices
+    y devuelve matrices (vela, simbolo) contiguas. Las velas que faltan quedan a NaN y sin senial.
+    """
+    symbols = list(frames)
+    index = frames[symbols[0]].index
+    for df in frames.values():
+        if not df.index.equals(index):
+            index = index.union(df.index)
+    arrays = {'symbols': symbols, 'index': index}
+    for column in PORTFOLIO_INPUTS:
+        dtype = bool if column == 'entry_signal' else np.float64
+        matrix = np.empty((len(index), len(symbols)), dtype=dtype)
+        for s, symbol in enumerate(symbols):
+            series = frames[symbol][column]
+            if not series.index.equals(index):
+                series = series.reindex(index, fill_value=False if dtype is bool else np.nan)
+            matrix[:, s] = series.to_numpy(dtype=dtype)
+        arrays[column] = matrix
+    # Solo son entradas validas las seniales con precios de entrada, SL y TP1 definidos.
+    arrays['entry_signal'] &= (np.isfinite(arrays['close']) & np.isfinite(arrays['stop_price'])
+                               & np.isfinite(arrays['target_price']))
+    return arrays
+
+
+def simulate_portfolio(
+                       arrays: dict,
+                       initial_capital: float,
+                       fee_rate: float,
+                       risk_per_trade_pct: float,
+                       max_candles_open: int,
+                       max_open_positions: int,
+                       max_positions_per_symbol: int = 1,
+                       use_numba: bool | None = None,
+                       close_at_end: bool = True) -> tuple[float, np.ndarray, np.ndarray]:
+    """
+    Ejecuta la simulacion de cartera. Devuelve (capital final, eventos, curva de capital por vela).
+    Dentro de una vela se gestionan primero las posiciones abiertas y despues las seniales, por orden de simbolo.
+    """
+    signal_bars, signal_symbols = np.nonzero(arrays['entry_signal'])
+    n_bars = arrays['close'].shape[0]
+    signal_ptr = np.searchsorted(signal_bars, np.arange(n_bars + 1)).astype(np.int64)
+
+    account = np.array([initial_capital], dtype=np.float64)
+    positions = np.full((POSITION_FIELDS, max_open_positions), np.nan)
+    events = np.empty((portfolio_event_capacity(len(signal_bars), max_open_positions), PORTFOLIO_EVENT_FIELDS), dtype=np.float64)
+    equity = np.empty(n_bars, dtype=np.float64)
+    loop = _portfolio_loop_jit if resolve_use_numba(use_numba) else _portfolio_loop_py
+    n_events = loop(account, *(np.ascontiguousarray(arrays[column]) for column in PORTFOLIO_INPUTS[:-1]),
+                    signal_ptr, signal_symbols.astype(np.int64), float(fee_rate), float(risk_per_trade_pct),
+                    int(max_candles_open), int(max_positions_per_symbol), positions, events, equity, close_at_end)
+    return float(account[0]), events[:n_events], equity
+
+
+def portfolio_trade_log(events: np.ndarray, symbols: list[str]) -> list[dict]:
+    """Como events_to_trade_log, con el simbolo de cada operacion cerrada."""
+    trade_log = []
+    for kind, symbol, entry_price, exit_price in events[:, [EV_KIND, EV_SYMBOL, EV_ENTRY_PRICE, EV_EXIT_PRICE]]:
+        reason = EXIT_REASONS.get(int(kind))
+        if reason is not None:
+            trade_log.append({'symbol': symbols[int(symbol)], 'entry': float(entry_price), 'exit': float(exit_price), 'reason': reason})
+    return trade_log
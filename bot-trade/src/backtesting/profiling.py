@@ -0,0 +1,139 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    _PyinstrumentProfiler = None
+    PYINSTRUMENT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def peak_rss_mb() -> float | None:
+    """Pico de memoria residente del proceso hasta ahora (None si la plataforma no lo expone)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes.
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+class PipelineProfiler:
+    """
+    Instrumentacion opcional de las etapas del pipeline: tiempo real, tiempo de CPU, filas procesadas,
+    filas por segundo y pico de RSS del proceso al terminar cada etapa. Desactivado no mide nada.
+    profile_stage captura ademas un perfil (cProfile o pyinstrument) de esa unica etapa.
+    """
+
+    def __init__(self, enabled: bool = True, profile_stage: str | None = None, profiler: str = "cprofile",
+                 profile_output: str | None = None):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Profiler desconocido: {profiler}. Opciones: {', '.join(PROFILERS)}")
+        if profiler == "pyinstrument" and not PYINSTRUMENT_AVAILABLE:
+            logger.warning("pyinstrument no esta instalado. Se usara cProfile.")
+            profiler = "cprofile"
+        self.enabled = enabled
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_output = profile_output
+        self.stages: list[dict] = []
+
+    @contextmanager
+    def _capture_profile(self, name: str) -> Iterator[None]:
+        if self.profiler == "pyinstrument":
+            profiler = _PyinstrumentProfiler() # type: ignore
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                logger.info(f"Perfil de la etapa '{name}':\n{profiler.output_text(unicode=False, color=False)}")
+                if self.profile_output:
+                    with open(self.profile_output, "w") as profile_file:
+                        profile_file.write(profiler.output_html())
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+            logger.info(f"Perfil de la etapa '{name}':\n{stream.getvalue()}")
+            if self.profile_output:
+                profiler.dump_stats(self.profile_output)
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None) -> Iterator[dict]:
+        """
+        Mide el bloque como una etapa. Devuelve el registro de la etapa: si las filas solo se conocen
+        al final, se pueden asignar dentro del bloque con record['rows'] = n.
+        """
+        record = {'stage': name, 'rows': rows}
+        if not self.enabled:
+            yield record
+            return
+        capture = self._capture_profile(name) if name == self.profile_stage else nullcontext()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with capture:
+                yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall_start
+            record['cpu_s'] = time.process_time() - cpu_start
+            record['rows_per_s'] = record['rows'] / record['wall_s'] if record['rows'] and record['wall_s'] > 0 else None
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.stages.append(record)
+
+    def profiled(self, name: str | None = None) -> Callable:
+        """Decorador: mide cada llamada como una etapa; las filas son len() del primer argumento si lo tiene."""
+        def decorator(function: Callable) -> Callable:
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                rows = len(args[0]) if args and hasattr(args[0], "__len__") else None
+                with self.stage(stage_name, rows):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary_table(self) -> str:
+        lines = [f"{'Etapa':<24} {'Real (s)':>10} {'CPU (s)':>10} {'Filas':>12} {'Filas/s':>14} {'Pico RSS (MB)':>14}"]
+        for record in self.stages:
+            rows = f"{record['rows']:,}" if record['rows'] is not None else "-"
+            rows_per_s = f"{record['rows_per_s']:,.0f}" if record['rows_per_s'] is not None else "-"
+            peak = f"{record['peak_rss_mb']:,.1f}" if record['peak_rss_mb'] is not None else "-"
+            lines.append(f"{record['stage']:<24} {record['wall_s']:>10.3f} {record['cpu_s']:>10.3f} {rows:>12} {rows_per_s:>14} {peak:>14}")
+        total_wall = sum(record['wall_s'] for record in self.stages)
+        total_cpu = sum(record['cpu_s'] for record in self.stages)
+        lines.append(f"{'TOTAL':<24} {total_wall:>10.3f} {total_cpu:>10.3f}")
+        return "\n".join(lines)
+
+    def log_summary(self) -> None:
+        if self.enabled and self.stages:
+            logger.info(f"Tiempos por etapa:\n{self.summary_table()}")
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w") as json_file:
+            json.dump({'stages': self.stages}, json_file, indent=2)
@@ -0,0 +1,333 @@
+import math
+from collections import deque
+
+# Versiones incrementales de los indicadores de utils_backtesting: cada objeto recibe una vela cada vez
+# y actualiza su estado en O(1), sin recalcular el historico. Los valores coinciden con las funciones
+# por lotes (rsi_columns, bollinger_columns, atr_columns), repitiendo sus operaciones en coma flotante.
+# El estado se puede guardar con snapshot() y recuperar con restore() (p. ej. al reiniciar un bot en vivo).
+
+NAN = float('nan')
+
+
+class _StreamingState:
+    __slots__ = ()
+    _deques: tuple = ()  # Atributos que son deque (el snapshot los guarda como listas)
+
+    def snapshot(self) -> dict:
+        """Copia del estado interno (solo tipos basicos, serializable a JSON)."""
+        state = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            state[name] = list(value) if isinstance(value, (list, deque)) else value
+        return state
+
+    @classmethod
+    def restore(cls, state: dict):
+        obj = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = state[name]
+            if name in cls._deques:
+                value = deque(tuple(item) if isinstance(item, list) else item for item in value)
+            elif isinstance(value, list):
+                value = list(value)
+            setattr(obj, name, value)
+        return obj
+
+
+def _ewm_step(average: float, value: float, alpha: float) -> float:
+    """Un paso de ewm(adjust=False) con las mismas operaciones que pandas."""
+    old_weight = 1.0 - alpha
+    return (old_weight * average + alpha * value) / (old_weight + alpha)
+
+
+class StreamingRSI(_StreamingState):
+    """RSI con medias exponenciales de Wilder (ewm com=period-1), valido a partir de period variaciones."""
+    __slots__ = ('period', 'alpha', 'prev_close', 'avg_gain', 'avg_loss', 'n_obs', 'value')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.prev_close = NAN
+        self.avg_gain = NAN
+        self.avg_loss = NAN
+        self.n_obs = 0
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        if math.isnan(self.prev_close):
+            self.prev_close = close
+            return self.value
+        delta = close - self.prev_close
+        self.prev_close = close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if self.n_obs == 0:
+            self.avg_gain = gain
+            self.avg_loss = loss
+        else:
+            self.avg_gain = _ewm_step(self.avg_gain, gain, self.alpha)
+            self.avg_loss = _ewm_step(self.avg_loss, loss, self.alpha)
+        self.n_obs += 1
+        if self.n_obs < self.period:
+            return self.value
+        if self.avg_loss == 0:
+            self.value = NAN if self.avg_gain == 0 else 100.0
+        else:
+            self.value = 100 - (100 / (1 + self.avg_gain / self.avg_loss))
+        return self.value
+
+
+class StreamingBollinger(_StreamingState):
+    """
+    Bandas de Bollinger sobre una ventana deslizante (buffer circular). Media y varianza poblacional (ddof=0)
+    se actualizan al entrar y salir cada cierre con las mismas operaciones que rolling().mean()/.std() de pandas:
+    suma compensada (Kahan) para la media y Welford con compensacion para la varianza. El resultado es identico
+    salvo en ventanas con cierres repetidos, donde la desviacion puede diferir en el ultimo bit.
+    """
+    __slots__ = ('period', 'std_dev', 'window', 'position', 'count', 'same_count', 'prev_value',
+                 'sum_x', 'sum_compensation_add', 'sum_compensation_remove',
+                 'mean_x', 'ssqdm_x', 'var_compensation_add', 'var_compensation_remove',
+                 'mid', 'upper', 'lower')
+
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.period = period
+        self.std_dev = std_dev
+        self.window = [0.0] * period   # Ultimos period cierres
+        self.position = 0
+        self.count = 0
+        self.same_count = 0            # Cierres iguales consecutivos
+        self.prev_value = NAN
+        self.sum_x = 0.0
+        self.sum_compensation_add = 0.0
+        self.sum_compensation_remove = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.var_compensation_add = 0.0
+        self.var_compensation_remove = 0.0
+        self.mid = NAN
+        self.upper = NAN
+        self.lower = NAN
+
+    def _add(self, value: float) -> None:
+        self.count += 1
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+        y = value - self.sum_compensation_add
+        t = self.sum_x + y
+        self.sum_compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        prev_mean = self.mean_x - self.var_compensation_add
+        y = value - self.var_compensation_add
+        t = y - self.mean_x
+        self.var_compensation_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.count
+        self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+        if self.ssqdm_x < 0:
+            # Solo ocurre por redondeo con todos los cierres de la ventana iguales: se parte de varianza 0 exacta.
+            self.ssqdm_x = 0.0
+            self.mean_x = value
+
+    def _remove(self, value: float) -> None:
+        y = -value - self.sum_compensation_remove
+        t = self.sum_x + y
+        self.sum_compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        self.count -= 1
+        prev_mean = self.mean_x - self.var_compensation_remove
+        y = value - self.var_compensation_remove
+        t = y - self.mean_x
+        self.var_compensation_remove = t + self.mean_x - y
+        self.mean_x = self.mean_x - t / self.count
+        self.ssqdm_x = self.ssqdm_x - (value - prev_mean) * (value - self.mean_x)
+
+    def update(self, close: float) -> tuple[float, float, float]:
+        old = self.window[self.position]
+        full = self.count == self.period
+        self.window[self.position] = close
+        self.position = (self.position + 1) % self.period
+        # Como pandas: primero sale el cierre mas antiguo y despues entra el nuevo.
+        if full:
+            self._remove(old)
+        self._add(close)
+        if self.count < self.period:
+            return self.mid, self.upper, self.lower
+
+        # Ventana con todos los cierres iguales: pandas devuelve ese valor exacto como media.
+        self.mid = self.prev_value if self.same_count >= self.count else self.sum_x / self.count
+        variance = self.ssqdm_x / self.count
+        band = math.sqrt(variance if variance > 0 else 0.0) * self.std_dev
+        self.upper = self.mid + band
+        self.lower = self.mid - band
+        return self.mid, self.upper, self.lower
+
+
+class StreamingATR(_StreamingState):
+    """ATR con media exponencial de Wilder (ewm alpha=1/period), como atr_columns: valido desde la primera vela."""
+    __slots__ = ('period', 'alpha', 'prev_close', 'value')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.prev_close = NAN
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = high - low
+        if not math.isnan(self.prev_close):
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = true_range if math.isnan(self.value) else _ewm_step(self.value, true_range, self.alpha)
+        return self.value
+
+
+class StreamingDivergence(_StreamingState):
+    """
+    Detector de divergencia alcista vela a vela con las reglas de find_divergence_signals:
+    un minimo del RSI en su ventana pivot_lookback_window se confirma cuando las confirmation_wait_candles
+    velas siguientes tienen un RSI mayor, y se empareja con el pivote anterior igual que _pair_divergence_pivots.
+    update devuelve el numero de vela del pivote que genera la senial en la vela actual, o -1.
+    """
+    __slots__ = ('pivot_lookback_window', 'confirmation_wait_candles', 'min_distance_between_pivots',
+                 'bar', 'rsi_window', 'recent', 'last_pivot_bar', 'last_pivot_rsi', 'last_pivot_close')
+    _deques = ('rsi_window', 'recent')
+
+    def __init__(self, pivot_lookback_window: int = 15, confirmation_wait_candles: int = 3, min_distance_between_pivots: int = 30):
+        self.pivot_lookback_window = pivot_lookback_window
+        self.confirmation_wait_candles = confirmation_wait_candles
+        self.min_distance_between_pivots = min_distance_between_pivots
+        self.bar = -1
+        self.rsi_window = deque()   # Ultimos pivot_lookback_window valores de RSI
+        self.recent = deque()       # (rsi, close, es_minimo_de_su_ventana) de las ultimas velas pendientes de confirmar
+        self.last_pivot_bar = -1
+        self.last_pivot_rsi = NAN
+        self.last_pivot_close = NAN
+
+    def update(self, rsi: float, close: float) -> int:
+        self.bar += 1
+        self.rsi_window.append(rsi)
+        if len(self.rsi_window) > self.pivot_lookback_window:
+            self.rsi_window.popleft()
+        # rolling(window).min() es NaN si falta algun valor de la ventana: entonces no hay pivote.
+        is_lookback_min = bool(len(self.rsi_window) == self.pivot_lookback_window
+                               and not any(math.isnan(value) for value in self.rsi_window)
+                               and rsi == min(self.rsi_window))
+        self.recent.append((rsi, close, is_lookback_min))
+        if len(self.recent) <= self.confirmation_wait_candles:
+            return -1
+
+        candidate_rsi, candidate_close, candidate_is_min = self.recent.popleft()
+        if not candidate_is_min or not all(candidate_rsi < later_rsi for later_rsi, _, _ in self.recent):
+            return -1
+
+        pivot_bar = self.bar - self.confirmation_wait_candles
+        if self.last_pivot_bar < 0:
+            self._set_last_pivot(pivot_bar, candidate_rsi, candidate_close)
+            return -1
+        if pivot_bar - self.last_pivot_bar < self.min_distance_between_pivots:
+            if candidate_rsi < self.last_pivot_rsi:
+                self._set_last_pivot(pivot_bar, candidate_rsi, candidate_close)
+            return -1
+
+        is_divergence = candidate_close < self.last_pivot_close and candidate_rsi > self.last_pivot_rsi
+        self._set_last_pivot(pivot_bar, candidate_rsi, candidate_close)
+        return pivot_bar if is_divergence else -1
+
+    def _set_last_pivot(self, bar: int, rsi: float, close: float) -> None:
+        self.last_pivot_bar = bar
+        self.last_pivot_rsi = rsi
+        self.last_pivot_close = close
+
+
+class StreamingIndicators:
+    """Agrupa los indicadores de la estrategia de divergencia alcista para un feed de velas en vivo."""
+    __slots__ = ('rsi', 'bollinger', 'atr', 'divergence')
+
+    def __init__(self, rsi_period=14, bb_period=20, bb_std_dev=2, atr_period=14,
+                 pivot_lookback_window=15, confirmation_wait_candles=3, min_distance_between_pivots=30):
+        self.rsi = StreamingRSI(rsi_period)
+        self.bollinger = StreamingBollinger(bb_period, bb_std_dev)
+        self.atr = StreamingATR(atr_period)
+        self.divergence = StreamingDivergence(pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)
+
+    def update(self, high: float, low: float, close: float) -> dict:
+        """Procesa una vela cerrada y devuelve los valores con los nombres de columna de los backtests."""
+        high, low, close = float(high), float(low), float(close)
+        rsi = self.rsi.update(close)
+        bb_mid, bb_upper, bb_lower = self.bollinger.update(close)
+        atr = self.atr.update(high, low, close)
+        pivot_bar = self.divergence.update(rsi, close)
+        return {
+            'RSI': rsi,
+            'BB_Mid': bb_mid,
+            'BB_Upper': bb_upper,
+            'BB_Lower': bb_lower,
+            'ATR': atr,
+            'bullish_divergence_signal': pivot_bar >= 0,
+            'generating_pivot_bar': pivot_bar,
+        }
+
+    def snapshot(self) -> dict:
+        return {name: getattr(self, name).snapshot() for name in self.__slots__}
+
+    @classmethod
+    def restore(cls, state: dict) -> 'StreamingIndicators':
+        obj = cls.__new__(cls)
+        obj.rsi = StreamingRSI.restore(state['rsi'])
+        obj.bollinger = StreamingBollinger.restore(state['bollinger'])
+        obj.atr = StreamingATR.restore(state['atr'])
+        obj.divergence = StreamingDivergence.restore(state['divergence'])
+        return obj
+
+
+class StreamingVolumeConfirmation(_StreamingState):
+    """
+    Filtro de volumen de precalculate_entry_filters para una senial en vivo: alguna vela verde entre el pivote
+    y la senial supera volume_threshold_multiplier veces la media de las ultimas 5 velas rojas de las
+    volume_search_window velas previas al pivote. Guarda solo las velas necesarias para esa ventana.
+    """
+    __slots__ = ('volume_search_window', 'confirmation_wait_candles', 'volume_threshold_multiplier', 'red_candles',
+                 'bar', 'history')
+    _deques = ('history',)
+
+    def __init__(self, volume_search_window: int = 100, confirmation_wait_candles: int = 3,
+                 volume_threshold_multiplier: float = 1.5, red_candles: int = 5):
+        self.volume_search_window = volume_search_window
+        self.confirmation_wait_candles = confirmation_wait_candles
+        self.volume_threshold_multiplier = volume_threshold_multiplier
+        self.red_candles = red_candles
+        self.bar = -1
+        self.history = deque()  # (open, close, volume) de las ultimas velas
+
+    def update(self, open_: float, close: float, volume: float, pivot_bar: int = -1) -> bool:
+        """Registra la vela y, si hay senial (pivot_bar >= 0), devuelve si el volumen la confirma."""
+        self.bar += 1
+        self.history.append((open_, close, volume))
+        if len(self.history) > self.volume_search_window + self.confirmation_wait_candles + 1:
+            self.history.popleft()
+        if pivot_bar < 0:
+            return False
+
+        def candle(bar: int) -> tuple:
+            return self.history[len(self.history) - 1 - (self.bar - bar)]
+
+        max_green_volume = -math.inf
+        for bar in range(pivot_bar + 1, self.bar + 1):
+            bar_open, bar_close, bar_volume = candle(bar)
+            if bar_close > bar_open and not math.isnan(bar_volume):
+                max_green_volume = max(max_green_volume, bar_volume)
+
+        red_volumes = []
+        search_start = max(0, pivot_bar - self.volume_search_window, self.bar - len(self.history) + 1)
+        for bar in range(pivot_bar - 1, search_start - 1, -1):
+            bar_open, bar_close, bar_volume = candle(bar)
+            if bar_close < bar_open:
+                red_volumes.append(bar_volume)
+                if len(red_volumes) == self.red_candles:
+                    break
+        if len(red_volumes) < self.red_candles:
+            return False
+        # Misma suma (de la mas antigua a la mas reciente) que el calculo por lotes.
+        red_volume_sum = 0.0
+        for red_volume in reversed(red_volumes):
+            red_volume_sum = red_volume_sum + red_volume
+        return bool(max_green_volume > self.volume_threshold_multiplier * (red_volume_sum / self.red_candles))
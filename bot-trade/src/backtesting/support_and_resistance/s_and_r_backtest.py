@@ -1,22 +1,28 @@
+import argparse
 import logging
-import pandas as pd
-from src.backtesting.utils_backtesting import calculate_bollinger_bands, calculate_rsi
+from src.backtesting.indicator_store import IndicatorStore, DEFAULT_CACHE_DIR
+from .s_and_r_functions import run_simulation
+from src.backtesting.utils_backtesting import scale_candle_parameters
+from src.get_training_data.resampling import load_resampled
 from src.utils import define_logging
 
 logger = logging.getLogger(__name__)
 
-def run_s_and_r_backtest():
-    timeframe = "1h"
+def run_s_and_r_backtest(symbol: str = "BTC/USDT", timeframe: str = "1h"):
     year = 2021
     rsi_period = 14
     bb_period = 20
     bb_std_dev = 2
 
     logger.info("Leyendo el archivo de datos...")
-    df = pd.read_csv(f"binance_BTCUSDT_{timeframe}_{year}.csv", index_col='TimeStamp', parse_dates=True)
+    # Como en bullish_backtest: la serie guardada o, si no esta, derivada de las velas de 1m del almacen.
+    df = load_resampled(symbol, timeframe, f"{year}-01-01", f"{year + 1}-01-01")
     logger.info("Calculando indicadores...")
-    calculate_rsi(df, period=rsi_period)
-    calculate_bollinger_bands(df, period=bb_period, std_dev=bb_std_dev)
+    indicator_store = IndicatorStore(cache_dir=DEFAULT_CACHE_DIR)
+    df = indicator_store.with_indicators(df, {
+        'rsi': {'period': rsi_period},
+        'bollinger': {'period': bb_period, 'std_dev': bb_std_dev},
+    })
     
     output_filename = f"s_and_r_backtest_annotated_data_{timeframe}_{year}.csv"
     logger.info(f"Guardando datos anotados en '{output_filename}'...")
@@ -30,7 +36,37 @@ def run_s_and_r_backtest():
     psychological_level = 5000.0
     tolerance_percentage = 0.015  # 1.5%
     max_open_position = 3
+    # 48 velas de 1h = 2 dias, traducido al timeframe del backtest (12 velas de 4h, 2880 de 1m).
+    max_candles_open = scale_candle_parameters({'max_candles_open': 48}, "1h", timeframe)['max_candles_open']
+
+    final_capital, trades = run_simulation(
+        df,
+        initial_capital,
+        fee_rate,
+        risk_per_trade_pct,
+        psychological_level,
+        tolerance_percentage,
+        max_open_position,
+        max_candles_open,
+        )
+
+    # --- Reporte Final ---
+    logger.info("-------------------------------------------")
+    logger.info("          RESULTADOS DEL BACKTEST          ")
+    logger.info("-------------------------------------------")
+    logger.info(f"Capital Inicial:    ${initial_capital:,.2f}")
+    logger.info(f"Capital Final:      ${final_capital:,.2f}")
+    pnl = final_capital - initial_capital
+    pnl_pct = (pnl / initial_capital) * 100
+    logger.info(f"Ganancia/Perdida:   ${pnl:,.2f} ({pnl_pct:.2f}%)")
+    logger.info(f"Total de operaciones cerradas: {len(trades)}")
+    logger.info("-------------------------------------------")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest de la estrategia de niveles psicologicos.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h", help="Timeframe del backtest (p. ej. 1m, 15m o 1h).")
+    args = parser.parse_args()
+
     define_logging("s_and_r_backtest_log.txt")
-    run_s_and_r_backtest()
\ No newline at end of file
+    run_s_and_r_backtest(args.symbol, args.timeframe)
\ No newline at end of file
@@ -1,29 +1,79 @@
+import numpy as np
 import pandas as pd
 import logging
+from src.backtesting.portfolio_engine import build_portfolio_arrays, simulate_portfolio, portfolio_trade_log
 
 logger = logging.getLogger(__name__)
 
+HIGH_PRICE = 100000           # Por encima de este precio se usa una tolerancia mas estrecha
+HIGH_PRICE_TOLERANCE = 0.01
+
+def find_level_entries(df: pd.DataFrame, psychological_level: float, tolerance_percentage: float) -> pd.DataFrame:
+    """
+    Marca como candidatas las velas que cierran justo por encima de un nivel psicologico (multiplo de
+    psychological_level), por debajo de la banda media de Bollinger y con RSI valido.
+    Devuelve un DataFrame nuevo con 'level_entry_signal' y 'support_level' (nivel mas cercano por debajo
+    del cierre); df no se modifica.
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    tolerance = np.where(close > HIGH_PRICE, HIGH_PRICE_TOLERANCE, tolerance_percentage)
+    distance_to_level = close % psychological_level
+    result = df.copy(deep=False)
+    result['support_level'] = close - distance_to_level
+    result['level_entry_signal'] = (
+        df['RSI'].notna().to_numpy()
+        & df['BB_Mid'].notna().to_numpy()
+        & (close <= df['BB_Mid'].to_numpy(dtype=np.float64))
+        & (distance_to_level <= close * tolerance)
+    )
+    return result
+
+def build_level_frame(df: pd.DataFrame, psychological_level: float) -> pd.DataFrame:
+    """
+    Columnas del motor de cartera: SL en el nivel anterior al soporte (support_level - psychological_level),
+    TP1 en la banda media y TP2 en la banda superior de Bollinger.
+    La entrada apuesta a que el nivel aguanta, pero se compra hasta tolerance_percentage por encima de el y
+    el precio suele perforarlo con mechas antes de rebotar: un SL justo debajo del nivel saltaria con ese
+    ruido. Si el nivel se pierde de verdad, el siguiente soporte es el multiplo anterior, y ahi se sale.
+    La distancia al SL es por tanto de un nivel (mas la tolerancia) y risk_per_trade_pct fija el tamanio
+    a partir de ella: las entradas cuyo coste supera el capital las rechaza el motor.
+    """
+    return pd.DataFrame({
+        'high': df['High'],
+        'low': df['Low'],
+        'close': df['Close'],
+        'stop_price': df['support_level'] - psychological_level,
+        'target_price': df['BB_Mid'],
+        'final_target_price': df['BB_Upper'],
+        'entry_signal': df['level_entry_signal'],
+    }, index=df.index)
+
 def run_simulation(df: pd.DataFrame,
                    initial_capital: float,
                    fee_rate: float,
                    risk_per_trade_pct: float,
                    psychological_level: float,
                    tolerance_percentage: float,
-                   max_open_position: int) -> None:
-    for index, row in df.iterrows():
-        closed_price = row['Close']
-        # Guard clauses
-        if pd.isna(row['BB_Mid']) or pd.isna(row['RSI']):
-            continue
-        if closed_price > row['BB_Mid']:
-            continue
-        if closed_price > 100000: # Adjust tolerance for high prices
-            tolerance_percentage = 0.01
-        if (closed_price % psychological_level) > closed_price * tolerance_percentage:
-            continue
-        if max_open_position >= 3:
-            # Close positions conditions
-            logger.info("There are 3 or more open positions.")
-            continue
-        # Take the row and start a new position
-        pass
\ No newline at end of file
+                   max_open_position: int,
+                   max_candles_open: int = 48,
+                   use_numba: bool | None = None) -> tuple[float, list[dict]]:
+    """
+    Simula la estrategia de niveles psicologicos con hasta max_open_position posiciones a la vez,
+    usando el motor de cartera con un unico simbolo. Devuelve (capital final, trade_log) como la divergencia alcista.
+    """
+    logger.info(f"Iniciando simulacion con Capital: ${initial_capital:,.2f}")
+    df = find_level_entries(df, psychological_level, tolerance_percentage)
+    arrays = build_portfolio_arrays({'asset': build_level_frame(df, psychological_level)})
+    final_capital, events, _ = simulate_portfolio(
+        arrays,
+        initial_capital,
+        fee_rate,
+        risk_per_trade_pct,
+        max_candles_open,
+        max_open_positions=max_open_position,
+        max_positions_per_symbol=max_open_position,
+        use_numba=use_numba,
+    )
+    trade_log = [{key: value for key, value in trade.items() if key != 'symbol'} for trade in portfolio_trade_log(events, arrays['symbols'])]
+    logger.info(f"Seniales en niveles: {int(df['level_entry_signal'].sum())} | Operaciones cerradas: {len(trade_log)}")
+    return final_capital, trade_log
@@ -1,6 +1,9 @@
 import pandas as pd
 
-def calculate_rsi(df: pd.DataFrame, period: int = 14) -> None:
+# Versiones puras: devuelven las columnas calculadas sin tocar el DataFrame de entrada.
+# Las funciones calculate_* las escriben en el DataFrame como hasta ahora.
+
+def rsi_columns(df: pd.DataFrame, period: int = 14) -> dict[str, pd.Series]:
     delta = df['Close'].diff(1)
     gain = delta.clip(lower=0)
     loss = -delta.clip(upper=0)
@@ -8,18 +11,35 @@ def calculate_rsi(df: pd.DataFrame, period: int = 14) -> None:
     avg_gain = gain.ewm(com=period - 1, min_periods=period, adjust=False).mean()
     avg_loss = loss.ewm(com=period - 1, min_periods=period, adjust=False).mean()
     rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
+    return {'RSI': 100 - (100 / (1 + rs))}
 
-def calculate_bollinger_bands(df: pd.DataFrame, period: int = 20, std_dev: int = 2) -> None:
-    df['BB_Upper'] = df['BB_Mid'] + (df['Close'].rolling(window=period).std(ddof=0) * std_dev)
-    df['BB_Lower'] = df['BB_Mid'] - (df['Close'].rolling(window=period).std(ddof=0) * std_dev)
+def bollinger_columns(df: pd.DataFrame, period: int = 20, std_dev: int = 2) -> dict[str, pd.Series]:
+    bb_mid = df['Close'].rolling(window=period).mean()
+    rolling_std = df['Close'].rolling(window=period).std(ddof=0)
+    return {
+        'BB_Mid': bb_mid,
+        'BB_Upper': bb_mid + (rolling_std * std_dev),
+        'BB_Lower': bb_mid - (rolling_std * std_dev),
+    }
 
-def calculate_atr(df: pd.DataFrame, period: int = 14) -> None:
+def atr_columns(df: pd.DataFrame, period: int = 14) -> dict[str, pd.Series]:
     high_low = df['High'] - df['Low']
     high_close = (df['High'] - df['Close'].shift(1)).abs()
     low_close = (df['Low'] - df['Close'].shift(1)).abs()
     tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    df['ATR'] = tr.ewm(alpha=1/period, adjust=False).mean()
+    return {'ATR': tr.ewm(alpha=1/period, adjust=False).mean()}
+
+def calculate_rsi(df: pd.DataFrame, period: int = 14) -> None:
+    for column, values in rsi_columns(df, period).items():
+        df[column] = values
+
+def calculate_bollinger_bands(df: pd.DataFrame, period: int = 20, std_dev: int = 2) -> None:
+    for column, values in bollinger_columns(df, period, std_dev).items():
+        df[column] = values
+
+def calculate_atr(df: pd.DataFrame, period: int = 14) -> None:
+    for column, values in atr_columns(df, period).items():
+        df[column] = values
 
 def calculate_multiplier(default_timeframe: str, actual_timeframe: str, alpha: float) -> float:
     multiplier: float = 0
@@ -57,4 +77,24 @@ def calculate_multiplier(default_timeframe: str, actual_timeframe: str, alpha: f
     if multiplier <= 0:
         raise ValueError("Multiplier cannot be 0 or negative")
     
-    return alpha * multiplier
\ No newline at end of file
+    return alpha * multiplier
+
+# Parametros de la estrategia expresados en numero de velas: cambian de valor al cambiar de timeframe.
+CANDLE_COUNT_PARAMETERS = (
+    'pivot_lookback_window',
+    'confirmation_wait_candles',
+    'min_distance_between_pivots',
+    'volume_search_window',
+    'max_candles_open',
+)
+
+def scale_candle_parameters(params: dict, default_timeframe: str, actual_timeframe: str, alpha: float = 1.0) -> dict:
+    """
+    Traduce los parametros en velas (CANDLE_COUNT_PARAMETERS) de default_timeframe a actual_timeframe con
+    calculate_multiplier, redondeando a un entero de al menos 1. El resto de parametros no cambia.
+    """
+    if default_timeframe == actual_timeframe:
+        return dict(params)
+    multiplier = calculate_multiplier(default_timeframe, actual_timeframe, alpha)
+    return {name: max(1, int(round(value * multiplier))) if name in CANDLE_COUNT_PARAMETERS else value
+            for name, value in params.items()}
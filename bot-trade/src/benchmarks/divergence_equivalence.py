@@ -0,0 +1,104 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from src.backtesting.bullish_divergence.bullish_backtest_functions import (
+    calculate_indicators, find_divergence_signals, rsi_pivot_lows,
+)
+from src.backtesting.bullish_divergence.parameter_sweep import DEFAULT_PARAMETERS
+from src.utils import define_logging
+from .synthetic_data import generate_ohlcv
+
+logger = logging.getLogger(__name__)
+
+# Comprueba que find_divergence_signals (emparejado de pivotes en una pasada, _pair_divergence_pivots) marca
+# las mismas seniales, generadas por los mismos pivotes, que el bucle original pivote a pivote.
+
+# (pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)
+DEFAULT_WINDOWS = [
+    (DEFAULT_PARAMETERS['pivot_lookback_window'], DEFAULT_PARAMETERS['confirmation_wait_candles'],
+     DEFAULT_PARAMETERS['min_distance_between_pivots']),
+    (5, 1, 3),
+    (10, 3, 20),
+    (30, 5, 60),
+]
+
+
+def reference_divergence_signals(df: pd.DataFrame, pivot_lookback_window, confirmation_wait_candles,
+                                 min_distance_between_pivots) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bucle original de find_divergence_signals (get_loc/loc por pivote). Devuelve la mascara de seniales y la
+    posicion del pivote que genero cada senial (-1 si no hay senial), como 'generating_pivot_pos'.
+    """
+    df = df.copy()
+    df['rsi_pivot_low'] = rsi_pivot_lows(df['RSI'], pivot_lookback_window, confirmation_wait_candles)
+    df['bullish_divergence_signal'] = False
+    df['generating_pivot_idx'] = pd.NaT
+    potential_pivot_indices = df.index[df['rsi_pivot_low']]
+
+    if len(potential_pivot_indices) >= 2:
+        last_pivot_idx = potential_pivot_indices[0]
+        for i in range(1, len(potential_pivot_indices)):
+            current_pivot_idx = potential_pivot_indices[i]
+
+            distance = df.index.get_loc(current_pivot_idx) - df.index.get_loc(last_pivot_idx)
+            if distance < min_distance_between_pivots:
+                if df.loc[current_pivot_idx, 'RSI'] < df.loc[last_pivot_idx, 'RSI']:
+                    last_pivot_idx = current_pivot_idx
+                continue
+
+            price_makes_lower_low = df.loc[current_pivot_idx, 'Close'] < df.loc[last_pivot_idx, 'Close']
+            rsi_makes_higher_low = df.loc[current_pivot_idx, 'RSI'] > df.loc[last_pivot_idx, 'RSI']
+
+            if price_makes_lower_low and rsi_makes_higher_low:
+                pivot_pos = df.index.get_loc(current_pivot_idx)
+                signal_pos = pivot_pos + confirmation_wait_candles
+                if signal_pos < len(df.index):
+                    signal_idx = df.index[signal_pos]
+                    df.loc[signal_idx, 'bullish_divergence_signal'] = True
+                    df.loc[signal_idx, 'generating_pivot_idx'] = current_pivot_idx
+
+            last_pivot_idx = current_pivot_idx
+
+    signal = df['bullish_divergence_signal'].to_numpy(dtype=bool)
+    generating_pivot_pos = np.full(len(df), -1, dtype=np.int64)
+    generating_pivot_pos[signal] = df.index.get_indexer(df.loc[signal, 'generating_pivot_idx'])
+    return signal, generating_pivot_pos
+
+
+def check_divergence_signals(n_bars: int, seed: int, timeframe: str, windows: list[tuple[int, int, int]]) -> None:
+    """Compara seniales y pivotes generadores de las dos versiones sobre una serie sintetica, para cada ventana."""
+    df = generate_ohlcv(n_bars, seed=seed, timeframe=timeframe)
+    calculate_indicators(df, DEFAULT_PARAMETERS['rsi_period'], DEFAULT_PARAMETERS['bb_period'],
+                         DEFAULT_PARAMETERS['bb_std_dev'], DEFAULT_PARAMETERS['atr_period'])
+    for pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots in windows:
+        start = time.perf_counter()
+        expected_signal, expected_pivot_pos = reference_divergence_signals(
+            df, pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)
+        reference_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = find_divergence_signals(df.copy(), pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)
+        seconds = time.perf_counter() - start
+
+        label = f"{n_bars:,} velas, semilla {seed}, ventanas {(pivot_lookback_window, confirmation_wait_candles, min_distance_between_pivots)}"
+        assert np.array_equal(result['bullish_divergence_signal'].to_numpy(dtype=bool), expected_signal), \
+            f"Seniales distintas ({label})"
+        assert np.array_equal(result['generating_pivot_pos'].to_numpy(), expected_pivot_pos), \
+            f"Pivotes generadores distintos ({label})"
+        logger.info(f"{label}: {int(expected_signal.sum())} seniales iguales | "
+                    f"bucle {reference_seconds * 1000:.1f} ms, find_divergence_signals {seconds * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Equivalencia del emparejado de pivotes con el bucle original.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 50_000])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--timeframe", default="1m")
+    args = parser.parse_args()
+
+    define_logging("divergence_equivalence_log.txt")
+    for n_bars in args.sizes:
+        for seed in args.seeds:
+            check_divergence_signals(n_bars, seed, args.timeframe, DEFAULT_WINDOWS)
@@ -0,0 +1,209 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+import numpy as np
+import pandas as pd
+from src.backtesting.jit import NUMBA_AVAILABLE
+from src.backtesting.bullish_divergence.bullish_backtest_functions import (
+    calculate_indicators, find_divergence_signals, precalculate_entry_filters, run_simulation,
+)
+from src.backtesting.bullish_divergence.parameter_sweep import DEFAULT_PARAMETERS
+from src.get_training_data.ohlcv_store import OHLCVStore, DATAFRAME_COLUMNS, PRICE_COLUMNS, load_ohlcv
+from src.utils import define_logging
+from .synthetic_data import generate_ohlcv
+
+logger = logging.getLogger(__name__)
+
+# Benchmarks de cada etapa del pipeline de la divergencia alcista sobre velas sinteticas.
+# Cada etapa se cronometra por separado (mejor de N repeticiones, con la entrada preparada fuera del cronometro)
+# y se mide su pico de memoria en una pasada aparte con tracemalloc. Los resultados van a un JSON por commit.
+# tracemalloc solo ve lo que pasa por el asignador de Python (incluidos los arrays de numpy): las reservas
+# de las funciones numba y de otras librerias nativas no cuentan en el pico.
+
+PEAK_MEMORY_NOTE = "tracemalloc: no incluye memoria reservada por numba ni por otras librerias nativas"
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+DEFAULT_RESULTS_DIR = "benchmark_results"
+BENCHMARK_SYMBOL = "BENCH/USDT"
+SETTINGS = {'initial_capital': 10000.0, 'fee_rate': 0.001, 'risk_per_trade_pct': 0.01, 'rr_min_ratio': 1.5}
+
+
+def measure(function: Callable, setup: Callable, repeat: int) -> dict:
+    """
+    Tiempo (mejor de repeat) y pico de memoria de function(setup()). La memoria se mide en una ejecucion
+    extra bajo tracemalloc porque el trazado ralentiza la funcion y falsearia el tiempo.
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        gc.collect()
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+        del argument
+
+    argument = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'seconds_all': timings, 'peak_memory_mb': peak_bytes / 1024**2}
+
+
+def _indicators_stage(df: pd.DataFrame) -> pd.DataFrame:
+    calculate_indicators(df, DEFAULT_PARAMETERS['rsi_period'], DEFAULT_PARAMETERS['bb_period'],
+                         DEFAULT_PARAMETERS['bb_std_dev'], DEFAULT_PARAMETERS['atr_period'])
+    return df
+
+
+def _signals_stage(df: pd.DataFrame) -> pd.DataFrame:
+    return find_divergence_signals(df, DEFAULT_PARAMETERS['pivot_lookback_window'], DEFAULT_PARAMETERS['confirmation_wait_candles'],
+                                   DEFAULT_PARAMETERS['min_distance_between_pivots'])
+
+
+def _filters_stage(df: pd.DataFrame) -> pd.DataFrame:
+    return precalculate_entry_filters(df, DEFAULT_PARAMETERS['volume_search_window'], SETTINGS['fee_rate'],
+                                      DEFAULT_PARAMETERS['volume_threshold_multiplier'])
+
+
+def _simulation_stage(df: pd.DataFrame) -> tuple:
+    return run_simulation(df, SETTINGS['initial_capital'], SETTINGS['fee_rate'], SETTINGS['risk_per_trade_pct'],
+                          SETTINGS['rr_min_ratio'], DEFAULT_PARAMETERS['max_candles_open'], quiet=True)
+
+
+def _run_pipeline(df: pd.DataFrame) -> pd.DataFrame:
+    df = _filters_stage(_signals_stage(_indicators_stage(df.copy())))
+    df.dropna(subset=['RSI', 'BB_Mid', 'ATR'], inplace=True)
+    _simulation_stage(df)
+    return df
+
+
+def _write_inputs(df: pd.DataFrame, work_dir: str, timeframe: str) -> tuple[str, OHLCVStore]:
+    """Guarda la serie como CSV (formato historico) y en el almacen columnar para medir ambas cargas."""
+    csv_path = os.path.join(work_dir, "ohlcv.csv")
+    df.to_csv(csv_path)
+    store = OHLCVStore(os.path.join(work_dir, "ohlcv_store"))
+    timestamps = df.index.to_numpy(dtype="datetime64[ms]").view(np.int64).astype(np.float64)
+    store.write(BENCHMARK_SYMBOL, timeframe, np.column_stack([timestamps] + [df[DATAFRAME_COLUMNS[column]].to_numpy() for column in PRICE_COLUMNS]))
+    return csv_path, store
+
+
+def benchmark_size(n_bars: int, seed: int, timeframe: str, repeat: int, work_dir: str) -> list[dict]:
+    """Resultados de todas las etapas para una serie de n_bars velas."""
+    df = generate_ohlcv(n_bars, seed=seed, timeframe=timeframe)
+    csv_path, store = _write_inputs(df, work_dir, timeframe)
+
+    with_indicators = _indicators_stage(df.copy())
+    with_signals = _signals_stage(with_indicators.copy())
+    with_filters = _filters_stage(with_signals.copy()).dropna(subset=['RSI', 'BB_Mid', 'ATR'])
+
+    stages = {
+        'csv_load': (lambda path: pd.read_csv(path, index_col="TimeStamp", parse_dates=True), lambda: csv_path),
+        'columnar_load': (lambda ohlcv_store: load_ohlcv(BENCHMARK_SYMBOL, timeframe, store=ohlcv_store), lambda: store),
+        'calculate_indicators': (_indicators_stage, df.copy),
+        'find_divergence_signals': (_signals_stage, with_indicators.copy),
+        'precalculate_entry_filters': (_filters_stage, with_signals.copy),
+        'run_simulation': (_simulation_stage, with_filters.copy),
+    }
+    results = []
+    for stage, (function, setup) in stages.items():
+        result = {'stage': stage, 'bars': n_bars, **measure(function, setup, repeat)}
+        logger.info(f"{stage:<28} {n_bars:>9,} velas: {result['seconds'] * 1000:10.1f} ms | pico {result['peak_memory_mb']:8.1f} MB")
+        results.append(result)
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: list[int], seed: int = 0, timeframe: str = "1m", repeat: int = 3) -> dict:
+    """Ejecuta todas las etapas para cada tamanio y devuelve el documento JSON de resultados."""
+    # Calentamiento: compila las funciones numba (y llena su cache) antes de cronometrar nada.
+    _run_pipeline(generate_ohlcv(10_000, seed=seed, timeframe=timeframe))
+
+    results = []
+    for n_bars in sizes:
+        with tempfile.TemporaryDirectory(prefix="bot_trade_bench_") as work_dir:
+            results.extend(benchmark_size(n_bars, seed, timeframe, repeat, work_dir))
+    return {
+        'metadata': {
+            'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'numba': NUMBA_AVAILABLE,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'timeframe': timeframe,
+            'repeat': repeat,
+            'peak_memory': PEAK_MEMORY_NOTE,
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.1) -> list[dict]:
+    """
+    Compara dos ficheros de resultados etapa a etapa (mismo tamanio). Devuelve las filas en las que el tiempo
+    o el pico de memoria empeoran mas de tolerance (0.1 = 10%).
+    """
+    baseline_rows = {(row['stage'], row['bars']): row for row in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        previous = baseline_rows.get((row['stage'], row['bars']))
+        if previous is None:
+            continue
+        for metric in ('seconds', 'peak_memory_mb'):
+            if previous[metric] > 0 and row[metric] > previous[metric] * (1 + tolerance):
+                regressions.append({'stage': row['stage'], 'bars': row['bars'], 'metric': metric,
+                                    'baseline': previous[metric], 'current': row[metric], 'ratio': row[metric] / previous[metric]})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de backtesting sobre velas sinteticas.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--timeframe", default="1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help=f"Fichero JSON de salida (por defecto {DEFAULT_RESULTS_DIR}/<commit>.json).")
+    parser.add_argument("--compare", default=None, help="JSON de un run anterior contra el que buscar regresiones.")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    define_logging("benchmarks_log.txt")
+    logger.info(f"Pico de memoria por etapa con {PEAK_MEMORY_NOTE}.")
+    report = run_benchmarks(args.sizes, args.seed, args.timeframe, args.repeat)
+
+    output_path = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{report['metadata']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    logger.info(f"Resultados guardados en '{output_path}'.")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare_results(json.load(baseline_file), report, args.tolerance)
+        for regression in regressions:
+            logger.warning(f"REGRESION {regression['stage']} ({regression['bars']:,} velas) en {regression['metric']}: "
+                           f"{regression['baseline']:.4g} -> {regression['current']:.4g} (x{regression['ratio']:.2f})")
+        if not regressions:
+            logger.info(f"Sin regresiones respecto a '{args.compare}' (tolerancia {args.tolerance:.0%}).")
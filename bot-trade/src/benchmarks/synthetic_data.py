@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from src.get_training_data.ohlcv_store import timeframe_to_ms
+
+# Velas sinteticas reproducibles para los benchmarks: precio por movimiento browniano geometrico (GBM)
+# con regimenes de volatilidad y volumen (tranquilo / agitado) que cambian como una cadena de Markov.
+
+MS_PER_YEAR = 365 * 24 * 3600 * 1000
+
+
+def _regimes(rng: np.random.Generator, n_bars: int, mean_regime_bars: float) -> np.ndarray:
+    """Regimen de cada vela: tramos de longitud geometrica (media mean_regime_bars) alternando calma y agitacion."""
+    lengths = rng.geometric(1 / mean_regime_bars, size=n_bars // max(int(mean_regime_bars), 1) + 2)
+    while lengths.sum() < n_bars:
+        lengths = np.concatenate([lengths, rng.geometric(1 / mean_regime_bars, size=len(lengths))])
+    first = rng.integers(2)
+    regime_ids = (np.arange(len(lengths)) + first) % 2
+    return np.repeat(regime_ids, lengths)[:n_bars].astype(np.int8)
+
+
+def generate_ohlcv(
+        n_bars: int,
+        seed: int = 0,
+        timeframe: str = "1m",
+        start: str = "2015-01-01",
+        initial_price: float = 30000.0,
+        annual_drift: float = 0.1,
+        annual_volatility: tuple[float, float] = (0.4, 1.2),
+        volume_mean: tuple[float, float] = (20.0, 80.0),
+        mean_regime_bars: float = 2000.0) -> pd.DataFrame:
+    """
+    DataFrame con el formato de los backtests (Open..Volume, indice TimeStamp). La misma semilla da
+    siempre la misma serie. annual_volatility y volume_mean van por regimen (calma, agitacion).
+    """
+    timeframe_ms = timeframe_to_ms(timeframe)
+    rng = np.random.default_rng(seed)
+    dt = timeframe_ms / MS_PER_YEAR
+    regime = _regimes(rng, n_bars, mean_regime_bars)
+
+    sigma = np.asarray(annual_volatility, dtype=np.float64)[regime]
+    log_returns = (annual_drift - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n_bars)
+    close = initial_price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(n_bars)
+    open_[0] = initial_price
+    open_[1:] = close[:-1]
+
+    # Mechas proporcionales a la volatilidad de la vela.
+    wick_scale = sigma * np.sqrt(dt)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, 0.5, n_bars)) * wick_scale)
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.5, n_bars)) * wick_scale)
+
+    # Volumen lognormal, mayor en regimen agitado y en velas con movimientos grandes.
+    base_volume = np.asarray(volume_mean, dtype=np.float64)[regime]
+    move = np.abs(log_returns) / wick_scale
+    volume = base_volume * rng.lognormal(-0.32, 0.8, n_bars) * (1 + move)
+
+    index = pd.date_range(start, periods=n_bars, freq=pd.Timedelta(milliseconds=timeframe_ms), name="TimeStamp")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
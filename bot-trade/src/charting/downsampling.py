@@ -0,0 +1,64 @@
+import numpy as np
+from src.get_training_data.ohlcv_store import TIMESTAMP_COLUMN, timeframe_to_ms
+from src.get_training_data.resampling import resample_columns
+
+# Reduccion de series largas a un numero de puntos manejable para los graficos: las velas se agregan
+# en velas mas grandes (OHLC por intervalos de tiempo) y las lineas (indicadores, curva de capital) se
+# reducen con LTTB, que conserva la forma visual (picos y valles) eligiendo puntos reales de la serie.
+
+
+def downsample_ohlcv(columns: dict[str, np.ndarray], timeframe: str, max_points: int) -> dict[str, np.ndarray]:
+    """
+    Velas agregadas a un multiplo del timeframe para que haya como mucho max_points.
+    Si ya hay pocas velas se devuelven sin cambios.
+    """
+    timestamps = np.asarray(columns[TIMESTAMP_COLUMN], dtype=np.int64)
+    if len(timestamps) <= max_points:
+        return columns
+    timeframe_ms = timeframe_to_ms(timeframe)
+    span = int(timestamps[-1] - timestamps[0]) + timeframe_ms
+    # Los intervalos se alinean a multiplos de su duracion desde epoch, asi que el primero puede quedar
+    # partido: se reparte el rango en max_points - 1 para que sobre sitio para ese intervalo extra.
+    factor = -(-span // (timeframe_ms * max(1, max_points - 1)))
+    return resample_columns(columns, factor * timeframe_ms)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: posiciones de los n_out puntos elegidos (siempre el primero y el ultimo).
+    En cada intervalo se elige el punto que forma el triangulo de mayor area con el punto elegido en el
+    intervalo anterior y con la media del siguiente. x debe ser creciente y sin NaN.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Intervalos del interior [edges[k], edges[k + 1]); el primer y el ultimo punto van aparte.
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    # Medias de cada intervalo de golpe; la "media" que sigue al ultimo intervalo es el ultimo punto.
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        area = np.abs((x[a] - mean_x[k + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[k + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
+
+
+def downsample_line(x: np.ndarray, y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """LTTB sobre los puntos validos de la serie (los NaN de calentamiento de un indicador se descartan)."""
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    positions = lttb_indices(x.astype(np.float64), y, max_points)
+    return x[positions], y[positions]
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+from src.utils import define_logging
+from .fake_exchange import AsyncFakeExchange
+from .get_training_data_functions import pending_range, find_gaps
+from .ohlcv_store import OHLCVStore, TIMESTAMP_COLUMN, timeframe_to_ms, to_milliseconds
+
+logger = logging.getLogger(__name__)
+
+# Descarga por lotes: muchas series (simbolo x timeframe) en paralelo sobre una unica conexion asincrona.
+# Las paginas de una misma serie son secuenciales (cada una empieza donde acaba la anterior);
+# la concurrencia esta entre series, limitada por un semaforo y por un token bucket compartido.
+
+
+class TokenBucket:
+    """Limitador de peticiones compartido: rate peticiones/segundo con rafagas de hasta capacity."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Con el lock los que esperan salen en orden y no se despiertan todos a la vez.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def fetch_page(
+        exchange,
+        bucket: TokenBucket,
+        symbol: str,
+        timeframe: str,
+        since: int,
+        limit: int,
+        max_retries: int = 5,
+        base_delay: float = 1.0) -> list[list[float]]:
+    """fetch_ohlcv con reintentos ante ccxt.NetworkError y espera exponencial con jitter."""
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        try:
+            return await exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=since, limit=limit)
+        except ccxt.NetworkError as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning(f"{symbol} {timeframe}: error de red ({e}). Reintento {attempt + 1}/{max_retries} en {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return []
+
+
+async def download_series(
+        exchange,
+        store: OHLCVStore,
+        bucket: TokenBucket,
+        symbol: str,
+        timeframe: str,
+        start_ms: int,
+        limit: int,
+        max_retries: int = 5,
+        base_delay: float = 1.0) -> int:
+    """Version asincrona de sync_candles para una serie: cada pagina se escribe en el almacen en cuanto llega."""
+    since, until = pending_range(exchange, store, symbol, timeframe, start_ms)
+    timeframe_ms = timeframe_to_ms(timeframe)
+    first_since = since
+    n_saved = 0
+    while since < until:
+        ohlcv_array = await fetch_page(exchange, bucket, symbol, timeframe, since, limit, max_retries, base_delay)
+        ohlcv_array = [candle for candle in ohlcv_array if candle[0] < until]
+        if not ohlcv_array:
+            break
+        # La escritura es E/S bloqueante: en un hilo para no parar al resto de series.
+        await asyncio.to_thread(store.write, symbol, timeframe, ohlcv_array)
+        n_saved += len(ohlcv_array)
+        last_timestamp = int(ohlcv_array[-1][0])
+        if last_timestamp < since:
+            break
+        since = last_timestamp + 1
+
+    # Solo se revisa lo descargado (y la vela anterior, para ver si empalma), en un hilo como la escritura.
+    columns = await asyncio.to_thread(store.read, symbol, timeframe, first_since - timeframe_ms, until, [TIMESTAMP_COLUMN])
+    gaps = find_gaps(columns[TIMESTAMP_COLUMN], timeframe_ms)
+    if gaps:
+        logger.warning(f"{symbol} {timeframe}: {len(gaps)} huecos. Usa get_training_data --sync para repararlos.")
+    logger.info(f"{symbol} {timeframe}: {n_saved} velas guardadas.")
+    return n_saved
+
+
+async def download_batch(
+        exchange,
+        store: OHLCVStore,
+        symbols: list[str],
+        timeframes: list[str],
+        start_ms: int,
+        limit: int = 1000,
+        max_concurrency: int = 8,
+        requests_per_second: float | None = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0) -> dict[tuple[str, str], int | BaseException]:
+    """
+    Descarga todas las combinaciones simbolo x timeframe con como mucho max_concurrency series a la vez.
+    Por defecto el ritmo de peticiones es el rateLimit del exchange. Una serie que falla no detiene a las demas:
+    su excepcion se devuelve en el resultado y lo ya guardado se conserva para reanudar.
+    """
+    if requests_per_second is None:
+        requests_per_second = 1000 / exchange.rateLimit if exchange.rateLimit else float("inf")
+    bucket = TokenBucket(requests_per_second, capacity=max(1, max_concurrency))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(symbol: str, timeframe: str) -> int:
+        async with semaphore:
+            return await download_series(exchange, store, bucket, symbol, timeframe, start_ms, limit, max_retries, base_delay)
+
+    series = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
+    results = await asyncio.gather(*(run(symbol, timeframe) for symbol, timeframe in series), return_exceptions=True)
+    for (symbol, timeframe), result in zip(series, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{symbol} {timeframe}: descarga fallida ({result}). Relanza para continuar.")
+    return dict(zip(series, results))
+
+
+async def main(args: argparse.Namespace) -> int:
+    start_ms = to_milliseconds(args.start)
+    if args.fake:
+        exchange = AsyncFakeExchange(start_ms, to_milliseconds(args.fake_now), latency=args.fake_latency, failure_rate=args.fake_failure_rate) # type: ignore
+        requests_per_second = args.rate or float("inf")
+    else:
+        # El ritmo lo controla el token bucket compartido, no el limitador interno de ccxt.
+        exchange = ccxt_async.binance({'enableRateLimit': False})
+        requests_per_second = args.rate
+    store = OHLCVStore(args.store)
+
+    start = time.perf_counter()
+    try:
+        results = await download_batch(exchange, store, args.symbols, args.timeframes, start_ms, args.limit, # type: ignore
+                                       args.concurrency, requests_per_second, args.retries, args.retry_delay)
+    finally:
+        await exchange.close()
+    elapsed = time.perf_counter() - start
+
+    n_candles = sum(result for result in results.values() if isinstance(result, int))
+    n_failed = sum(isinstance(result, BaseException) for result in results.values())
+    logger.info(f"{len(results)} series, {n_candles} velas en {elapsed:.1f}s ({n_candles / max(elapsed, 1e-9):.0f} velas/s). Fallidas: {n_failed}")
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga concurrente de varias series OHLCV al almacen.")
+    parser.add_argument("--symbols", nargs="+", default=["BTC/USDT"])
+    parser.add_argument("--timeframes", nargs="+", default=["1h"])
+    parser.add_argument("--start", default="2021-01-01", help="Fecha desde la que descargar si no hay datos guardados.")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=None, help="Peticiones por segundo (por defecto, el rateLimit del exchange).")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--retry-delay", type=float, default=1.0)
+    parser.add_argument("--store", default=OHLCVStore().root)
+    parser.add_argument("--fake", action="store_true", help="Usa un exchange sintetico local (sin red).")
+    parser.add_argument("--fake-now", default="2022-01-01")
+    parser.add_argument("--fake-latency", type=float, default=0.05)
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    define_logging("batch_download_log.txt")
+    sys.exit(asyncio.run(main(args)))
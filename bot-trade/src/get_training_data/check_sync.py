@@ -0,0 +1,63 @@
+import argparse
+import logging
+import tempfile
+import numpy as np
+from src.utils import define_logging
+from .fake_exchange import FakeExchange
+from .get_training_data_functions import find_gaps, sync_candles
+from .ohlcv_store import OHLCVStore, STORE_COLUMNS, timeframe_to_ms, to_milliseconds
+
+logger = logging.getLogger(__name__)
+
+# Comprueba sync_candles sin red contra FakeExchange: velas que faltan la primera vez (huecos), paginas
+# solapadas (duplicados), un start anterior a la primera vela del exchange y sincronizaciones sucesivas.
+
+
+def check_sync_candles(symbol: str, timeframe: str, start: str, listing: str, now: str, limit: int,
+                       overlap: int, n_missing: int, seed: int = 0) -> None:
+    timeframe_ms = timeframe_to_ms(timeframe)
+    listing_ms, now_ms = to_milliseconds(listing), to_milliseconds(now)
+    n_candles = (now_ms - listing_ms) // timeframe_ms # type: ignore
+    rng = np.random.default_rng(seed)
+    # Tramos de 3 velas que el exchange no devuelve la primera vez que se piden.
+    missing_starts = listing_ms + rng.choice(n_candles - 3, size=n_missing, replace=False) * timeframe_ms # type: ignore
+    missing = {int(first) + k * timeframe_ms for first in missing_starts for k in range(3)}
+    exchange = FakeExchange(listing_ms, now_ms, seed=seed, missing_once=missing, overlap=overlap, max_limit=limit) # type: ignore
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = OHLCVStore(work_dir)
+        start_ms = to_milliseconds(start)
+        for sync in range(3):
+            sync_candles(exchange, store, symbol, timeframe, start_ms, limit) # type: ignore
+            stored = store.read(symbol, timeframe)
+            expected = exchange._candles(symbol, timeframe)
+            # La vela en curso del exchange no esta cerrada y no se guarda.
+            expected = expected[expected[:, 0] < (exchange.milliseconds() // timeframe_ms) * timeframe_ms]
+            assert not find_gaps(stored["timestamp"], timeframe_ms), f"Quedan huecos tras la sincronizacion {sync}"
+            assert np.all(np.diff(stored["timestamp"]) > 0), f"Velas duplicadas o desordenadas tras la sincronizacion {sync}"
+            assert np.array_equal(np.column_stack([stored[column] for column in STORE_COLUMNS]), expected), \
+                f"Las velas guardadas no son las del exchange tras la sincronizacion {sync}"
+            assert store.first_available(symbol, timeframe) == listing_ms, "No consta que el exchange empieza despues de start"
+            logger.info(f"Sincronizacion {sync}: {len(stored['timestamp'])} velas sin huecos ni duplicados "
+                        f"({exchange.calls} peticiones en total).")
+
+            # Siguiente vuelta: velas nuevas, una de ellas perdida la primera vez. El tramo inicial ya no se pide.
+            exchange.advance(50 * timeframe_ms)
+            exchange.missing_once.add(int(stored["timestamp"][-1]) + 10 * timeframe_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprueba la sincronizacion incremental contra un exchange sintetico.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--start", default="2021-01-01", help="Fecha pedida, anterior a la primera vela del exchange.")
+    parser.add_argument("--listing", default="2021-03-01", help="Primera vela del exchange sintetico.")
+    parser.add_argument("--now", default="2021-09-01")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=5)
+    parser.add_argument("--missing", type=int, default=20, help="Tramos de velas que faltan la primera vez.")
+    args = parser.parse_args()
+
+    define_logging("check_sync_log.txt")
+    check_sync_candles(args.symbol, args.timeframe, args.start, args.listing, args.now, args.limit,
+                       args.overlap, args.missing)
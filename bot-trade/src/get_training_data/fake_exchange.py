@@ -0,0 +1,95 @@
+import asyncio
+import zlib
+import ccxt
+import numpy as np
+from src.benchmarks.synthetic_data import generate_ohlcv
+
+# Sustituto local de ccxt.Exchange para probar descargas sin red.
+# Genera velas sinteticas deterministas (misma semilla -> mismas velas en cada llamada) con generate_ohlcv.
+
+SERIES_BLOCK_CANDLES = 100_000  # Velas generadas de una vez (cada bloque con su semilla)
+
+
+class FakeExchange:
+    """
+    Implementa el subconjunto de ccxt.Exchange que usan las descargas: fetch_ohlcv, milliseconds y parse_timeframe.
+    - start_ms / now_ms: primera vela disponible y "hora actual". Como un exchange real, tambien sirve la vela en curso.
+    - missing_once: timestamps que se omiten la primera vez que se piden (simula huecos que luego se reparan).
+    - overlap: velas repetidas al principio de cada pagina (simula respuestas solapadas con duplicados).
+    - failure_rate: probabilidad de lanzar ccxt.NetworkError en cada peticion.
+    """
+    id = "fake"
+    rateLimit = 0
+
+    def __init__(self, start_ms: int, now_ms: int, seed: int = 0, missing_once: set[int] | None = None,
+                 overlap: int = 0, failure_rate: float = 0.0, max_limit: int = 1000):
+        self.start_ms = start_ms
+        self.now_ms = now_ms
+        self.seed = seed
+        self.missing_once = set(missing_once or ())
+        self.overlap = overlap
+        self.failure_rate = failure_rate
+        self.max_limit = max_limit
+        self.calls = 0
+        self._rng = np.random.default_rng(seed)
+        self._series: dict[tuple[str, str], np.ndarray] = {}
+
+    @staticmethod
+    def parse_timeframe(timeframe: str) -> int:
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self) -> int:
+        return self.now_ms
+
+    def advance(self, milliseconds: int) -> None:
+        """Avanza el reloj: aparecen velas nuevas para las siguientes descargas."""
+        self.now_ms += milliseconds
+
+    def _candles(self, symbol: str, timeframe: str) -> np.ndarray:
+        """Serie completa [start_ms, now_ms) del simbolo: generate_ohlcv por bloques con semilla propia."""
+        timeframe_ms = self.parse_timeframe(timeframe) * 1000
+        n_candles = max(0, -(-(self.now_ms - self.start_ms) // timeframe_ms))
+        key = (symbol, timeframe)
+        series = self._series.get(key, np.empty((0, 6)))
+        # Cada bloque depende solo de su semilla y del cierre anterior: al avanzar el reloj las velas ya servidas no cambian.
+        while len(series) < n_candles:
+            block = len(series) // SERIES_BLOCK_CANDLES
+            initial_price = series[-1, 4] if len(series) else 100.0
+            df = generate_ohlcv(SERIES_BLOCK_CANDLES, seed=zlib.crc32(f"{self.seed}|{symbol}|{timeframe}|{block}".encode()),
+                                timeframe=timeframe, initial_price=initial_price)
+            timestamps = self.start_ms + (len(series) + np.arange(len(df), dtype=np.int64)) * timeframe_ms
+            ohlcv = df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy()
+            series = np.concatenate([series, np.column_stack([timestamps.astype(np.float64), ohlcv])])
+            self._series[key] = series
+        return series[:n_candles]
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = "1m", since: int | None = None, limit: int | None = None, params=None) -> list[list[float]]:
+        self.calls += 1
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise ccxt.NetworkError(f"{self.id} fallo de red simulado")
+        candles = self._candles(symbol, timeframe)
+        limit = min(limit or self.max_limit, self.max_limit)
+        first = 0 if since is None else int(np.searchsorted(candles[:, 0], since, side="left"))
+        first = max(0, first - self.overlap)
+        page = candles[first:first + limit]
+        if self.missing_once:
+            missing = np.isin(page[:, 0].astype(np.int64), list(self.missing_once))
+            self.missing_once -= set(page[missing, 0].astype(np.int64).tolist())
+            page = page[~missing]
+        return [[int(row[0])] + row[1:].tolist() for row in page]
+
+
+class AsyncFakeExchange(FakeExchange):
+    """Version asincrona (como ccxt.async_support) con una latencia fija por peticion para medir concurrencia."""
+
+    def __init__(self, *args, latency: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latency = latency
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = "1m", since: int | None = None, limit: int | None = None, params=None) -> list[list[float]]: # type: ignore
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+    async def close(self) -> None:
+        pass
@@ -1,7 +1,8 @@
+import argparse
 import sys
 import ccxt
-from .get_training_data_functions import get_candles_data, prepare_data
-from src.validators import assert_output_file_does_not_exist
+from .get_training_data_functions import get_candles_data, store_candles, sync_candles
+from .ohlcv_store import OHLCVStore, to_milliseconds
 import logging
 from src.utils import define_logging
 
@@ -15,16 +16,13 @@ def download_year_data() -> None:
     timeframe:str = "1h"
     limit:int = 1000
     start_year:int = 2021
-    file_name: str = f"binance_{symbol.replace('/', '')}_{timeframe}_{start_year}.csv"
+    store = OHLCVStore()
     try:
-        assert_output_file_does_not_exist(file_name)
+        if len(store.read(symbol, timeframe, f"{start_year}-01-01", f"{start_year + 1}-01-01")["timestamp"]) > 0:
+            logger.info(f"Ya hay velas de {symbol} {timeframe} para {start_year} en '{store.root}'. (ABORTANDO)")
+            sys.exit(0)
         ohlcv_array = get_candles_data(binance, symbol, timeframe, start_year, limit)
-        df_ohlcv = prepare_data(ohlcv_array)
-        df_ohlcv.to_csv(file_name, index=True)
-        logger.info(f"Escritura completada en el archivo: {file_name}")
-    except FileExistsError:
-        logger.info(f"El archivo '{file_name}' ya existe. (ABORTANDO)")
-        sys.exit(0)
+        store_candles(ohlcv_array, symbol, timeframe, store)
     except (ccxt.NetworkError, ccxt.ExchangeError):
         logger.critical("Error de red o del exchange al contactar con la API. (ABORTANDO)")
         sys.exit(1)
@@ -32,6 +30,30 @@ def download_year_data() -> None:
         logger.critical(f"Error inesperado (ABORTANDO): {e}", exc_info=True)
         sys.exit(1)
 
+def sync_training_data(symbol:str, timeframe:str, start:str, limit:int = 1000) -> None:
+    """Completa el almacen con las velas que falten desde la ultima guardada. Se puede interrumpir y relanzar."""
+    binance = ccxt.binance({
+        'enableRateLimit': True,
+    })
+    try:
+        sync_candles(binance, OHLCVStore(), symbol, timeframe, to_milliseconds(start), limit) # type: ignore
+    except (ccxt.NetworkError, ccxt.ExchangeError):
+        logger.critical("Error de red o del exchange al contactar con la API. Lo descargado queda guardado; relanza para continuar. (ABORTANDO)")
+        sys.exit(1)
+    except Exception as e:
+        logger.critical(f"Error inesperado (ABORTANDO): {e}", exc_info=True)
+        sys.exit(1)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga de velas de entrenamiento.")
+    parser.add_argument("--sync", action="store_true", help="Sincronizacion incremental en lugar de descargar un anio completo.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--start", default="2021-01-01", help="Fecha desde la que sincronizar si no hay datos guardados.")
+    args = parser.parse_args()
+
     define_logging("training_data_log.txt")
-    download_year_data()
\ No newline at end of file
+    if args.sync:
+        sync_training_data(args.symbol, args.timeframe, args.start)
+    else:
+        download_year_data()
\ No newline at end of file
@@ -1,8 +1,10 @@
 import ccxt
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 import os
 import logging
+from .ohlcv_store import OHLCVStore, TIMESTAMP_COLUMN, timeframe_to_ms
 
 logger = logging.getLogger(__name__)
 
@@ -50,3 +52,97 @@ def write_to_csv(df_ohlcv:pd.DataFrame, file_name:str) -> None:
         return
     df_ohlcv.to_csv(file_name, index=True)
 
+def store_candles(ohlcv_array:list[list[float]], symbol:str, timeframe:str, store:OHLCVStore) -> int:
+    n_rows = store.write(symbol, timeframe, ohlcv_array)
+    logger.info(f"{n_rows} velas de {symbol} {timeframe} guardadas en '{store.root}'.")
+    return n_rows
+
+# --- SINCRONIZACION INCREMENTAL ---
+
+def download_range(exchange:ccxt.Exchange, store:OHLCVStore, symbol:str, timeframe:str, since:int, until:int, limit:int) -> int:
+    """
+    Descarga las velas de [since, until) pagina a pagina y guarda cada pagina en el almacen en cuanto llega,
+    de modo que la memoria no crece con el rango y una interrupcion no pierde lo ya descargado.
+    """
+    n_saved = 0
+    while since < until:
+        ohlcv_array = exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=since, limit=limit)
+        ohlcv_array = [candle for candle in ohlcv_array if candle[0] < until]
+        if not ohlcv_array:
+            break
+        store.write(symbol, timeframe, ohlcv_array)
+        n_saved += len(ohlcv_array)
+        last_timestamp = int(ohlcv_array[-1][0])
+        if last_timestamp < since:
+            break
+        logger.info(f"{symbol} {timeframe}: guardadas velas hasta {datetime.fromtimestamp(last_timestamp/1000, tz=timezone.utc)}")
+        since = last_timestamp + 1
+    return n_saved
+
+def find_gaps(timestamps:np.ndarray, timeframe_ms:int) -> list[tuple[int, int]]:
+    """Huecos [inicio, fin) entre velas consecutivas separadas por mas de un timeframe."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    gap_positions = np.flatnonzero(np.diff(timestamps) > timeframe_ms)
+    return [(int(timestamps[i]) + timeframe_ms, int(timestamps[i + 1])) for i in gap_positions]
+
+def repair_series(exchange:ccxt.Exchange, store:OHLCVStore, symbol:str, timeframe:str, start_ms:int, since:int, until:int, limit:int) -> int:
+    """
+    Vuelve a pedir los huecos del tramo sincronizado [since, until) y, si la serie empieza despues de start_ms,
+    el tramo inicial. Solo se leen los timestamps de ese tramo, asi que la memoria no crece con la serie.
+    No hay duplicados que reparar: store.write ya ordena cada particion y se queda con una vela por timestamp.
+    """
+    timeframe_ms = timeframe_to_ms(timeframe)
+    first_timestamp = store.first_timestamp(symbol, timeframe)
+    if first_timestamp is None:
+        return 0
+
+    n_saved = 0
+    # El tramo inicial solo se pide mientras no conste que el exchange no tiene velas anteriores.
+    if first_timestamp > start_ms and first_timestamp != store.first_available(symbol, timeframe):
+        logger.info(f"{symbol} {timeframe}: pidiendo velas anteriores a {datetime.fromtimestamp(first_timestamp/1000, tz=timezone.utc)}")
+        n_saved += download_range(exchange, store, symbol, timeframe, start_ms, first_timestamp, limit)
+        # download_range pide desde start_ms: si la serie sigue empezando despues, el exchange no tiene nada antes.
+        first_timestamp = store.first_timestamp(symbol, timeframe) or first_timestamp
+        if first_timestamp > start_ms:
+            logger.info(f"{symbol} {timeframe}: el exchange no tiene velas antes de "
+                        f"{datetime.fromtimestamp(first_timestamp/1000, tz=timezone.utc)}; no se volveran a pedir.")
+            store.set_first_available(symbol, timeframe, first_timestamp)
+
+    # Se revisa tambien la vela anterior a since, para ver si lo descargado empalma con lo que ya habia.
+    check_from = since - timeframe_ms
+    timestamps = store.read(symbol, timeframe, check_from, until, [TIMESTAMP_COLUMN])[TIMESTAMP_COLUMN]
+    for gap_start, gap_end in find_gaps(timestamps, timeframe_ms):
+        logger.info(f"{symbol} {timeframe}: rellenando hueco de {(gap_end - gap_start) // timeframe_ms} velas desde "
+                    f"{datetime.fromtimestamp(gap_start/1000, tz=timezone.utc)}")
+        n_saved += download_range(exchange, store, symbol, timeframe, gap_start, gap_end, limit)
+
+    timestamps = store.read(symbol, timeframe, check_from, until, [TIMESTAMP_COLUMN])[TIMESTAMP_COLUMN]
+    remaining_gaps = find_gaps(timestamps, timeframe_ms)
+    if remaining_gaps:
+        # Puede ser legitimo: el exchange no tiene velas en esos tramos (p. ej. mantenimiento).
+        logger.warning(f"{symbol} {timeframe}: quedan {len(remaining_gaps)} huecos sin datos en el exchange.")
+    return n_saved
+
+def pending_range(exchange:ccxt.Exchange, store:OHLCVStore, symbol:str, timeframe:str, start_ms:int) -> tuple[int, int]:
+    """Rango [since, until) que falta por descargar: desde la ultima vela guardada hasta la ultima vela cerrada."""
+    timeframe_ms = timeframe_to_ms(timeframe)
+    # La vela en curso todavia no esta cerrada: solo descargamos hasta su apertura.
+    until = (exchange.milliseconds() // timeframe_ms) * timeframe_ms
+    last_timestamp = store.last_timestamp(symbol, timeframe)
+    since = start_ms if last_timestamp is None else last_timestamp + timeframe_ms
+    return since, until
+
+def sync_candles(exchange:ccxt.Exchange, store:OHLCVStore, symbol:str, timeframe:str, start_ms:int, limit:int = 1000, repair:bool = True) -> int:
+    """
+    Sincronizacion incremental: continua desde la ultima vela guardada (o desde start_ms si no hay datos)
+    hasta la ultima vela cerrada, y opcionalmente vuelve a pedir los huecos de ese tramo (y el tramo inicial
+    si la serie empieza despues de start_ms). Devuelve las velas guardadas.
+    """
+    since, until = pending_range(exchange, store, symbol, timeframe, start_ms)
+    logger.info(f"Sincronizando {symbol} {timeframe} desde {datetime.fromtimestamp(since/1000, tz=timezone.utc)}")
+
+    n_saved = download_range(exchange, store, symbol, timeframe, since, until, limit)
+    if repair:
+        n_saved += repair_series(exchange, store, symbol, timeframe, start_ms, since, until, limit)
+    logger.info(f"Sincronizacion de {symbol} {timeframe} completada: {n_saved} velas guardadas.")
+    return n_saved
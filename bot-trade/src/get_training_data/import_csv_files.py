@@ -0,0 +1,30 @@
+import glob
+import logging
+import os
+import re
+import sys
+from .ohlcv_store import OHLCVStore, DEFAULT_STORE_DIR, import_csv
+from src.utils import define_logging
+
+logger = logging.getLogger(__name__)
+
+# binance_BTCUSDT_1h_2021.csv -> simbolo BTCUSDT, timeframe 1h
+CSV_NAME_PATTERN = re.compile(r"^binance_(?P<symbol>[A-Z0-9]+)_(?P<timeframe>\d+[mhdw])_(?P<year>\d{4})\.csv$")
+
+def import_existing_csv_files(pattern: str = "binance_*_*_*.csv", store_dir: str = DEFAULT_STORE_DIR) -> None:
+    store = OHLCVStore(store_dir)
+    csv_files = sorted(glob.glob(pattern))
+    if not csv_files:
+        logger.info(f"No se encontraron archivos con el patron '{pattern}'.")
+        return
+    for csv_path in csv_files:
+        match = CSV_NAME_PATTERN.match(os.path.basename(csv_path))
+        if match is None:
+            logger.warning(f"Nombre de archivo no reconocido, se omite: {csv_path}")
+            continue
+        n_rows = import_csv(csv_path, match["symbol"], match["timeframe"], store)
+        logger.info(f"Importadas {n_rows} velas de '{csv_path}' a '{store_dir}'.")
+
+if __name__ == "__main__":
+    define_logging("import_csv_log.txt")
+    import_existing_csv_files(*sys.argv[1:2])
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+import shutil
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "ohlcv_store"
+FIRST_AVAILABLE_FILE = "first_available"  # Por serie: primer timestamp que tiene el exchange (no hay velas antes)
+
+# Columnas de cada particion: un .npy por columna para leerlas con mmap sin copiar.
+TIMESTAMP_COLUMN = "timestamp"  # ms desde epoch (UTC), como devuelve ccxt
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+STORE_COLUMNS = [TIMESTAMP_COLUMN] + PRICE_COLUMNS
+# Nombres de columna que usan los backtests.
+DATAFRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+# Segundos de cada unidad de timeframe, como ccxt.Exchange.parse_timeframe (sin depender de ccxt).
+TIMEFRAME_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "M": 30 * 86400, "y": 365 * 86400}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """Duracion en ms de un timeframe de ccxt ('1m', '4h', '1d'...)."""
+    unit = timeframe[-1]
+    if unit not in TIMEFRAME_UNIT_SECONDS:
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNIT_SECONDS[unit] * 1000
+
+
+def to_milliseconds(value: int | str | datetime | pd.Timestamp | None) -> int | None:
+    """Convierte una fecha (o ms ya calculados) a ms UTC. Las fechas sin zona se interpretan en UTC."""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value # type: ignore
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return int(timestamp.value // 1_000_000)
+
+
+def _month_key(timestamps_ms: np.ndarray) -> np.ndarray:
+    return timestamps_ms.astype("datetime64[ms]").astype("datetime64[M]")
+
+
+def _range_bounds(timestamps: np.ndarray, start_ms: int | None, end_ms: int | None) -> tuple[int, int]:
+    """Posiciones [lo, hi) de las velas de [start_ms, end_ms) dentro de timestamps ordenados."""
+    lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+    hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="left"))
+    return lo, hi
+
+
+class OHLCVStore:
+    """
+    Almacen columnar de velas OHLCV: <root>/<SIMBOLO>/<timeframe>/<YYYY-MM>/<columna>.npy.
+    Cada particion mensual esta ordenada por timestamp y sin duplicados.
+    Las lecturas solo abren las particiones del rango pedido, con mmap (sin copiar si el rango cae en una sola).
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _series_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, symbol.replace("/", ""), timeframe)
+
+    def partitions(self, symbol: str, timeframe: str) -> list[str]:
+        """Meses almacenados (YYYY-MM), en orden."""
+        series_dir = self._series_dir(symbol, timeframe)
+        if not os.path.isdir(series_dir):
+            return []
+        return sorted(name for name in os.listdir(series_dir) if len(name) == 7 and name[4] == "-")
+
+    def _read_partition(self, symbol: str, timeframe: str, month: str) -> dict[str, np.ndarray]:
+        partition_dir = os.path.join(self._series_dir(symbol, timeframe), month)
+        return {column: np.load(os.path.join(partition_dir, f"{column}.npy"), mmap_mode="r") for column in STORE_COLUMNS}
+
+    def _write_partition(self, symbol: str, timeframe: str, month: str, columns: dict[str, np.ndarray]) -> None:
+        """Escribe la particion en un directorio temporal y lo intercambia con el anterior."""
+        partition_dir = os.path.join(self._series_dir(symbol, timeframe), month)
+        tmp_dir = f"{partition_dir}.tmp"
+        old_dir = f"{partition_dir}.old"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in STORE_COLUMNS:
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), np.ascontiguousarray(columns[column]))
+        if os.path.exists(partition_dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+            os.replace(partition_dir, old_dir)
+        os.replace(tmp_dir, partition_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def write(self, symbol: str, timeframe: str, ohlcv: np.ndarray | list[list[float]]) -> int:
+        """
+        Inserta velas [timestamp_ms, open, high, low, close, volume] fusionandolas con lo ya almacenado.
+        Si un timestamp ya existe, gana la vela nueva. Devuelve el numero de velas recibidas.
+        """
+        rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, len(STORE_COLUMNS))
+        if len(rows) == 0:
+            return 0
+        timestamps = rows[:, 0].astype(np.int64)
+        months = _month_key(timestamps)
+        for month in np.unique(months):
+            in_month = months == month
+            new_columns = {TIMESTAMP_COLUMN: timestamps[in_month]}
+            for k, column in enumerate(PRICE_COLUMNS, start=1):
+                new_columns[column] = rows[in_month, k]
+
+            month_name = str(month)
+            if month_name in self.partitions(symbol, timeframe):
+                stored = self._read_partition(symbol, timeframe, month_name)
+                new_columns = {column: np.concatenate((stored[column], new_columns[column])) for column in STORE_COLUMNS}
+
+            # Orden estable por timestamp y nos quedamos con la ultima aparicion de cada uno.
+            order = np.argsort(new_columns[TIMESTAMP_COLUMN], kind="stable")
+            sorted_ts = new_columns[TIMESTAMP_COLUMN][order]
+            keep = np.ones(len(order), dtype=bool)
+            keep[:-1] = sorted_ts[1:] != sorted_ts[:-1]
+            self._write_partition(symbol, timeframe, month_name, {column: values[order][keep] for column, values in new_columns.items()})
+        return len(rows)
+
+    def _months_in_range(self, symbol: str, timeframe: str, start_ms: int | None, end_ms: int | None) -> list[str]:
+        months = self.partitions(symbol, timeframe)
+        if start_ms is not None:
+            first_month = str(np.datetime64(start_ms, "ms").astype("datetime64[M]"))
+            months = [month for month in months if month >= first_month]
+        if end_ms is not None:
+            last_month = str(np.datetime64(end_ms - 1, "ms").astype("datetime64[M]"))
+            months = [month for month in months if month <= last_month]
+        return months
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None, columns: list[str] | None = None) -> dict[str, np.ndarray]:
+        """
+        Columnas del rango [start, end) (todas, o solo las de columns). Solo se abren las particiones que
+        solapan el rango. Con una sola particion se devuelven vistas mmap de solo lectura; con varias, se concatenan.
+        """
+        start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+        columns = columns or STORE_COLUMNS
+        pieces = []
+        for month in self._months_in_range(symbol, timeframe, start_ms, end_ms):
+            partition = self._read_partition(symbol, timeframe, month)
+            lo, hi = _range_bounds(partition[TIMESTAMP_COLUMN], start_ms, end_ms)
+            if hi > lo:
+                pieces.append({column: partition[column][lo:hi] for column in columns})
+
+        if not pieces:
+            return {column: np.empty(0, dtype=np.int64 if column == TIMESTAMP_COLUMN else np.float64) for column in columns}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {column: np.concatenate([piece[column] for piece in pieces]) for column in columns}
+
+    def fingerprint(self, symbol: str, timeframe: str, start=None, end=None) -> str | None:
+        """
+        Huella de las velas de [start, end) sin leerlas: rango pedido y, por cada particion que lo solapa,
+        su mes, inodo, tamanio y fecha de modificacion. Como cada escritura sustituye la particion entera,
+        cambia siempre que se anaden o corrigen velas del rango. None si el rango no tiene velas.
+        """
+        start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+        digest = hashlib.blake2b(f"{symbol}|{timeframe}|{start_ms}|{end_ms}".encode(), digest_size=16)
+        has_rows = False
+        for month in self._months_in_range(symbol, timeframe, start_ms, end_ms):
+            path = os.path.join(self._series_dir(symbol, timeframe), month, f"{TIMESTAMP_COLUMN}.npy")
+            stat = os.stat(path)
+            digest.update(f"|{month}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            if not has_rows:
+                # Con mmap solo se tocan las paginas que necesita la busqueda binaria.
+                lo, hi = _range_bounds(np.load(path, mmap_mode="r"), start_ms, end_ms)
+                has_rows = hi > lo
+        return digest.hexdigest() if has_rows else None
+
+    def first_timestamp(self, symbol: str, timeframe: str) -> int | None:
+        """Timestamp (ms) de la primera vela almacenada, o None si no hay datos."""
+        months = self.partitions(symbol, timeframe)
+        if not months:
+            return None
+        timestamps = self._read_partition(symbol, timeframe, months[0])[TIMESTAMP_COLUMN]
+        return int(timestamps[0]) if len(timestamps) else None
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> int | None:
+        """Timestamp (ms) de la ultima vela almacenada, o None si no hay datos."""
+        months = self.partitions(symbol, timeframe)
+        if not months:
+            return None
+        timestamps = self._read_partition(symbol, timeframe, months[-1])[TIMESTAMP_COLUMN]
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def first_available(self, symbol: str, timeframe: str) -> int | None:
+        """Timestamp (ms) antes del cual el exchange no tiene velas de la serie, si ya se comprobo."""
+        path = os.path.join(self._series_dir(symbol, timeframe), FIRST_AVAILABLE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as first_available_file:
+            return int(first_available_file.read())
+
+    def set_first_available(self, symbol: str, timeframe: str, timestamp_ms: int) -> None:
+        os.makedirs(self._series_dir(symbol, timeframe), exist_ok=True)
+        with open(os.path.join(self._series_dir(symbol, timeframe), FIRST_AVAILABLE_FILE), "w") as first_available_file:
+            first_available_file.write(str(int(timestamp_ms)))
+
+
+def columns_to_dataframe(columns: dict[str, np.ndarray]) -> pd.DataFrame:
+    """DataFrame con el formato de los backtests (Open..Volume, indice TimeStamp) sin copiar las columnas."""
+    index = pd.DatetimeIndex(np.asarray(columns[TIMESTAMP_COLUMN]).view("datetime64[ms]"), name="TimeStamp")
+    return pd.DataFrame({DATAFRAME_COLUMNS[column]: columns[column] for column in PRICE_COLUMNS}, index=index, copy=False)
+
+
+def load_ohlcv(symbol: str, timeframe: str, start=None, end=None, store: OHLCVStore | None = None) -> pd.DataFrame:
+    """Punto de entrada de los backtests: velas de [start, end) como DataFrame."""
+    store = store or OHLCVStore()
+    df = columns_to_dataframe(store.read(symbol, timeframe, start, end))
+    if df.empty:
+        raise FileNotFoundError(f"No hay velas de {symbol} {timeframe} en '{store.root}' para el rango [{start}, {end}).")
+    return df
+
+
+def import_csv(csv_path: str, symbol: str, timeframe: str, store: OHLCVStore | None = None) -> int:
+    """Importa un CSV historico (TimeStamp, Open, High, Low, Close, Volume) al almacen."""
+    store = store or OHLCVStore()
+    df = pd.read_csv(csv_path, index_col="TimeStamp", parse_dates=True)
+    timestamps = df.index.to_numpy(dtype="datetime64[ms]").view(np.int64)
+    rows = np.column_stack([timestamps.astype(np.float64)] + [df[DATAFRAME_COLUMNS[column]].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS])
+    return store.write(symbol, timeframe, rows)
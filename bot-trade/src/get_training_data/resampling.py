@@ -0,0 +1,137 @@
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from src.utils import define_logging
+from .ohlcv_store import OHLCVStore, STORE_COLUMNS, TIMESTAMP_COLUMN, load_ohlcv, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+# Timeframes superiores derivados de las velas base (1m) del almacen en lugar de descargarse cada uno.
+# Las velas agregadas se guardan en el mismo almacen como una serie propia ("1h_from_1m") y se
+# actualizan de forma incremental: solo se agregan las velas base posteriores a la ultima vela derivada.
+# Si el timeframe ya esta descargado (o no hay velas base) se usa la serie guardada tal cual.
+
+BASE_TIMEFRAME = "1m"
+RESAMPLED_TIMEFRAMES = ["5m", "15m", "1h", "4h", "1d"]
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def resampled_timeframe(timeframe: str, base_timeframe: str = BASE_TIMEFRAME) -> str:
+    """Nombre de la serie derivada dentro del almacen."""
+    return f"{timeframe}_from_{base_timeframe}"
+
+
+def _check_timeframes(timeframe: str, base_timeframe: str) -> tuple[int, int]:
+    timeframe_ms, base_ms = timeframe_to_ms(timeframe), timeframe_to_ms(base_timeframe)
+    if timeframe_ms <= base_ms or timeframe_ms % base_ms:
+        raise ValueError(f"No se puede derivar {timeframe} de velas de {base_timeframe}.")
+    # Con divisores del dia ninguna vela agregada cruza un cambio de mes (las particiones del almacen).
+    if DAY_MS % timeframe_ms:
+        raise ValueError(f"Solo se soportan timeframes que dividen el dia (hasta 1d): {timeframe}")
+    return timeframe_ms, base_ms
+
+
+def resample_columns(columns: dict[str, np.ndarray], timeframe_ms: int, complete_until: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Agrega velas ordenadas a timeframe_ms (alineado a UTC, como los exchanges): open de la primera, high maximo,
+    low minimo, close de la ultima y volumen sumado. Con complete_until (ms) solo se devuelven las velas cuyo
+    intervalo termina antes de ese instante, es decir, las que ya no pueden cambiar.
+    """
+    timestamps = np.asarray(columns[TIMESTAMP_COLUMN], dtype=np.int64)
+    if len(timestamps) == 0:
+        return {column: np.empty(0, dtype=np.int64 if column == TIMESTAMP_COLUMN else np.float64) for column in STORE_COLUMNS}
+    buckets = timestamps - timestamps % timeframe_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    resampled = {
+        TIMESTAMP_COLUMN: buckets[starts],
+        "open": np.asarray(columns["open"])[starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": np.asarray(columns["close"])[ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+    if complete_until is not None:
+        complete = resampled[TIMESTAMP_COLUMN] + timeframe_ms <= complete_until
+        resampled = {column: values[complete] for column, values in resampled.items()}
+    return resampled
+
+
+def update_resampled(store: OHLCVStore, symbol: str, timeframe: str, base_timeframe: str = BASE_TIMEFRAME,
+                     rebuild: bool = False) -> int:
+    """
+    Deriva (o pone al dia) la serie timeframe a partir de las velas base almacenadas, mes a mes para no cargar
+    todo el historico en memoria. rebuild=True vuelve a agregar desde el principio (p. ej. tras reparar huecos
+    de la serie base). Devuelve el numero de velas agregadas escritas.
+    """
+    timeframe_ms, base_ms = _check_timeframes(timeframe, base_timeframe)
+    target = resampled_timeframe(timeframe, base_timeframe)
+    base_last = store.last_timestamp(symbol, base_timeframe)
+    if base_last is None:
+        raise FileNotFoundError(f"No hay velas base de {symbol} {base_timeframe} en '{store.root}'.")
+    complete_until = base_last + base_ms
+
+    cached_last = None if rebuild else store.last_timestamp(symbol, target)
+    start_ms = cached_last + timeframe_ms if cached_last is not None else None
+    if start_ms is not None and start_ms + timeframe_ms > complete_until:
+        return 0
+
+    months = store.partitions(symbol, base_timeframe)
+    if start_ms is not None:
+        first_month = str(np.datetime64(start_ms, "ms").astype("datetime64[M]"))
+        months = [month for month in months if month >= first_month]
+
+    n_written = 0
+    for month in months:
+        month_start = np.datetime64(month, "M")
+        month_start_ms = int(month_start.astype("datetime64[ms]").astype(np.int64))
+        month_end_ms = int((month_start + 1).astype("datetime64[ms]").astype(np.int64))
+        columns = store.read(symbol, base_timeframe, max(month_start_ms, start_ms or month_start_ms), month_end_ms)
+        resampled = resample_columns(columns, timeframe_ms, complete_until)
+        if len(resampled[TIMESTAMP_COLUMN]):
+            rows = np.column_stack([resampled[TIMESTAMP_COLUMN].astype(np.float64)] + [resampled[column] for column in STORE_COLUMNS[1:]])
+            n_written += store.write(symbol, target, rows)
+    logger.info(f"{symbol} {timeframe}: {n_written} velas derivadas de {base_timeframe}.")
+    return n_written
+
+
+def source_timeframe(store: OHLCVStore, symbol: str, timeframe: str, base_timeframe: str = BASE_TIMEFRAME) -> str:
+    """
+    Serie del almacen de la que salen las velas de timeframe, sin escribir nada: la propia si esta guardada
+    o si no hay velas base; si no, las velas base (de las que se deriva con update_resampled).
+    """
+    if timeframe == base_timeframe or store.partitions(symbol, timeframe) or not store.partitions(symbol, base_timeframe):
+        return timeframe
+    return base_timeframe
+
+
+def candle_series(store: OHLCVStore, symbol: str, timeframe: str, base_timeframe: str = BASE_TIMEFRAME) -> str:
+    """Serie que hay que leer para timeframe: la guardada o la derivada de las velas base, puesta al dia."""
+    if source_timeframe(store, symbol, timeframe, base_timeframe) == timeframe:
+        return timeframe
+    update_resampled(store, symbol, timeframe, base_timeframe)
+    return resampled_timeframe(timeframe, base_timeframe)
+
+
+def load_resampled(symbol: str, timeframe: str, start=None, end=None, base_timeframe: str = BASE_TIMEFRAME,
+                   store: OHLCVStore | None = None) -> pd.DataFrame:
+    """
+    Como load_ohlcv, pero si timeframe no esta guardado lo deriva de las velas base (y lo pone al dia antes de leer).
+    """
+    store = store or OHLCVStore()
+    return load_ohlcv(symbol, candle_series(store, symbol, timeframe, base_timeframe), start, end, store)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deriva timeframes superiores de las velas base del almacen.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--base-timeframe", default=BASE_TIMEFRAME)
+    parser.add_argument("--timeframes", nargs="+", default=RESAMPLED_TIMEFRAMES)
+    parser.add_argument("--rebuild", action="store_true", help="Vuelve a agregar todo el historico.")
+    args = parser.parse_args()
+
+    define_logging("resampling_log.txt")
+    store = OHLCVStore()
+    for timeframe in args.timeframes:
+        update_resampled(store, args.symbol, timeframe, args.base_timeframe, args.rebuild)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Protocol
+import numpy as np
+from src.get_training_data.ohlcv_store import OHLCVStore, STORE_COLUMNS, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+# Fuentes de velas cerradas para el paper trading. Todas producen dicts con las columnas del almacen
+# (timestamp en ms, open, high, low, close, volume), una vela por vuelta del iterador asincrono.
+
+
+class CandleSource(Protocol):
+    def candles(self) -> AsyncIterator[dict]: ...
+
+
+def _row_to_candle(columns: dict[str, np.ndarray], i: int) -> dict:
+    return {column: (int(columns[column][i]) if column == "timestamp" else float(columns[column][i])) for column in STORE_COLUMNS}
+
+
+class ReplaySource:
+    """Reproduce velas del almacen en el mismo proceso. speed=0 las entrega sin esperas."""
+
+    def __init__(self, store: OHLCVStore, symbol: str, timeframe: str, start=None, end=None, speed: float = 0.0):
+        self.columns = store.read(symbol, timeframe, start, end)
+        self.delay = timeframe_to_ms(timeframe) / 1000 / speed if speed else 0.0
+
+    async def candles(self) -> AsyncIterator[dict]:
+        for i in range(len(self.columns["timestamp"])):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield _row_to_candle(self.columns, i)
+
+
+async def serve_replay(store: OHLCVStore, symbol: str, timeframe: str, start=None, end=None,
+                       speed: float = 0.0, host: str = "127.0.0.1", port: int = 8765) -> asyncio.Server:
+    """
+    Servidor TCP local que reproduce las velas almacenadas (una linea JSON por vela) a cada cliente que se conecta,
+    speed veces mas rapido que el tiempo real. Sirve para probar el paper trading como si fuera un feed en vivo.
+    """
+    columns = store.read(symbol, timeframe, start, end)
+    delay = timeframe_to_ms(timeframe) / 1000 / speed if speed else 0.0
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            for i in range(len(columns["timestamp"])):
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(json.dumps(_row_to_candle(columns, i)).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            logger.info("Cliente de replay desconectado.")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Replay de {symbol} {timeframe} ({len(columns['timestamp'])} velas) en {host}:{server.sockets[0].getsockname()[1]}")
+    return server
+
+
+class SocketSource:
+    """Cliente del servidor de replay (o de cualquier feed que emita una vela JSON por linea)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765):
+        self.host = host
+        self.port = port
+
+    async def candles(self) -> AsyncIterator[dict]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while line := await reader.readline():
+                yield json.loads(line)
+        finally:
+            writer.close()
+
+
+class ExchangePollingSource:
+    """
+    Velas cerradas de un exchange ccxt.async_support: espera al cierre de cada vela y pide las ultimas.
+    Solo entrega velas nuevas y cerradas, en orden.
+    """
+
+    def __init__(self, exchange, symbol: str, timeframe: str, close_delay: float = 2.0):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.close_delay = close_delay
+        self.last_timestamp = -1
+
+    async def candles(self) -> AsyncIterator[dict]:
+        while True:
+            now_ms = self.exchange.milliseconds()
+            next_close_ms = (now_ms // self.timeframe_ms + 1) * self.timeframe_ms
+            await asyncio.sleep((next_close_ms - now_ms) / 1000 + self.close_delay)
+            ohlcv_array = await self.exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=3)
+            closed_before = (self.exchange.milliseconds() // self.timeframe_ms) * self.timeframe_ms
+            for row in ohlcv_array:
+                if self.last_timestamp < row[0] < closed_before:
+                    self.last_timestamp = int(row[0])
+                    yield dict(zip(STORE_COLUMNS, [int(row[0])] + [float(value) for value in row[1:]]))
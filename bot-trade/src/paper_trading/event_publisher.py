@@ -0,0 +1,62 @@
+import asyncio
+import json
+import logging
+import urllib.request
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class EventPublisher:
+    """
+    Envia los eventos del paper trading al stream de cripto-back (POST /streams/{run_id}/events) en lotes.
+    publish no espera nunca: encola en memoria acotada y un task de fondo hace los POST en un hilo. Si el
+    servidor va lento o no responde se descartan los eventos mas antiguos; la decision por vela no se retrasa.
+    """
+
+    def __init__(self, url: str, max_pending: int = 10000, batch_size: int = 500, timeout: float = 5.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.dropped = 0
+        self._pending: deque[dict] = deque(maxlen=max_pending)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._send_loop())
+
+    def publish(self, message: dict) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(message)
+        self._wakeup.set()
+
+    async def aclose(self) -> None:
+        """Envia lo pendiente y termina el task de fondo."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+        if self.dropped:
+            logger.warning(f"Stream de eventos: {self.dropped} eventos descartados por cola llena.")
+
+    def _post(self, batch: list[dict]) -> None:
+        request = urllib.request.Request(self.url, data=json.dumps(batch).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    async def _send_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await asyncio.to_thread(self._post, batch)
+                except Exception as error:
+                    logger.warning(f"No se pudieron enviar {len(batch)} eventos a {self.url}: {error}")
+            if self._closing:
+                return
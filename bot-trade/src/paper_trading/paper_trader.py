@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import datetime, timezone
+import numpy as np
+from src.backtesting.jit import resolve_use_numba
+from src.backtesting.streaming_indicators import StreamingIndicators, StreamingVolumeConfirmation
+from src.backtesting.bullish_divergence.parameter_sweep import DEFAULT_PARAMETERS
+from src.backtesting.bullish_divergence.simulation_engine import (
+    new_state, step_bar_py, step_bar_jit, close_open_trade_py, ST_CAPITAL, ST_IN_TRADE, ST_POSITION_SIZE,
+    EV_KIND, EV_ENTRY_PRICE, EV_EXIT_PRICE, EV_CAPITAL, EV_POSITION_SIZE, EV_SL_PRICE, EV_TP_PRICE, EV_PNL,
+    EVENT_FIELDS, EXIT_REASONS, EVT_ENTRY, EVT_TP1, EVT_REJECT_CAPITAL, EVT_SIGNAL,
+)
+from src.backtesting.bullish_divergence.simulation_report import event_message
+from src.get_training_data.ohlcv_store import OHLCVStore
+from src.utils import define_logging
+from .candle_sources import CandleSource, SocketSource, serve_replay
+from .event_publisher import EventPublisher
+
+logger = logging.getLogger(__name__)
+
+# Cada vela como mucho genera senial + entrada o una salida.
+MAX_EVENTS_PER_BAR = 4
+
+
+class PaperTrader:
+    """
+    Estrategia de divergencia alcista en vivo sobre velas cerradas: indicadores, pivotes y filtro de volumen
+    incrementales (streaming_indicators) y las mismas reglas de entrada, tamanio y salida que run_simulation
+    (el mismo _step_bar del motor de simulacion, aplicado a una vela cada vez).
+    """
+
+    def __init__(self, initial_capital: float, fee_rate: float, risk_per_trade_pct: float,
+                 params: dict | None = None, use_numba: bool | None = None):
+        params = {**DEFAULT_PARAMETERS, **(params or {})}
+        self.params = params
+        self.fee_rate = fee_rate
+        self.risk_per_trade_pct = risk_per_trade_pct
+        self.indicators = StreamingIndicators(params['rsi_period'], params['bb_period'], params['bb_std_dev'],
+                                              params['atr_period'], params['pivot_lookback_window'],
+                                              params['confirmation_wait_candles'], params['min_distance_between_pivots'])
+        self.volume_filter = StreamingVolumeConfirmation(params['volume_search_window'], params['confirmation_wait_candles'],
+                                                         params['volume_threshold_multiplier'])
+        self.state = new_state(initial_capital)
+        self.bar = -1           # Velas con indicadores validos (las que ve run_simulation tras el dropna)
+        self.last_close = math.nan
+        self.last_timestamp = -1
+        self.trade_log: list[dict] = []
+        self._events = np.empty((MAX_EVENTS_PER_BAR, EVENT_FIELDS), dtype=np.float64)
+        self._step_bar = step_bar_jit if resolve_use_numba(use_numba) else step_bar_py
+        # Primera llamada en vacio: carga la version compilada antes de la primera vela real.
+        self._step_bar(new_state(0.0), 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, False, fee_rate, risk_per_trade_pct,
+                       params['max_candles_open'], self._events, 0)
+        # Latencia desde que llega la vela hasta que se toma la decision (sin contar logs).
+        self.latency_count = 0
+        self.latency_total_ns = 0
+        self.latency_max_ns = 0
+
+    def on_candle(self, candle: dict) -> np.ndarray:
+        """Procesa una vela cerrada y devuelve los eventos que genera (filas con columnas EV_*)."""
+        start_ns = time.perf_counter_ns()
+        if candle['timestamp'] <= self.last_timestamp:
+            return self._events[:0]  # Vela repetida o fuera de orden
+        self.last_timestamp = candle['timestamp']
+        high, low, close = float(candle['high']), float(candle['low']), float(candle['close'])
+        values = self.indicators.update(high, low, close)
+        volume_confirmed = self.volume_filter.update(float(candle['open']), close, float(candle['volume']),
+                                                     values['generating_pivot_bar'])
+        n_events = 0
+        if not (math.isnan(values['RSI']) or math.isnan(values['BB_Mid']) or math.isnan(values['ATR'])):
+            self.bar += 1
+            self.last_close = close
+            n_events = self._step_bar(self.state, self.bar, high, low, close, values['ATR'], values['BB_Mid'],
+                                      values['BB_Upper'], values['bullish_divergence_signal'] and volume_confirmed,
+                                      self.fee_rate, self.risk_per_trade_pct, self.params['max_candles_open'],
+                                      self._events, 0)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        self.latency_count += 1
+        self.latency_total_ns += elapsed_ns
+        self.latency_max_ns = max(self.latency_max_ns, elapsed_ns)
+
+        events = self._events[:n_events].copy()
+        self._record_trades(events)
+        return events
+
+    def close_open_trade(self) -> np.ndarray:
+        """Cierra la operacion abierta al ultimo precio (fin del replay), como el cierre forzado del backtest."""
+        n_events = close_open_trade_py(self.state, self.bar, self.last_close, self.fee_rate, self._events, 0)
+        return self._events[:n_events].copy()
+
+    def _record_trades(self, events: np.ndarray) -> None:
+        for event in events:
+            reason = EXIT_REASONS.get(int(event[EV_KIND]))
+            if reason is not None:
+                self.trade_log.append({'entry': float(event[EV_ENTRY_PRICE]), 'exit': float(event[EV_EXIT_PRICE]), 'reason': reason})
+
+    @property
+    def capital(self) -> float:
+        return float(self.state[ST_CAPITAL])
+
+    def equity(self) -> float:
+        """Capital libre mas la posicion abierta valorada al ultimo cierre."""
+        open_value = self.state[ST_POSITION_SIZE] * self.last_close if self.state[ST_IN_TRADE] else 0.0
+        return float(self.state[ST_CAPITAL] + open_value)
+
+    def latency_stats_us(self) -> dict:
+        mean = self.latency_total_ns / self.latency_count / 1000 if self.latency_count else 0.0
+        return {'candles': self.latency_count, 'mean_us': mean, 'max_us': self.latency_max_ns / 1000}
+
+    # --- Persistencia (para reanudar tras un reinicio sin recalcular el historico) ---
+
+    def snapshot(self) -> dict:
+        return {
+            'indicators': self.indicators.snapshot(),
+            'volume_filter': self.volume_filter.snapshot(),
+            'state': self.state.tolist(),
+            'bar': self.bar,
+            'last_close': self.last_close,
+            'last_timestamp': self.last_timestamp,
+            'trade_log': self.trade_log,
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        self.indicators = StreamingIndicators.restore(snapshot['indicators'])
+        self.volume_filter = StreamingVolumeConfirmation.restore(snapshot['volume_filter'])
+        self.state = np.array(snapshot['state'], dtype=np.float64)
+        self.bar = snapshot['bar']
+        self.last_close = snapshot['last_close']
+        self.last_timestamp = snapshot['last_timestamp']
+        self.trade_log = list(snapshot['trade_log'])
+
+    async def run(self, source: CandleSource, state_path: str | None = None,
+                  publisher: EventPublisher | None = None) -> None:
+        """
+        Bucle principal: una decision por vela cerrada. Los logs, el guardado del estado y la publicacion de
+        eventos (entradas, TP1, cierres y capital por vela) van despues.
+        """
+        async for candle in source.candles():
+            events = self.on_candle(candle)
+            if publisher is not None:
+                publish_paper_events(publisher, candle, events, self.equity())
+            if len(events):
+                log_paper_events(candle, events)
+                if state_path:
+                    with open(state_path, "w") as state_file:
+                        json.dump(self.snapshot(), state_file)
+
+
+def log_paper_events(candle: dict, events: np.ndarray) -> None:
+    current_date = datetime.fromtimestamp(candle['timestamp'] / 1000, tz=timezone.utc)
+    for event in events:
+        kind = int(event[EV_KIND])
+        if kind == EVT_ENTRY:
+            logger.info(f"NUEVA OPERACION en {current_date}: entrada ${event[EV_ENTRY_PRICE]:,.2f}, "
+                        f"tamanio {event[EV_POSITION_SIZE]:.6f}, SL ${event[EV_SL_PRICE]:,.2f}, TP1 ${event[EV_TP_PRICE]:,.2f}")
+        elif kind == EVT_REJECT_CAPITAL:
+            logger.warning(f"Senial en {current_date} ignorada: capital insuficiente.")
+        elif kind == EVT_TP1:
+            logger.info(f"ALCANZADO TP1 en {current_date} a ${event[EV_EXIT_PRICE]:,.2f}. P&L Parte 1: ${event[EV_PNL]:,.2f}. "
+                        f"SL a breakeven ${event[EV_SL_PRICE]:,.2f}, TP2 ${event[EV_TP_PRICE]:,.2f}")
+        elif kind in EXIT_REASONS:
+            logger.info(f"CIERRE por {EXIT_REASONS[kind]} en {current_date} a ${event[EV_EXIT_PRICE]:,.2f}. "
+                        f"Capital: ${event[EV_CAPITAL]:,.2f}")
+
+
+def publish_paper_events(publisher: EventPublisher, candle: dict, events: np.ndarray, equity: float) -> None:
+    for event in events:
+        if int(event[EV_KIND]) != EVT_SIGNAL:
+            publisher.publish(event_message(event, candle['timestamp']))
+    if math.isfinite(equity):
+        publisher.publish({'type': 'equity', 'timestamp': candle['timestamp'], 'equity': equity})
+
+
+async def run_replay(symbol: str, timeframe: str, start: str, end: str, speed: float, port: int,
+                     initial_capital: float, fee_rate: float, risk_per_trade_pct: float,
+                     publish_url: str | None = None) -> PaperTrader:
+    """
+    Levanta el servidor de replay local y conecta el paper trader a el como si fuera un feed en vivo.
+    Con publish_url los eventos se envian al stream de cripto-back (POST /api/v1/streams/{run_id}/events).
+    """
+    server = await serve_replay(OHLCVStore(), symbol, timeframe, start, end, speed, port=port)
+    trader = PaperTrader(initial_capital, fee_rate, risk_per_trade_pct)
+    publisher = EventPublisher(publish_url) if publish_url else None
+    if publisher is not None:
+        publisher.start()
+    async with server:
+        await trader.run(SocketSource(port=server.sockets[0].getsockname()[1]), publisher=publisher)
+    close_events = trader.close_open_trade()
+    if publisher is not None:
+        publish_paper_events(publisher, {'timestamp': trader.last_timestamp}, close_events, trader.equity())
+        await publisher.aclose()
+    return trader
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Paper trading de la divergencia alcista sobre un replay local de velas.")
+    parser.add_argument("--symbol", default="BTC/USDT")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--start", default="2021-01-01")
+    parser.add_argument("--end", default="2022-01-01")
+    parser.add_argument("--speed", type=float, default=3600.0, help="Velocidad del replay respecto al tiempo real (0 = sin esperas).")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--publish-url", default=None,
+                        help="URL de ingesta del stream de cripto-back, p. ej. http://localhost:8000/api/v1/streams/paper-btc/events")
+    args = parser.parse_args()
+
+    define_logging("paper_trading_log.txt")
+    trader = asyncio.run(run_replay(args.symbol, args.timeframe, args.start, args.end, args.speed, args.port,
+                                    initial_capital=10000.0, fee_rate=0.001, risk_per_trade_pct=0.01,
+                                    publish_url=args.publish_url))
+    logger.info(f"Capital final: ${trader.capital:,.2f} | Operaciones cerradas: {len(trader.trade_log)}")
+    logger.info(f"Latencia vela -> decision: {trader.latency_stats_us()}")
@@ -1,11 +1,33 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+
+def define_logging(log_file: str, use_queue: bool = True) -> None:
+    """
+    Log a fichero y a consola. Con use_queue=True los registros se encolan (QueueHandler) y un hilo aparte
+    (QueueListener) los formatea y escribe, asi el codigo que loguea no espera a la E/S de disco o terminal.
+    """
+    handlers = [
+        logging.FileHandler(log_file),
+        logging.StreamHandler()
+    ]
+    if use_queue:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # Al salir se vacia la cola antes de cerrar los handlers.
+        atexit.register(listener.stop)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # El formato final lo aplican los handlers del listener; aqui solo se resuelve el mensaje.
+        queue_handler.setFormatter(logging.Formatter("%(message)s"))
+        handlers = [queue_handler]
 
-def define_logging(log_file: str) -> None:
     logging.basicConfig(
         level = logging.INFO,
         format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ] 
-    )
\ No newline at end of file
+        handlers=handlers
+    )
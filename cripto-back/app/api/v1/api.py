@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from modules.backtests.router import router as backtests_router
+from modules.charts.router import router as charts_router
+from modules.streams.router import router as streams_router
+from modules.trades.router import router as trades_router
+
+api_router = APIRouter()
+api_router.include_router(backtests_router)
+api_router.include_router(charts_router)
+api_router.include_router(trades_router)
+api_router.include_router(streams_router)
@@ -1,12 +1,35 @@
-from pydantic import Field, PostgresDsn
+from typing import Annotated
+from pydantic import AnyUrl, Field, PostgresDsn, UrlConstraints
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# SQLite (con aiosqlite) para desarrollo y comprobaciones locales, sin servidor de PostgreSQL.
+SqliteDsn = Annotated[AnyUrl, UrlConstraints(allowed_schemes=["sqlite", "sqlite+aiosqlite"])]
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra='ignore'
     )
-    DATABASE_URL: PostgresDsn = Field(default=...)
+    DATABASE_URL: PostgresDsn | SqliteDsn = Field(default=...)
+    # Pool de conexiones del motor asincrono (por proceso de la API).
+    DB_POOL_SIZE: int = Field(default=5, ge=1)
+    DB_MAX_OVERFLOW: int = Field(default=10, ge=0)
+    DB_POOL_TIMEOUT: float = Field(default=30.0, gt=0)
+    DB_POOL_RECYCLE: int = Field(default=1800)
+    # Servicio de backtests: ruta de bot-trade (sus almacenes de velas e indicadores son relativos a ella),
+    # procesos del pool, numero de resultados que se conservan en cache y velas de curva de capital que
+    # pueden sumar entre todos ellos (16 bytes por vela: timestamp y capital).
+    BOT_TRADE_DIR: str = Field(default="../../bot-trade")
+    BACKTEST_WORKERS: int = Field(default=2, ge=1)
+    BACKTEST_CACHE_SIZE: int = Field(default=256, ge=1)
+    BACKTEST_CACHE_MAX_BARS: int = Field(default=20_000_000, ge=1)
+    # Graficos: puntos por serie si el cliente no pide otro numero, y maximo permitido.
+    CHART_DEFAULT_POINTS: int = Field(default=2000, ge=3)
+    CHART_MAX_POINTS: int = Field(default=10000, ge=3)
+    # Streams de eventos: mensajes discretos pendientes por cliente (si no los lee, se descartan los mas
+    # antiguos) y segundos sin mensajes tras los que se envia un heartbeat.
+    STREAM_QUEUE_SIZE: int = Field(default=1000, ge=1)
+    STREAM_HEARTBEAT_SECONDS: float = Field(default=15.0, gt=0)
 
 settings = Settings()
\ No newline at end of file
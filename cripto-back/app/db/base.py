@@ -5,11 +5,26 @@ from core.config import settings # Importamos la configuración
 # URL de conexión (ya no está hardcodeada aquí)
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Creamos el motor asíncrono de SQLAlchemy
-engine = create_async_engine(str(SQLALCHEMY_DATABASE_URL))
+# Creamos el motor asíncrono de SQLAlchemy. El tamaño del pool se configura por entorno (DB_POOL_*);
+# pool_pre_ping descarta conexiones que el servidor haya cerrado.
+engine = create_async_engine(
+    str(SQLALCHEMY_DATABASE_URL),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 # Creamos una fábrica de sesiones asíncronas
-AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 
 # Creamos una clase Base para que nuestros modelos de ORM la hereden
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+async def get_session():
+    """Dependencia de FastAPI: una sesión por petición."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
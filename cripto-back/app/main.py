@@ -2,10 +2,29 @@ from fastapi import FastAPI
 
 app = FastAPI()
 
+from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.docs import get_swagger_ui_html
+from api.v1.api import api_router
+from core.config import settings
+from modules.backtests.jobs import BacktestJobManager
+from modules.streams.broadcaster import Broadcaster
 
-app = FastAPI(docs_url=None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Las tablas se crean con las migraciones (alembic upgrade head): el arranque no conecta a la base de datos.
+    # Difusion de eventos a los clientes de /streams (backtests y paper trading).
+    app.state.broadcaster = Broadcaster(settings.STREAM_QUEUE_SIZE)
+    # Pool de procesos de los backtests: se crea al arrancar y se cierra al parar la API.
+    app.state.backtest_jobs = BacktestJobManager(settings.BOT_TRADE_DIR, settings.BACKTEST_WORKERS, settings.BACKTEST_CACHE_SIZE,
+                                                 settings.BACKTEST_CACHE_MAX_BARS, broadcaster=app.state.broadcaster)
+    app.state.backtest_jobs.start()
+    yield
+    app.state.backtest_jobs.shutdown()
+
+
+app = FastAPI(docs_url=None, lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -18,6 +37,9 @@ async def custom_swagger_ui():
     )
 
 
+app.include_router(api_router, prefix="/api/v1")
+
+
 
 @app.get("/")
 async def greetings():
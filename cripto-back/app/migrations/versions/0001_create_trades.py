@@ -0,0 +1,51 @@
+"""Crea la tabla trades (modules/trades/model.py).
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trades',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('run_id', sa.String(length=64), nullable=False),
+    sa.Column('symbol', sa.String(length=32), nullable=False),
+    sa.Column('entry_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('exit_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('entry_price', sa.Float(), nullable=False),
+    sa.Column('exit_price', sa.Float(), nullable=False),
+    sa.Column('size', sa.Float(), nullable=False),
+    sa.Column('cost', sa.Float(), nullable=False),
+    sa.Column('fees', sa.Float(), nullable=False),
+    sa.Column('pnl', sa.Float(), nullable=False),
+    sa.Column('pnl_pct', sa.Float(), nullable=False),
+    sa.Column('risk_usd', sa.Float(), nullable=False),
+    sa.Column('r_multiple', sa.Float(), nullable=False),
+    sa.Column('tp1_hit', sa.Boolean(), nullable=False),
+    sa.Column('exit_reason', sa.String(length=16), nullable=False),
+    sa.Column('bars_held', sa.Integer(), nullable=False),
+    sa.Column('mae_pct', sa.Float(), nullable=True),
+    sa.Column('mfe_pct', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trades_run_id_entry_time', 'trades', ['run_id', 'entry_time', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_trades_run_id_entry_time', table_name='trades')
+    op.drop_table('trades')
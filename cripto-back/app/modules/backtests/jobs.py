@@ -0,0 +1,197 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from modules.backtests.worker import init_worker, job_key, run_job
+from modules.streams.broadcaster import Broadcaster
+
+# Espera maxima, tras terminar un trabajo, a que el hilo lector publique sus ultimos eventos.
+EVENTS_DRAIN_SECONDS = 5.0
+
+
+@dataclass
+class Job:
+    job_id: str
+    key: str
+    request: dict
+    submitted_at: datetime
+    future: Future | None = None
+    finished_at: datetime | None = None
+    result: dict | None = None
+    error: str | None = None
+
+    @property
+    def status(self) -> str:
+        if self.error is not None:
+            return "error"
+        if self.result is not None:
+            return "done"
+        if self.future is not None:
+            return "running"
+        return "queued"
+
+
+@dataclass
+class BacktestJobManager:
+    """
+    Cola de backtests sobre un ProcessPoolExecutor acotado: el event loop solo registra trabajos y consulta
+    su estado, nunca ejecuta el pipeline. Los trabajos se identifican por el hash de sus parametros y de
+    los datos (worker.job_key): reenviar uno igual devuelve el mismo trabajo, en curso o ya terminado.
+    Se conservan los cache_size trabajos terminados mas recientes, con un maximo de cache_max_bars velas de
+    curva de capital entre todos ellos (la curva por vela es lo que mas ocupa de cada resultado).
+    Con broadcaster, los cambios de estado y los eventos de los procesos (progreso, operaciones y capital)
+    se difunden con run_id = job_id; los procesos los envian por una cola que lee un hilo de la API.
+    """
+    bot_trade_dir: str
+    max_workers: int = 2
+    cache_size: int = 256
+    cache_max_bars: int = 20_000_000
+    broadcaster: Broadcaster | None = None
+    jobs: dict[str, Job] = field(default_factory=dict)
+    by_key: "OrderedDict[str, str]" = field(default_factory=OrderedDict)
+    # Claves en calculo por peticion: los envios iguales simultaneos esperan la misma en vez de calcularla
+    # cada uno y crear trabajos duplicados.
+    _pending_keys: "dict[str, asyncio.Task]" = field(default_factory=dict)
+    executor: ProcessPoolExecutor | None = None
+    _slots: asyncio.Semaphore | None = None
+    _tasks: set = field(default_factory=set)
+    _events: "multiprocessing.Queue | None" = None
+    _forwarder: threading.Thread | None = None
+    # Trabajos en curso cuyos eventos aun no ha publicado el hilo lector; se marcan al leer su fin de la cola.
+    _drained: "dict[str, asyncio.Event]" = field(default_factory=dict)
+
+    def start(self) -> None:
+        self.bot_trade_dir = os.path.abspath(self.bot_trade_dir)
+        # El executor adelanta trabajos a su cola interna; con el semaforo solo se le entregan tantos como
+        # procesos, asi el estado 'running' es real y el resto espera aqui en orden de llegada.
+        self._slots = asyncio.Semaphore(self.max_workers)
+        if self.broadcaster is not None:
+            self._events = multiprocessing.Queue()
+            self._forwarder = threading.Thread(target=self._forward_events, args=(asyncio.get_running_loop(),),
+                                               name="backtest-events", daemon=True)
+            self._forwarder.start()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker,
+                                            initargs=(self.bot_trade_dir, self._events))
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self._events is not None:
+            self._events.put(None)
+            self._forwarder.join(timeout=1.0) # type: ignore
+            self._events = None
+
+    def _forward_events(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Hilo lector de la cola: junta los lotes disponibles y los publica desde el event loop, que es
+        # donde vive el broadcaster. Los procesos nunca esperan a los clientes.
+        # Cada trabajo termina con su run_id solo (EventSender.close); se avisa despues de publicar sus
+        # eventos, y call_soon_threadsafe los ejecuta en ese orden, asi el estado final llega el ultimo.
+        while True:
+            batches = [self._events.get()] # type: ignore
+            while True:
+                try:
+                    batches.append(self._events.get_nowait()) # type: ignore
+                except queue.Empty:
+                    break
+            messages = [message for batch in batches if isinstance(batch, list) for message in batch]
+            finished = [batch for batch in batches if isinstance(batch, str)]
+            if not loop.is_closed():
+                if messages:
+                    loop.call_soon_threadsafe(self.broadcaster.publish_many, messages) # type: ignore
+                for job_id in finished:
+                    loop.call_soon_threadsafe(self._events_drained, job_id)
+            if None in batches:
+                return
+
+    def _events_drained(self, job_id: str) -> None:
+        drained = self._drained.get(job_id)
+        if drained is not None:
+            drained.set()
+
+    def _publish_status(self, job: Job) -> None:
+        if self.broadcaster is not None:
+            self.broadcaster.publish({"run_id": job.job_id, "type": "status", "status": job.status, "error": job.error})
+
+    async def submit(self, request: dict) -> tuple[Job, bool]:
+        """Devuelve (trabajo, cached). La clave se calcula en un hilo: lee y hashea las velas del rango."""
+        key = await self._job_key(request)
+        # Entre aqui y el registro del trabajo no hay awaits: ningun otro envio puede colarse en medio.
+        job_id = self.by_key.get(key)
+        if job_id is not None and self.jobs[job_id].status != "error":
+            self.by_key.move_to_end(key)
+            return self.jobs[job_id], True
+        if job_id is not None:
+            # Un trabajo fallido no se cachea: se reintenta y el nuevo lo sustituye.
+            del self.jobs[job_id]
+
+        job = Job(job_id=uuid.uuid4().hex, key=key, request=request, submitted_at=datetime.now(timezone.utc))
+        self.jobs[job.job_id] = job
+        self.by_key[key] = job.job_id
+        self.by_key.move_to_end(key)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._publish_status(job)
+        return job, False
+
+    async def _job_key(self, request: dict) -> str:
+        request_id = json.dumps(request, sort_keys=True)
+        task = self._pending_keys.get(request_id)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(job_key, request, self.bot_trade_dir))
+            self._pending_keys[request_id] = task
+            task.add_done_callback(lambda _: self._pending_keys.pop(request_id, None))
+        # shield: si se cancela un envio, los demas que esperan la misma clave siguen.
+        return await asyncio.shield(task)
+
+    async def _run(self, job: Job) -> None:
+        drained, result, error = None, None, None
+        try:
+            async with self._slots: # type: ignore
+                if self._events is not None:
+                    drained = self._drained[job.job_id] = asyncio.Event()
+                job.future = self.executor.submit(run_job, job.job_id, job.request) # type: ignore
+                self._publish_status(job)
+                result = await asyncio.wrap_future(job.future)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+        if drained is not None:
+            # El estado final se publica tras los ultimos eventos del proceso. Si el proceso murio sin
+            # enviar su fin (pool roto), no se espera mas de EVENTS_DRAIN_SECONDS.
+            try:
+                await asyncio.wait_for(drained.wait(), EVENTS_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            del self._drained[job.job_id]
+        job.result, job.error = result, error
+        job.finished_at = datetime.now(timezone.utc)
+        self._publish_status(job)
+        self._evict()
+
+    def _evict(self) -> None:
+        # Se descartan los trabajos terminados menos usados; los que siguen en cola no cuentan. El ultimo en
+        # usarse se conserva aunque su curva supere cache_max_bars.
+        finished = [key for key, job_id in self.by_key.items() if self.jobs[job_id].finished_at is not None]
+        bars = {key: self._equity_bars(self.jobs[self.by_key[key]]) for key in finished}
+        total_bars = sum(bars.values())
+        for key in finished[:-1]:
+            if len(finished) <= self.cache_size and total_bars <= self.cache_max_bars:
+                break
+            del self.jobs[self.by_key.pop(key)]
+            finished.remove(key)
+            total_bars -= bars[key]
+
+    @staticmethod
+    def _equity_bars(job: Job) -> int:
+        return len(job.result["equity"]["timestamp"]) if job.result is not None and "equity" in job.result else 0
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from db.base import get_session
+from modules.backtests.jobs import BacktestJobManager, Job
+from modules.backtests.schema import BacktestJob, BacktestRequest, BacktestResult
+from modules.charts.router import ChartFormat, chart_response
+from modules.charts.series import equity_columns, make_etag
+from modules.trades import crud as trades_crud
+from modules.trades.schema import TradesStored
+
+router = APIRouter(prefix="/backtests", tags=["backtests"])
+
+
+def _manager(request: Request) -> BacktestJobManager:
+    return request.app.state.backtest_jobs
+
+
+def _job_status(job: Job, cached: bool = False) -> BacktestJob:
+    return BacktestJob(job_id=job.job_id, status=job.status, cached=cached, key=job.key, # type: ignore
+                       submitted_at=job.submitted_at, finished_at=job.finished_at, error=job.error)
+
+
+def _get_job(request: Request, job_id: str) -> Job:
+    job = _manager(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Trabajo '{job_id}' no encontrado.")
+    return job
+
+
+@router.post("", response_model=BacktestJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_backtest(backtest: BacktestRequest, request: Request):
+    """Encola un backtest y devuelve su id. Si ya existe uno con los mismos parametros y datos, devuelve ese."""
+    try:
+        job, cached = await _manager(request).submit(backtest.model_dump())
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+    except FileNotFoundError as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+    return _job_status(job, cached)
+
+
+@router.get("/{job_id}", response_model=BacktestJob)
+async def get_backtest(job_id: str, request: Request):
+    return _job_status(_get_job(request, job_id))
+
+
+def _finished_job(request: Request, job_id: str) -> Job:
+    job = _get_job(request, job_id)
+    if job.error is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"El trabajo fallo: {job.error}")
+    if job.result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"El trabajo esta '{job.status}'.")
+    return job
+
+
+@router.get("/{job_id}/result", response_model=BacktestResult)
+async def get_backtest_result(job_id: str, request: Request):
+    job = _finished_job(request, job_id)
+    # La curva de capital no forma parte del resultado JSON: se sirve reducida en /equity.
+    return BacktestResult(job_id=job.job_id, **{name: value for name, value in job.result.items() if name != "equity"}) # type: ignore
+
+
+@router.get("/{job_id}/equity")
+async def get_backtest_equity(
+        job_id: str,
+        request: Request,
+        start: str | None = None,
+        end: str | None = None,
+        points: int | None = Query(default=None, ge=3, le=settings.CHART_MAX_POINTS),
+        format: ChartFormat = "binary"):
+    """Curva de capital por vela del backtest en [start, end), reducida con LTTB. Columnas: timestamp, equity."""
+    job = _finished_job(request, job_id)
+    points = points or settings.CHART_DEFAULT_POINTS
+    etag = make_etag("equity", job.key, start, end, points, format)
+    return await chart_response(request, etag, format, lambda: equity_columns(job.result["equity"], start, end, points)) # type: ignore
+
+
+
+@router.post("/{job_id}/trades", response_model=TradesStored)
+async def store_backtest_trades(job_id: str, request: Request, session: AsyncSession = Depends(get_session)):
+    """Guarda las operaciones del backtest en la tabla trades (run_id = job_id), sustituyendo las que hubiera."""
+    job = _finished_job(request, job_id)
+    await trades_crud.delete_trades(session, job_id)
+    stored = await trades_crud.bulk_insert_trades(session, job_id, job.result["symbol"], job.result["trades"]) # type: ignore
+    await session.commit()
+    return TradesStored(run_id=job_id, trades=stored)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any, Literal
+from pydantic import BaseModel, Field
+
+JobStatus = Literal["queued", "running", "done", "error"]
+
+
+class BacktestRequest(BaseModel):
+    strategy: Literal["bullish_divergence"] = "bullish_divergence"
+    symbol: str = "BTC/USDT"
+    timeframe: str = "1h"
+    # Rango [start, end) de las velas; fechas ISO (sin zona = UTC). None = todo lo almacenado.
+    start: str | None = None
+    end: str | None = None
+    # Parametros de la estrategia; los que falten toman su valor por defecto.
+    parameters: dict[str, int | float] = Field(default_factory=dict)
+    initial_capital: float = Field(default=10000.0, gt=0)
+    fee_rate: float = Field(default=0.001, ge=0, lt=1)
+    risk_per_trade_pct: float = Field(default=0.01, gt=0, le=1)
+
+
+class BacktestJob(BaseModel):
+    job_id: str
+    status: JobStatus
+    # True si el trabajo ya existia (en cola, en curso o terminado) con los mismos parametros y datos.
+    cached: bool = False
+    key: str
+    submitted_at: datetime
+    finished_at: datetime | None = None
+    error: str | None = None
+
+
+class BacktestResult(BaseModel):
+    job_id: str
+    symbol: str
+    timeframe: str
+    start: str | None
+    end: str | None
+    parameters: dict[str, int | float]
+    settings: dict[str, float]
+    final_capital: float
+    pnl_pct: float
+    metrics: dict[str, Any]
+    trades: list[dict[str, Any]]
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+# Codigo que se ejecuta fuera del event loop: job_key en un hilo del proceso de la API y run_job en los
+# procesos del pool. Los modulos de bot-trade (numpy, pandas, numba) se importan al usarse por primera vez.
+
+# Cada proceso del pool conserva sus indicadores entre trabajos (solo en memoria: la cache en disco de
+# IndicatorStore no esta pensada para escrituras concurrentes de varios procesos).
+_indicator_store = None
+
+# Cola (multiprocessing) hacia el proceso de la API para los eventos de progreso y operaciones.
+_event_queue = None
+
+# Los eventos se envian en lotes: un put por mensaje costaria un pickle y una escritura en el pipe cada vez.
+EVENT_BATCH_SIZE = 500
+EVENT_FLUSH_SECONDS = 0.1
+
+
+def add_bot_trade_path(bot_trade_dir: str) -> None:
+    if bot_trade_dir not in sys.path:
+        sys.path.insert(0, bot_trade_dir)
+
+
+def init_worker(bot_trade_dir: str, event_queue=None) -> None:
+    """Initializer del pool: los almacenes de bot-trade usan rutas relativas a su directorio."""
+    global _event_queue
+    add_bot_trade_path(bot_trade_dir)
+    os.chdir(bot_trade_dir)
+    _event_queue = event_queue
+
+
+class EventSender:
+    """Agrupa los eventos de un trabajo (con su run_id) y los pone en la cola por lotes."""
+
+    def __init__(self, run_id: str, queue):
+        self.run_id = run_id
+        self.queue = queue
+        self.pending: list[dict] = []
+        self.last_flush = time.monotonic()
+
+    def __call__(self, message: dict) -> None:
+        self.pending.append({"run_id": self.run_id, **message})
+        if (len(self.pending) >= EVENT_BATCH_SIZE or message["type"] == "progress"
+                or time.monotonic() - self.last_flush >= EVENT_FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.queue.put(self.pending)
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Envia lo pendiente y, detras, el run_id solo: marca que el trabajo no enviara mas eventos."""
+        self.flush()
+        self.queue.put(self.run_id)
+
+
+def ohlcv_store(bot_trade_dir: str):
+    """Almacen de velas de bot-trade (su ruta por defecto es relativa a su directorio)."""
+    add_bot_trade_path(bot_trade_dir)
+    from src.get_training_data.ohlcv_store import OHLCVStore, DEFAULT_STORE_DIR
+    return OHLCVStore(os.path.join(bot_trade_dir, DEFAULT_STORE_DIR))
+
+
+def job_key(request: dict, bot_trade_dir: str) -> str:
+    """
+    Hash del trabajo: estrategia, parametros completos (con los valores por defecto), ajustes de simulacion
+    y huella de las velas del rango. Si cambian los datos almacenados, cambia la clave.
+    Lanza ValueError con parametros desconocidos y FileNotFoundError si el rango no tiene velas.
+    """
+    store = ohlcv_store(bot_trade_dir)
+    from src.backtesting.bullish_divergence.backtest_job import resolve_parameters
+    from src.get_training_data.ohlcv_store import to_milliseconds
+    from src.get_training_data.resampling import source_timeframe
+
+    # Si el timeframe se deriva de las velas base (load_resampled), la huella es la de esas velas.
+    source = source_timeframe(store, request["symbol"], request["timeframe"])
+    dataset = store.fingerprint(request["symbol"], source, request["start"], request["end"])
+    if dataset is None:
+        raise FileNotFoundError(f"No hay velas de {request['symbol']} {request['timeframe']} "
+                                f"para el rango [{request['start']}, {request['end']}).")
+    description = {
+        **request,
+        # Fechas equivalentes escritas de otra forma ('2021-01-01' y '2021-01-01T00:00') dan la misma clave.
+        "start": to_milliseconds(request["start"]),
+        "end": to_milliseconds(request["end"]),
+        "parameters": resolve_parameters(request["parameters"]),
+        "dataset": dataset,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def run_job(job_id: str, request: dict) -> dict:
+    """
+    Ejecuta el backtest en un proceso del pool. El resultado incluye la curva de capital para los graficos.
+    Si el pool tiene cola de eventos, el progreso y las operaciones se envian por ella con run_id = job_id.
+    """
+    global _indicator_store
+    from src.backtesting.indicator_store import IndicatorStore
+    from src.backtesting.bullish_divergence.backtest_job import run_backtest_job
+
+    if _indicator_store is None:
+        _indicator_store = IndicatorStore()
+    settings = {name: request[name] for name in ("initial_capital", "fee_rate", "risk_per_trade_pct")}
+    sender = EventSender(job_id, _event_queue) if _event_queue is not None else None
+    try:
+        return run_backtest_job(request["symbol"], request["timeframe"], request["start"], request["end"],
+                                request["parameters"], settings, indicator_store=_indicator_store, include_equity=True,
+                                on_event=sender)
+    finally:
+        if sender is not None:
+            sender.close()
@@ -0,0 +1,58 @@
+import json
+import struct
+import numpy as np
+
+# Formato binario de las series de los graficos (media type COLUMNS_MEDIA_TYPE), pensado para leerse en el
+# navegador sin parsear texto (new Float64Array(buffer, offset, length)):
+#   uint32 little-endian con la longitud N de la cabecera
+#   N bytes de cabecera JSON: {"columns": [{"name", "dtype", "offset", "length"}, ...], ...metadatos}
+#   relleno hasta multiplo de 8 y columnas little-endian, cada una alineada a 8 bytes; offset se cuenta
+#   desde el inicio de las columnas (4 + N redondeado a multiplo de 8).
+# Los timestamps (ms) van en float64, exactos hasta 2^53; los valores en float32, suficiente para pintar.
+
+COLUMNS_MEDIA_TYPE = "application/vnd.cripto.columns"
+TIMESTAMP_DTYPE = np.dtype("<f8")
+VALUE_DTYPE = np.dtype("<f4")
+
+
+def _aligned(size: int) -> int:
+    return -(-size // 8) * 8
+
+
+def chart_columns(timestamps: np.ndarray, **values: np.ndarray) -> dict[str, np.ndarray]:
+    """Columnas con los tipos del formato: 'timestamp' en float64 y el resto en float32."""
+    columns = {"timestamp": np.asarray(timestamps).astype(TIMESTAMP_DTYPE)}
+    columns.update({name: np.asarray(column).astype(VALUE_DTYPE) for name, column in values.items()})
+    return columns
+
+
+def pack_columns(columns: dict[str, np.ndarray], **metadata) -> bytes:
+    """Empaqueta las columnas (ya con su dtype final) en el formato binario descrito arriba."""
+    descriptions = []
+    offset = 0
+    for name, values in columns.items():
+        descriptions.append({"name": name, "dtype": values.dtype.str, "offset": offset, "length": len(values)})
+        offset += _aligned(values.nbytes)
+    header = json.dumps({"columns": descriptions, **metadata}).encode()
+    body_start = _aligned(4 + len(header))
+
+    message = bytearray(body_start + offset)
+    message[:4] = struct.pack("<I", len(header))
+    message[4:4 + len(header)] = header
+    for description, values in zip(descriptions, columns.values()):
+        start = body_start + description["offset"]
+        message[start:start + values.nbytes] = np.ascontiguousarray(values).tobytes()
+    return bytes(message)
+
+
+def unpack_columns(message: bytes) -> tuple[dict[str, np.ndarray], dict]:
+    """Inversa de pack_columns: (columnas, metadatos)."""
+    (header_length,) = struct.unpack_from("<I", message)
+    header = json.loads(bytes(message[4:4 + header_length]))
+    body_start = _aligned(4 + header_length)
+    columns = {
+        description["name"]: np.frombuffer(message, dtype=np.dtype(description["dtype"]), count=description["length"],
+                                            offset=body_start + description["offset"])
+        for description in header.pop("columns")
+    }
+    return columns, header
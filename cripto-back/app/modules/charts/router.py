@@ -0,0 +1,89 @@
+import asyncio
+import json
+from typing import Callable, Literal
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from core.config import settings
+from modules.charts.packing import COLUMNS_MEDIA_TYPE, pack_columns
+from modules.charts.series import candle_columns, dataset_fingerprint, indicator_columns, make_etag, payload_cache
+
+router = APIRouter(prefix="/charts", tags=["charts"])
+
+ChartFormat = Literal["binary", "json"]
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    tags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+
+async def chart_response(request: Request, etag: str, chart_format: ChartFormat, build: Callable[[], dict]) -> Response:
+    """
+    Respuesta de un grafico con ETag. Si el cliente ya la tiene (If-None-Match) se contesta 304 sin calcular
+    nada; si no, se busca en la cache de respuestas y solo en ultimo caso se construye en un hilo.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    payload = payload_cache.get(etag)
+    if payload is None:
+        try:
+            columns = await asyncio.to_thread(build)
+        except ValueError as error:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+        if chart_format == "binary":
+            payload = pack_columns(columns)
+        else:
+            payload = json.dumps({name: values.tolist() for name, values in columns.items()}).encode()
+        payload_cache.put(etag, payload)
+    media_type = COLUMNS_MEDIA_TYPE if chart_format == "binary" else "application/json"
+    return Response(content=payload, media_type=media_type, headers=headers)
+
+
+async def _dataset_key(symbol: str, timeframe: str, start: str | None, end: str | None) -> str:
+    try:
+        dataset_key = await asyncio.to_thread(dataset_fingerprint, settings.BOT_TRADE_DIR, symbol, timeframe, start, end)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+    if dataset_key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No hay velas de {symbol} {timeframe} para el rango [{start}, {end}).")
+    return dataset_key
+
+
+@router.get("/candles")
+async def get_candles(
+        request: Request,
+        symbol: str = "BTC/USDT",
+        timeframe: str = "1h",
+        start: str | None = None,
+        end: str | None = None,
+        points: int | None = Query(default=None, ge=3, le=settings.CHART_MAX_POINTS),
+        format: ChartFormat = "binary"):
+    """Velas de [start, end) agregadas a como mucho points velas. Columnas: timestamp, open, high, low, close, volume."""
+    points = points or settings.CHART_DEFAULT_POINTS
+    dataset_key = await _dataset_key(symbol, timeframe, start, end)
+    etag = make_etag("candles", dataset_key, points, format)
+    return await chart_response(request, etag, format, lambda: candle_columns(
+        settings.BOT_TRADE_DIR, symbol, timeframe, start, end, points))
+
+
+@router.get("/indicators")
+async def get_indicators(
+        request: Request,
+        symbol: str = "BTC/USDT",
+        timeframe: str = "1h",
+        start: str | None = None,
+        end: str | None = None,
+        points: int | None = Query(default=None, ge=3, le=settings.CHART_MAX_POINTS),
+        rsi_period: int = Query(default=14, ge=2),
+        bb_period: int = Query(default=20, ge=2),
+        bb_std_dev: float = Query(default=2, gt=0),
+        atr_period: int = Query(default=14, ge=2),
+        format: ChartFormat = "binary"):
+    """RSI, Bandas de Bollinger y ATR de [start, end) reducidos con LTTB. Cada linea trae '<linea>_timestamp'."""
+    points = points or settings.CHART_DEFAULT_POINTS
+    dataset_key = await _dataset_key(symbol, timeframe, start, end)
+    etag = make_etag("indicators", dataset_key, points, rsi_period, bb_period, bb_std_dev, atr_period, format)
+    return await chart_response(request, etag, format, lambda: indicator_columns(
+        settings.BOT_TRADE_DIR, symbol, timeframe, start, end, points, dataset_key,
+        rsi_period, bb_period, bb_std_dev, atr_period))
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from modules.backtests.worker import ohlcv_store
+from modules.charts.packing import TIMESTAMP_DTYPE, VALUE_DTYPE, chart_columns
+
+# Series reducidas para los graficos. Todo se ejecuta en hilos (asyncio.to_thread) desde el router:
+# leer velas, calcular indicadores y reducir puntos no debe bloquear el event loop.
+
+# Indicadores en memoria compartidos por las peticiones; IndicatorStore no es seguro entre hilos.
+_indicator_store = None
+_indicator_lock = threading.Lock()
+
+
+class PayloadCache:
+    """Respuestas ya empaquetadas por ETag (LRU): repetir un grafico no vuelve a leer ni a reducir nada."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> bytes | None:
+        with self._lock:
+            payload = self._entries.get(etag)
+            if payload is not None:
+                self._entries.move_to_end(etag)
+            return payload
+
+    def put(self, etag: str, payload: bytes) -> None:
+        with self._lock:
+            self._entries[etag] = payload
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+payload_cache = PayloadCache()
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest() + '"'
+
+
+def dataset_fingerprint(bot_trade_dir: str, symbol: str, timeframe: str, start: str | None, end: str | None) -> str | None:
+    """
+    Huella de las velas del rango sin leerlas (OHLCVStore.fingerprint). None si no hay velas. Si el timeframe
+    se deriva de las velas base (load_resampled), es la huella de esas velas.
+    """
+    store = ohlcv_store(bot_trade_dir)
+    from src.get_training_data.resampling import source_timeframe
+
+    return store.fingerprint(symbol, source_timeframe(store, symbol, timeframe), start, end)
+
+
+def candle_columns(bot_trade_dir: str, symbol: str, timeframe: str, start: str | None, end: str | None,
+                   points: int) -> dict[str, np.ndarray]:
+    """Velas del rango agregadas a como mucho points velas (OHLC por intervalos de tiempo)."""
+    store = ohlcv_store(bot_trade_dir)
+    from src.charting.downsampling import downsample_ohlcv
+    from src.get_training_data.resampling import candle_series
+
+    # Las mismas velas que los backtests: la serie guardada o la derivada de las velas base.
+    columns = downsample_ohlcv(store.read(symbol, candle_series(store, symbol, timeframe), start, end), timeframe, points)
+    return chart_columns(columns["timestamp"], **{name: columns[name] for name in ("open", "high", "low", "close", "volume")})
+
+
+def indicator_columns(bot_trade_dir: str, symbol: str, timeframe: str, start: str | None, end: str | None, points: int,
+                      dataset_key: str, rsi_period: int, bb_period: int, bb_std_dev: float, atr_period: int) -> dict[str, np.ndarray]:
+    """
+    Lineas de los indicadores de la estrategia reducidas con LTTB. Cada linea elige sus propios puntos,
+    asi que lleva su columna de tiempos: '<linea>_timestamp' y '<linea>'.
+    """
+    global _indicator_store
+    store = ohlcv_store(bot_trade_dir)
+    from src.backtesting.indicator_store import IndicatorStore, indicator_specs
+    from src.charting.downsampling import downsample_line
+    from src.get_training_data.resampling import load_resampled
+
+    df = load_resampled(symbol, timeframe, start, end, store=store)
+    lines = {}
+    with _indicator_lock:
+        if _indicator_store is None:
+            _indicator_store = IndicatorStore()
+        # La huella del almacen sirve de clave: no hace falta hashear las velas para consultar la cache.
+        for name, params in indicator_specs(rsi_period, bb_period, bb_std_dev, atr_period).items():
+            lines.update(_indicator_store.get(df, name, dataset_key, **params))
+
+    timestamps = df.index.to_numpy(dtype="datetime64[ms]").view(np.int64)
+    columns = {}
+    for line, values in lines.items():
+        x, y = downsample_line(timestamps, np.asarray(values), points)
+        columns[f"{line}_timestamp"] = x.astype(TIMESTAMP_DTYPE)
+        columns[line] = y.astype(VALUE_DTYPE)
+    return columns
+
+
+def equity_columns(equity: dict[str, np.ndarray], start: str | None, end: str | None, points: int) -> dict[str, np.ndarray]:
+    """Curva de capital de un backtest recortada a [start, end) y reducida con LTTB."""
+    from src.charting.downsampling import downsample_line
+    from src.get_training_data.ohlcv_store import to_milliseconds
+
+    timestamps = equity["timestamp"]
+    start_ms, end_ms = to_milliseconds(start), to_milliseconds(end)
+    lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side="left"))
+    hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side="left"))
+    x, y = downsample_line(timestamps[lo:hi], equity["equity"][lo:hi], points)
+    return chart_columns(x, equity=y)
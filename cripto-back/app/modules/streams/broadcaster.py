@@ -0,0 +1,95 @@
+import asyncio
+import json
+from collections import defaultdict, deque
+
+# Difusion de eventos de backtests y paper trading a los clientes de /streams. Todo se ejecuta en el event
+# loop: publicar nunca espera a ningun cliente. Cada suscripcion tiene su propia cola acotada; un cliente
+# lento solo pierde sus mensajes mas antiguos (y recibe cuantos se perdieron), no frena a los demas.
+
+# Tipos de estado: solo interesa el ultimo valor, asi que se sustituyen en vez de encolarse.
+COALESCED_TYPES = ("progress", "equity")
+
+
+def encode(message: dict) -> str:
+    return json.dumps(message, separators=(",", ":"), allow_nan=False)
+
+
+class Subscription:
+    """Cola de un cliente: mensajes discretos (acotados) y ultimo mensaje de cada estado por ejecucion."""
+
+    def __init__(self, run_id: str | None, max_events: int):
+        self.run_id = run_id
+        self.dropped = 0
+        self._events: deque[str] = deque(maxlen=max_events)
+        self._latest: dict[tuple, str] = {}
+        self._wakeup = asyncio.Event()
+
+    def offer(self, events: list[str], latest: dict[tuple, str]) -> None:
+        overflow = len(self._events) + len(events) - self._events.maxlen # type: ignore
+        if overflow > 0:
+            self.dropped += overflow
+        self._events.extend(events)
+        self._latest.update(latest)
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float) -> list[str] | None:
+        """Mensajes pendientes ya codificados, en orden; None si en timeout segundos no llego nada."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._wakeup.clear()
+        batch = list(self._events)
+        self._events.clear()
+        if self.dropped:
+            batch.insert(0, encode({"type": "dropped", "count": self.dropped}))
+            self.dropped = 0
+        batch.extend(self._latest.values())
+        self._latest.clear()
+        return batch
+
+
+class Broadcaster:
+    """
+    Reparte cada mensaje a las suscripciones de su run_id y a las de todas las ejecuciones (run_id None).
+    Los mensajes se codifican una sola vez por publicacion, no una por cliente.
+    """
+
+    def __init__(self, max_events: int = 1000):
+        self.max_events = max_events
+        self._subscriptions: dict[str | None, set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, run_id: str | None = None) -> Subscription:
+        subscription = Subscription(run_id, self.max_events)
+        self._subscriptions[run_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.run_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.run_id]
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, message: dict) -> None:
+        self.publish_many([message])
+
+    def publish_many(self, messages: list[dict]) -> None:
+        """Publica un lote de mensajes (cada uno con 'run_id' y 'type')."""
+        by_run: dict[str, tuple[list[str], dict[tuple, str]]] = {}
+        for message in messages:
+            run_id = message["run_id"]
+            events, latest = by_run.setdefault(run_id, ([], {}))
+            if message["type"] in COALESCED_TYPES:
+                latest[(run_id, message["type"])] = encode(message)
+            else:
+                events.append(encode(message))
+        for run_id, (events, latest) in by_run.items():
+            for subscription in self._subscriptions.get(run_id, ()):
+                subscription.offer(events, latest)
+            for subscription in self._subscriptions.get(None, ()):
+                subscription.offer(events, latest)
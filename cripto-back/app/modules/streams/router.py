@@ -0,0 +1,67 @@
+from typing import Any
+from fastapi import APIRouter, Body, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from core.config import settings
+from modules.streams.broadcaster import Broadcaster
+
+router = APIRouter(prefix="/streams", tags=["streams"])
+
+# Cada envio es un lote de mensajes JSON en orden: [{"run_id", "type", ...}, ...]. Tipos:
+#   status    estado de un backtest (queued, running, done, error)
+#   progress  etapa y fraccion completada de un backtest (solo se envia el ultimo)
+#   trade     entrada, TP1 o cierre de una operacion (columnas de simulation_report.event_message)
+#   equity    capital tras un cierre (backtests) o por vela (paper trading) (solo se envia el ultimo)
+#   dropped   mensajes descartados porque el cliente no los leia a tiempo
+
+
+def _broadcaster(request: Request) -> Broadcaster:
+    return request.app.state.broadcaster
+
+
+def _batch(messages: list[str]) -> str:
+    return "[" + ",".join(messages) + "]"
+
+
+@router.websocket("/ws")
+async def stream_websocket(websocket: WebSocket, run_id: str | None = None):
+    """Eventos de una ejecucion (run_id: id del trabajo de backtest o de la sesion de paper) o de todas."""
+    await websocket.accept()
+    broadcaster: Broadcaster = websocket.app.state.broadcaster
+    subscription = broadcaster.subscribe(run_id)
+    try:
+        while True:
+            batch = await subscription.next_batch(settings.STREAM_HEARTBEAT_SECONDS)
+            await websocket.send_text(_batch(batch) if batch is not None else '[{"type":"heartbeat"}]')
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@router.get("/sse")
+async def stream_sse(request: Request, run_id: str | None = None):
+    """Los mismos eventos que /ws como Server-Sent Events (un lote por evento 'data')."""
+    broadcaster = _broadcaster(request)
+    subscription = broadcaster.subscribe(run_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(settings.STREAM_HEARTBEAT_SECONDS)
+                yield f"data: {_batch(batch)}\n\n" if batch is not None else ": heartbeat\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/{run_id}/events", status_code=status.HTTP_202_ACCEPTED)
+async def publish_events(run_id: str, request: Request, messages: list[dict[str, Any]] = Body(...)):
+    """Ingesta de eventos de procesos externos (paper trading de bot-trade): se difunden con este run_id."""
+    if any(not isinstance(message.get("type"), str) for message in messages):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Cada evento necesita 'type'.")
+    try:
+        _broadcaster(request).publish_many([{**message, "run_id": run_id} for message in messages])
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+    return {"run_id": run_id, "accepted": len(messages)}
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# db.base crea su motor con settings.DATABASE_URL al importarse. La comprobación usa su propio motor
+# (--database-url), así que basta con que la variable exista; el motor de la API no llega a conectar.
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///check_crud.db")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from db.base import Base
+from modules.trades import crud
+
+# Comprueba bulk_insert_trades y la paginación por clave de list_trades contra una base de datos real
+# (por defecto SQLite con aiosqlite en un fichero temporal; con --database-url, por ejemplo PostgreSQL)
+# y mide filas por segundo. Uso, desde cripto-back/app: python -m modules.trades.check_crud
+
+
+def synthetic_trades(n_trades: int, seed: int = 0) -> list[dict]:
+    """Operaciones con el formato de backtest_job (fechas ISO sin zona). Hay horas de entrada repetidas."""
+    rng = random.Random(seed)
+    start = datetime(2021, 1, 1)
+    trades = []
+    for i in range(n_trades):
+        # Cada 10 operaciones, dos comparten hora de entrada: el id decide el orden entre ellas.
+        entry_time = start + timedelta(hours=i - (i % 10 == 1))
+        entry_price = rng.uniform(20_000, 60_000)
+        exit_price = entry_price * rng.uniform(0.97, 1.05)
+        size = rng.uniform(0.01, 0.5)
+        pnl = (exit_price - entry_price) * size
+        trades.append({
+            "entry_time": entry_time.isoformat(),
+            "exit_time": (entry_time + timedelta(hours=rng.randint(1, 48))).isoformat(),
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "size": size,
+            "cost": entry_price * size,
+            "fees": entry_price * size * 0.002,
+            "pnl": pnl,
+            "pnl_pct": pnl / (entry_price * size) * 100,
+            "risk_usd": 100.0,
+            "r_multiple": pnl / 100.0,
+            "tp1_hit": exit_price > entry_price,
+            "exit_reason": "Take Profit 2" if exit_price > entry_price else "Stop Loss",
+            "bars_held": rng.randint(1, 48),
+            "mae_pct": None if i % 7 == 0 else -rng.uniform(0, 3),
+            "mfe_pct": None if i % 7 == 0 else rng.uniform(0, 5),
+        })
+    return trades
+
+
+async def check_trades_crud(database_url: str, n_trades: int, page_size: int) -> None:
+    engine = create_async_engine(database_url)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    run_id = uuid.uuid4().hex
+    trades = synthetic_trades(n_trades)
+    try:
+        async with sessions() as session:
+            start = time.perf_counter()
+            inserted = await crud.bulk_insert_trades(session, run_id, "BTC/USDT", trades)
+            await session.commit()
+            insert_seconds = time.perf_counter() - start
+        assert inserted == n_trades, f"bulk_insert_trades devolvió {inserted} filas de {n_trades}"
+        print(f"{engine.dialect.name}+{engine.dialect.driver}: {n_trades:,} operaciones insertadas en "
+              f"{insert_seconds:.2f}s ({n_trades / insert_seconds:,.0f} filas/s)")
+
+        async with sessions() as session:
+            start = time.perf_counter()
+            rows, pages, after = [], 0, None
+            while True:
+                page = await crud.list_trades(session, run_id, page_size, after)
+                if not page:
+                    break
+                rows.extend(page)
+                pages += 1
+                # Mismo camino que la API: el cursor va codificado entre páginas.
+                after = crud.decode_cursor(crud.encode_cursor(page[-1]))
+            read_seconds = time.perf_counter() - start
+        assert len(rows) == n_trades, f"La paginación devolvió {len(rows)} filas de {n_trades}"
+        assert len({row.id for row in rows}) == n_trades, "La paginación repitió filas"
+        keys = [(row.entry_time, row.id) for row in rows]
+        assert keys == sorted(keys), "Las páginas no están ordenadas por (entry_time, id)"
+        assert [row.pnl for row in sorted(rows, key=lambda row: row.id)] == [trade["pnl"] for trade in trades], \
+            "Las filas leídas no son las insertadas"
+        print(f"{pages} páginas de {page_size} leídas en {read_seconds:.2f}s ({n_trades / read_seconds:,.0f} filas/s), "
+              f"cada fila una vez y en orden")
+    finally:
+        async with sessions() as session:
+            await crud.delete_trades(session, run_id)
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprueba la inserción masiva y la paginación de operaciones.")
+    parser.add_argument("--database-url", default=None,
+                        help="URL asíncrona de SQLAlchemy (por defecto, SQLite con aiosqlite en un fichero temporal).")
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(work_dir, 'trades.db')}"
+        asyncio.run(check_trades_crud(database_url, args.trades, args.page_size))
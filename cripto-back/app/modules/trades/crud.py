@@ -0,0 +1,96 @@
+import base64
+from datetime import datetime, timezone
+from typing import Iterable
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from modules.trades.model import Trade
+
+# Columnas que se insertan (el id lo pone la base de datos), en el orden del COPY.
+TRADE_COLUMNS = [column.name for column in Trade.__table__.columns if column.name != "id"]
+
+# Filas por lote de INSERT. Cada lote va como un executemany de Core (sin objetos ni unit of work del ORM),
+# que el driver envía agrupado; lotes acotados evitan tener todos los parámetros preparados a la vez.
+INSERT_BATCH_SIZE = 5000
+
+
+def _utc(value: datetime | str) -> datetime:
+    # Las operaciones de bot-trade traen fechas ISO sin zona, en UTC. Volver a parsear con la zona añadida
+    # es bastante más rápido que datetime.replace(tzinfo=...), y esto se hace dos veces por operación.
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo is not None else datetime.fromisoformat(value + "+00:00")
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _trade_row(run_id: str, symbol: str, trade: dict) -> dict:
+    """Fila de la tabla a partir de una operación de bot-trade; las claves que no son columnas se ignoran."""
+    row = {name: trade.get(name) for name in TRADE_COLUMNS}
+    row["run_id"] = run_id
+    row["symbol"] = trade.get("symbol", symbol)
+    row["entry_time"] = _utc(trade["entry_time"])
+    row["exit_time"] = _utc(trade["exit_time"])
+    return row
+
+
+async def bulk_insert_trades(
+        session: AsyncSession,
+        run_id: str,
+        symbol: str,
+        trades: Iterable[dict],
+        batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """
+    Inserta las operaciones de una ejecución sin pasar por objetos del ORM. En PostgreSQL con asyncpg se usa
+    COPY (copy_records_to_table); con otros motores, executemany de un INSERT de Core por lotes de batch_size.
+    No hace commit: la operación forma parte de la transacción de la sesión. Devuelve las filas insertadas.
+    """
+    rows = [_trade_row(run_id, symbol, trade) for trade in trades]
+    if not rows:
+        return 0
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "asyncpg":
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table( # type: ignore
+            Trade.__tablename__,
+            records=[tuple(row[name] for name in TRADE_COLUMNS) for row in rows],
+            columns=TRADE_COLUMNS,
+        )
+    else:
+        for start in range(0, len(rows), batch_size):
+            await connection.execute(insert(Trade.__table__), rows[start:start + batch_size])
+    return len(rows)
+
+
+async def delete_trades(session: AsyncSession, run_id: str) -> int:
+    """Borra las operaciones de una ejecución (para volver a guardarlas). Devuelve las filas borradas."""
+    result = await session.execute(delete(Trade).where(Trade.run_id == run_id))
+    return result.rowcount # type: ignore
+
+
+def encode_cursor(trade: Trade) -> str:
+    return base64.urlsafe_b64encode(f"{trade.entry_time.isoformat()}|{trade.id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """(entry_time, id) de la última operación de la página anterior. ValueError si el cursor no es válido."""
+    try:
+        entry_time, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(entry_time), int(trade_id)
+    except Exception as error:
+        raise ValueError(f"Cursor no válido: {cursor}") from error
+
+
+async def list_trades(
+        session: AsyncSession,
+        run_id: str,
+        limit: int = 500,
+        after: tuple[datetime, int] | None = None) -> list[Trade]:
+    """
+    Página de operaciones de una ejecución ordenadas por (entry_time, id), empezando detrás de after.
+    Paginación por clave (keyset) sobre el índice (run_id, entry_time, id): el coste de cada página no
+    depende de cuántas se hayan leído antes, a diferencia de OFFSET.
+    """
+    query = select(Trade).where(Trade.run_id == run_id)
+    if after is not None:
+        query = query.where(tuple_(Trade.entry_time, Trade.id) > tuple_(*after))
+    query = query.order_by(Trade.entry_time, Trade.id).limit(limit)
+    return list((await session.scalars(query)).all())
@@ -0,0 +1,35 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from db.base import Base
+
+
+class Trade(Base):
+    """
+    Operación cerrada de una ejecución (run_id: id del trabajo de backtest o de la sesión de paper trading).
+    Las columnas siguen la tabla de operaciones de bot-trade (performance_analytics.trades_frame).
+    """
+    __tablename__ = "trades"
+    # Lecturas paginadas por (entry_time, id) dentro de cada ejecución: el id desempata operaciones con la misma hora.
+    __table_args__ = (Index("ix_trades_run_id_entry_time", "run_id", "entry_time", "id"),)
+
+    # En SQLite solo INTEGER PRIMARY KEY es autoincremental.
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    run_id: Mapped[str] = mapped_column(String(64))
+    symbol: Mapped[str] = mapped_column(String(32))
+    entry_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    exit_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    entry_price: Mapped[float] = mapped_column(Float)
+    exit_price: Mapped[float] = mapped_column(Float)
+    size: Mapped[float] = mapped_column(Float)
+    cost: Mapped[float] = mapped_column(Float)
+    fees: Mapped[float] = mapped_column(Float)
+    pnl: Mapped[float] = mapped_column(Float)
+    pnl_pct: Mapped[float] = mapped_column(Float)
+    risk_usd: Mapped[float] = mapped_column(Float)
+    r_multiple: Mapped[float] = mapped_column(Float)
+    tp1_hit: Mapped[bool] = mapped_column(Boolean)
+    exit_reason: Mapped[str] = mapped_column(String(16))
+    bars_held: Mapped[int] = mapped_column(Integer)
+    mae_pct: Mapped[float | None] = mapped_column(Float, nullable=True)
+    mfe_pct: Mapped[float | None] = mapped_column(Float, nullable=True)
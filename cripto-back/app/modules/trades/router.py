@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.base import get_session
+from modules.trades import crud
+from modules.trades.schema import TradePage, TradeRead
+
+router = APIRouter(prefix="/trades", tags=["trades"])
+
+
+@router.get("", response_model=TradePage)
+async def read_trades(
+        run_id: str,
+        limit: int = Query(default=500, ge=1, le=5000),
+        cursor: str | None = None,
+        session: AsyncSession = Depends(get_session)):
+    """Operaciones de una ejecución por orden de entrada. next_cursor pide la página siguiente."""
+    try:
+        after = crud.decode_cursor(cursor) if cursor else None
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error))
+    trades = await crud.list_trades(session, run_id, limit, after)
+    next_cursor = crud.encode_cursor(trades[-1]) if len(trades) == limit else None
+    return TradePage(items=[TradeRead.model_validate(trade) for trade in trades], next_cursor=next_cursor)
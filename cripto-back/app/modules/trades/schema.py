@@ -0,0 +1,37 @@
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+
+class TradeRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    run_id: str
+    symbol: str
+    entry_time: datetime
+    exit_time: datetime
+    entry_price: float
+    exit_price: float
+    size: float
+    cost: float
+    fees: float
+    pnl: float
+    pnl_pct: float
+    risk_usd: float
+    r_multiple: float
+    tp1_hit: bool
+    exit_reason: str
+    bars_held: int
+    mae_pct: float | None
+    mfe_pct: float | None
+
+
+class TradePage(BaseModel):
+    items: list[TradeRead]
+    # Cursor opaco para pedir la página siguiente; None si no hay más operaciones.
+    next_cursor: str | None
+
+
+class TradesStored(BaseModel):
+    run_id: str
+    trades: int